@@ -0,0 +1,70 @@
+from collections import deque
+
+HISTORY = 64  # backspaces that can be undone inside a half-typed abbreviation
+
+class AbbreviationMatcher:
+    """
+    Aho-Corasick automaton over a profile's abbreviations, fed one typed character
+    at a time. feed() follows at most a few failure links per character (amortized
+    O(1)) no matter how many abbreviations there are, and reports the longest one
+    that ends at the current character.
+    """
+
+    def __init__(self, abbreviations):
+        """abbreviations: {typed text: macro name}"""
+        self.goto = [{}]
+        self.fail = [0]
+        self.match = [None]  # macro name of the longest abbreviation ending in this state
+        for text, name in abbreviations.items():
+            state = 0
+            for char in text:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.match.append(None)
+                state = nxt
+            self.match[state] = name
+
+        # Breadth-first, so every failure target is finished before it is used
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and char not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(char, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                if self.match[nxt] is None:
+                    self.match[nxt] = self.match[self.fail[nxt]]
+
+        self.state = 0
+        self.history = deque(maxlen=HISTORY)
+
+    def __len__(self):
+        return len(self.goto) - 1
+
+    def feed(self, char):
+        """Advance by one typed character; returns the macro name on a match (and starts over)"""
+        goto, fail = self.goto, self.fail
+        state = self.state
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        name = self.match[state]
+        if name is not None:
+            self.reset()
+            return name
+        self.history.append(self.state)
+        self.state = state
+        return None
+
+    def backspace(self):
+        self.state = self.history.pop() if self.history else 0
+
+    def reset(self):
+        self.state = 0
+        self.history.clear()
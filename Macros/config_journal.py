@@ -0,0 +1,366 @@
+import os
+import json
+import hashlib
+import tempfile
+from collections.abc import Mapping
+
+import event_log
+
+# === Config File Helpers ===
+def write_config_atomic(path, config, indent=2):
+    """Write config to a temp file next to path and swap it in, so readers never see a half-written file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(config, f, indent=indent)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def file_digest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# === Operation Deltas ===
+# Each op is a small JSON-able dict; `path` addresses the container it acts on.
+#   set       {path, key, [old], [new], [index]}  missing old/new means the key is absent
+#   insert    {path, index, value}                list insert
+#   delete    {path, index, value}                list delete
+#   move      {path, src, dst}                    list reorder
+#   rename    {path, old, new}                    dict key rename, keeping its position
+#   move_key  {path, src, dst}                    dict key reorder
+
+def copy_value(value):
+    """Deep copy of a JSON value; read-only mappings and tuples (clipboard records) become dicts and lists"""
+    if isinstance(value, Mapping):
+        return {k: copy_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [copy_value(v) for v in value]
+    return value
+
+def _resolve(root, path):
+    node = root
+    for part in path:
+        node = node[part]
+    return node
+
+def _dict_insert_at(d, index, key, value):
+    """Insert key at position index while keeping the same dict object"""
+    tail = [(k, d.pop(k)) for k in list(d.keys())[index:]]
+    d[key] = value
+    for k, v in tail:
+        d[k] = v
+
+def apply_op(root, op):
+    """
+    Apply one op in place and return the op that exactly reverses it, built from the
+    state it replaced. Values are copied into the config, so later in-place edits of
+    the config never reach the op (or the history holding it).
+    """
+    container = _resolve(root, op["path"])
+    kind = op["op"]
+    path = op["path"]
+
+    if kind == "set":
+        key = op["key"]
+        reverse = {"op": "set", "path": path, "key": key}
+        if key in container:
+            reverse["new"] = container[key]
+            reverse["index"] = list(container.keys()).index(key)
+        if "new" in op:
+            if key not in container and "index" in op:
+                _dict_insert_at(container, op["index"], key, copy_value(op["new"]))
+            else:
+                container[key] = copy_value(op["new"])
+        else:
+            container.pop(key, None)
+        return reverse
+    if kind == "insert":
+        index = min(op["index"], len(container))
+        container.insert(index, copy_value(op["value"]))
+        return {"op": "delete", "path": path, "index": index}
+    if kind == "delete":
+        value = container[op["index"]]
+        del container[op["index"]]
+        return {"op": "insert", "path": path, "index": op["index"], "value": value}
+    if kind == "move":
+        container.insert(op["dst"], container.pop(op["src"]))
+        return {"op": "move", "path": path, "src": op["dst"], "dst": op["src"]}
+    if kind == "rename":
+        if op["new"] in container:
+            raise ValueError(f"'{op['new']}' already exists")
+        index = list(container.keys()).index(op["old"])
+        value = container.pop(op["old"])
+        _dict_insert_at(container, index, op["new"], value)
+        return {"op": "rename", "path": path, "old": op["new"], "new": op["old"]}
+    if kind == "move_key":
+        keys = list(container.keys())
+        key = keys[op["src"]]
+        value = container.pop(key)
+        _dict_insert_at(container, op["dst"], key, value)
+        return {"op": "move_key", "path": path, "src": op["dst"], "dst": op["src"]}
+    raise ValueError(f"Unknown journal op: {kind}")
+
+def apply_ops(root, ops):
+    """
+    Apply a batch of ops in place as one unit: if an op fails, the ones already applied
+    are reversed and the error is re-raised, leaving root as it was. Only the touched
+    values are copied, never the whole config.
+    """
+    applied = []
+    try:
+        for op in ops:
+            applied.append(apply_op(root, op))
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+        for reverse in reversed(applied):
+            _restore(root, reverse)
+        raise
+
+def _restore(root, reverse):
+    """Apply a reversal op from apply_op, putting back the original objects rather than copies"""
+    container = _resolve(root, reverse["path"])
+    if reverse["op"] == "set":
+        key = reverse["key"]
+        container.pop(key, None)
+        if "new" in reverse:
+            _dict_insert_at(container, reverse["index"], key, reverse["new"])
+    elif reverse["op"] == "insert":
+        container.insert(reverse["index"], reverse["value"])
+    else:
+        apply_op(root, reverse)
+
+def _detach(op):
+    """Copy of op whose value payloads share nothing with the caller or the config"""
+    detached = dict(op)
+    for field in ("old", "new", "value"):
+        if field in detached:
+            detached[field] = copy_value(detached[field])
+    return detached
+
+def invert_op(op):
+    kind = op["op"]
+    inverse = dict(op)
+
+    if kind == "set":
+        inverse.pop("old", None)
+        inverse.pop("new", None)
+        if "new" in op:
+            inverse["old"] = op["new"]
+        if "old" in op:
+            inverse["new"] = op["old"]
+    elif kind == "insert":
+        inverse["op"] = "delete"
+    elif kind == "delete":
+        inverse["op"] = "insert"
+    elif kind in ("move", "move_key"):
+        inverse["src"], inverse["dst"] = op["dst"], op["src"]
+    elif kind == "rename":
+        inverse["old"], inverse["new"] = op["new"], op["old"]
+    return inverse
+
+# === Journal ===
+class ConfigJournal:
+    """
+    Keeps config.json in memory and records every edit as a delta.
+    Deltas are appended to <config>.journal; the full file is only rewritten by snapshot().
+    On open, a journal left behind by a crash is replayed over the last snapshot.
+    """
+
+    def __init__(self, path, default=None, snapshot_every=200, history_limit=500):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.snapshot_every = snapshot_every
+        self.history_limit = history_limit
+
+        self.undo_stack = []
+        self.redo_stack = []
+        self.pending_ops = 0
+        self._group = None
+        self._journal_file = None
+
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.config = json.load(f)
+        else:
+            self.config = default if default is not None else {}
+
+        recovered = self._recover()
+        if recovered:
+            event_log.info(f"Recovered {recovered} unsaved edit(s) from {self.journal_path}")
+            self.snapshot()
+        else:
+            self._start_journal()
+
+    # --- journal file ---
+    def _start_journal(self):
+        if self._journal_file:
+            self._journal_file.close()
+        header = {"base": file_digest(self.path)}
+        with open(self.journal_path, "w") as f:
+            f.write(json.dumps(header, separators=(",", ":")) + "\n")
+        self._journal_file = open(self.journal_path, "a")
+
+    def _recover(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+        try:
+            with open(self.journal_path, "r") as f:
+                lines = f.read().splitlines()
+        except OSError as e:
+            event_log.error(f"Could not read journal: {e}")
+            return 0
+        if not lines:
+            return 0
+
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return 0
+        if header.get("base") != file_digest(self.path):
+            # Journal belongs to an older snapshot; its edits are already in config.json
+            return 0
+
+        applied = 0
+        for line in lines[1:]:
+            try:
+                ops = json.loads(line)
+            except ValueError:
+                break  # torn final write
+            try:
+                apply_ops(self.config, ops)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                event_log.error(f"Journal replay stopped: {e}")
+                break
+            applied += 1
+        return applied
+
+    def _append(self, ops):
+        if self._journal_file is None:
+            return
+        self._journal_file.write(json.dumps(ops, separators=(",", ":")) + "\n")
+        self._journal_file.flush()
+
+    # --- recording ---
+    def record(self, ops):
+        """Apply ops to the in-memory config as one undoable step"""
+        # The ops keep their own copies of the values they carry, so the history is
+        # unaffected by whatever later happens to the caller's objects or the config
+        ops = [_detach(op) for op in ops]
+        apply_ops(self.config, ops)
+
+        if self._group is not None:
+            self._group.extend(ops)
+            return
+
+        self._commit(ops)
+
+    def _commit(self, ops):
+        if not ops:
+            return
+        self._append(ops)
+        self.undo_stack.append(ops)
+        if len(self.undo_stack) > self.history_limit:
+            del self.undo_stack[0]
+        self.redo_stack.clear()
+        self.pending_ops += len(ops)
+
+    def begin(self):
+        """Group following edits into a single undo step until commit()"""
+        if self._group is None:
+            self._group = []
+
+    def commit(self):
+        ops, self._group = self._group, None
+        if ops:
+            self._commit(ops)
+
+    def set(self, path, key, value):
+        container = _resolve(self.config, path)
+        op = {"op": "set", "path": list(path), "key": key, "new": value}
+        if key in container:
+            if container[key] == value:
+                return
+            op["old"] = container[key]
+        self.record([op])
+
+    def delete_key(self, path, key):
+        container = _resolve(self.config, path)
+        if key not in container:
+            return
+        index = list(container.keys()).index(key)
+        self.record([{"op": "set", "path": list(path), "key": key, "old": container[key], "index": index}])
+
+    def insert(self, path, index, value):
+        container = _resolve(self.config, path)
+        if index is None or index > len(container):
+            index = len(container)
+        self.record([{"op": "insert", "path": list(path), "index": index, "value": value}])
+
+    def delete(self, path, index):
+        container = _resolve(self.config, path)
+        self.record([{"op": "delete", "path": list(path), "index": index, "value": container[index]}])
+
+    def move(self, path, src, dst):
+        if src != dst:
+            self.record([{"op": "move", "path": list(path), "src": src, "dst": dst}])
+
+    def rename_key(self, path, old, new):
+        if old != new:
+            self.record([{"op": "rename", "path": list(path), "old": old, "new": new}])
+
+    def move_key(self, path, src, dst):
+        if src != dst:
+            self.record([{"op": "move_key", "path": list(path), "src": src, "dst": dst}])
+
+    # --- history ---
+    # A step that fails part-way is reversed by apply_ops, leaving the config and both stacks as they were
+    def undo(self):
+        if not self.undo_stack:
+            return False
+        ops = self.undo_stack[-1]
+        inverse = [invert_op(op) for op in reversed(ops)]
+        apply_ops(self.config, inverse)
+        self.undo_stack.pop()
+        self._append(inverse)
+        self.redo_stack.append(ops)
+        self.pending_ops += len(inverse)
+        return True
+
+    def redo(self):
+        if not self.redo_stack:
+            return False
+        ops = self.redo_stack[-1]
+        apply_ops(self.config, ops)
+        self.redo_stack.pop()
+        self._append(ops)
+        self.undo_stack.append(ops)
+        self.pending_ops += len(ops)
+        return True
+
+    # --- snapshots ---
+    def needs_snapshot(self):
+        return self.pending_ops >= self.snapshot_every
+
+    def snapshot(self):
+        """Write the full config and start a fresh journal against it"""
+        write_config_atomic(self.path, self.config)
+        self._start_journal()
+        self.pending_ops = 0
+
+    def close(self):
+        if self.pending_ops:
+            self.snapshot()
+        if self._journal_file:
+            self._journal_file.close()
+            self._journal_file = None
+        try:
+            os.remove(self.journal_path)
+        except OSError:
+            pass
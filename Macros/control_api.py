@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import queue
+import socket
+import getpass
+import secrets
+import tempfile
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client, answer_challenge, deliver_challenge
+
+import event_log
+
+# Frames are multiprocessing.connection's: a 4-byte big-endian length, then a UTF-8 JSON object.
+# Requests are {"cmd": ..., "id": optional, ...}; every reply echoes "id" and carries "ok".
+MAX_MESSAGE = 1 << 20
+SUBSCRIBER_QUEUE = 1000
+
+class ControlError(Exception):
+    pass
+
+def _private_dir(path):
+    """Create path (owner-only on Unix) if needed and return it"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if sys.platform != "win32":
+        os.chmod(path, 0o700)
+    return path
+
+def default_address():
+    """Per-user socket path inside an owner-only directory (Unix), or named pipe (Windows)"""
+    if sys.platform == "win32":
+        return rf"\\.\pipe\macros-{getpass.getuser()}"
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"macros-{os.getuid()}", "control.sock")
+
+# === Authentication ===
+# Every connection must pass multiprocessing's HMAC challenge with this install's key, which
+# lives in a file only its user can read; reaching the socket or pipe alone grants nothing.
+def key_path():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "macros", "control.key")
+
+def load_authkey(create=False):
+    """This install's control key; created (owner-only) by the server on first start"""
+    path = key_path()
+    try:
+        with open(path, "rb") as f:
+            key = f.read().strip()
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+    if not create:
+        raise ControlError(f"No control key at {path} (has the tray app been started?)")
+    _private_dir(os.path.dirname(path))
+    key = secrets.token_hex(32).encode("ascii")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+def encode(message):
+    return json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+def decode(data):
+    message = json.loads(data.decode("utf-8"))
+    if not isinstance(message, dict):
+        raise ValueError("message must be a JSON object")
+    return message
+
+def _claim_socket_path(address):
+    """Remove a stale socket file; False if another instance is still listening on it"""
+    if sys.platform == "win32" or not os.path.exists(address):
+        return True
+    probe = socket.socket(socket.AF_UNIX)
+    try:
+        probe.connect(address)
+        return False
+    except OSError:
+        os.unlink(address)
+        return True
+    finally:
+        probe.close()
+
+# === Server ===
+class ControlServer:
+    """
+    Accepts local clients on one thread and serves each on its own thread.
+    handle(request) runs a request (the runtime marshals it onto its loop) and
+    returns the reply; subscribe()/unsubscribe() attach a queue of event dicts.
+    """
+
+    def __init__(self, handle, subscribe, unsubscribe, address=None):
+        self.handle = handle
+        self.subscribe = subscribe
+        self.unsubscribe = unsubscribe
+        self.address = address or default_address()
+        self.authkey = None
+        self.listener = None
+        self.closed = False
+
+    def start(self):
+        unix = sys.platform != "win32"
+        try:
+            self.authkey = load_authkey(create=True)
+            if unix and self.address == default_address():
+                _private_dir(os.path.dirname(self.address))
+        except OSError as e:
+            event_log.warning(f"Control API not started: {e}")
+            return False
+        if not _claim_socket_path(self.address):
+            event_log.warning(f"Control API not started: {self.address} is in use by another instance")
+            return False
+        # The socket file is created owner-only rather than chmod-ed after bind
+        old_umask = os.umask(0o177) if unix else None
+        try:
+            self.listener = Listener(self.address)
+        except OSError as e:
+            event_log.warning(f"Control API not started: {e}")
+            return False
+        finally:
+            if old_umask is not None:
+                os.umask(old_umask)
+        threading.Thread(target=self._accept_loop, name="control-accept", daemon=True).start()
+        event_log.info(f"Control API listening on {self.address}")
+        return True
+
+    def close(self):
+        if self.listener is None or self.closed:
+            return
+        self.closed = True
+        # accept() doesn't return when the listener is closed under it; wake it with a connection
+        try:
+            Client(self.address).close()
+        except OSError:
+            pass
+        self.listener.close()
+
+    def _accept_loop(self):
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                if self.closed:
+                    return
+                continue
+            if self.closed:
+                conn.close()
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="control-client", daemon=True).start()
+
+    def _authenticate(self, conn):
+        # On the client's own thread, so a client that never answers can't hold up accept()
+        try:
+            deliver_challenge(conn, self.authkey)
+            answer_challenge(conn, self.authkey)
+            return True
+        except (AuthenticationError, EOFError, OSError) as e:
+            event_log.warning(f"Control API: rejected a connection ({e or 'authentication failed'})")
+            return False
+
+    def _serve(self, conn):
+        try:
+            if not self._authenticate(conn):
+                return
+            while True:
+                try:
+                    data = conn.recv_bytes(MAX_MESSAGE)
+                except (EOFError, OSError):
+                    return
+                try:
+                    request = decode(data)
+                except ValueError as e:
+                    conn.send_bytes(encode({"ok": False, "error": f"bad request: {e}"}))
+                    continue
+
+                if request.get("cmd") == "subscribe":
+                    self._stream(conn, request)
+                    return
+                reply = self.handle(request)
+                if "id" in request:
+                    reply["id"] = request["id"]
+                conn.send_bytes(encode(reply))
+        except (OSError, ValueError):
+            pass
+        finally:
+            conn.close()
+
+    def _stream(self, conn, request):
+        events = queue.Queue(SUBSCRIBER_QUEUE)
+        self.subscribe(events)
+        try:
+            reply = {"ok": True}
+            if "id" in request:
+                reply["id"] = request["id"]
+            conn.send_bytes(encode(reply))
+            while not self.closed:
+                try:
+                    event = events.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                conn.send_bytes(encode(event))
+        finally:
+            self.unsubscribe(events)
+
+# === Client ===
+class ControlClient:
+    """Blocking client for scripts and tests: request("trigger", name="...")"""
+
+    def __init__(self, address=None, authkey=None):
+        self.address = address or default_address()
+        try:
+            self.conn = Client(self.address, authkey=authkey or load_authkey())
+        except AuthenticationError:
+            raise ControlError(f"The running macros rejected the control key in {key_path()}") from None
+        self._next_id = 0
+
+    def request(self, cmd, **fields):
+        self._next_id += 1
+        fields.update(cmd=cmd, id=self._next_id)
+        self.conn.send_bytes(encode(fields))
+        reply = decode(self.conn.recv_bytes(MAX_MESSAGE))
+        if not reply.get("ok"):
+            raise ControlError(reply.get("error", "request failed"))
+        return reply
+
+    def events(self):
+        """Switch this connection to streaming and yield event dicts until it closes"""
+        self.request("subscribe")
+        while True:
+            try:
+                yield decode(self.conn.recv_bytes(MAX_MESSAGE))
+            except EOFError:
+                return
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
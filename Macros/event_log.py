@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = os.path.join(script_dir, "logs")
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LABELS = {"debug": "[Debug]", "info": "[Info]", "warning": "[Warning]", "error": "[Error]"}
+
+DEFAULTS = {
+    "level": "info",
+    "console": True,
+    "dir": LOG_DIR,
+    "max_bytes": 1 << 20,  # per file before rotating
+    "backups": 3,
+    "queue_size": 10000,
+    "rate": 100,  # records per second once the burst is used up
+    "burst": 200,
+    "dedup_window": 10.0,  # identical messages inside this window are counted, not written
+    # Info lines report state changes (focus, profile) that legitimately alternate, so they are never collapsed
+    "dedup_levels": ("debug", "warning", "error"),
+}
+
+# === Logger ===
+class EventLog:
+    """
+    Structured log with a bounded queue and a background writer thread, so callers
+    on the hot path never block on the terminal or the disk. Records go to the
+    console and to rotating JSON-lines files (logs/<role>.jsonl); repeated messages
+    are collapsed (their count is written when the window closes) and a token bucket
+    caps the overall rate.
+    """
+
+    def __init__(self, role="macros", settings=None):
+        self.role = role
+        self.settings = dict(DEFAULTS, **(settings or {}))
+        self.threshold = LEVELS.get(self.settings["level"], LEVELS["info"])
+        self.queue = queue.Queue(self.settings["queue_size"])
+        self.lock = threading.Lock()
+        self.recent = {}  # (level, message) -> [window start, suppressed count]
+        self.tokens = float(self.settings["burst"])
+        self.refilled = time.monotonic()
+        self.dropped = 0
+        self.writer = None
+        self.path = os.path.join(self.settings["dir"], f"{role}.jsonl")
+        self.file = None
+
+    def emit(self, level, message, **fields):
+        if LEVELS.get(level, 0) < self.threshold:
+            return
+        now = time.monotonic()
+        key = (level, message)
+        with self.lock:
+            repeated = 0
+            if level in self.settings["dedup_levels"]:
+                seen = self.recent.get(key)
+                if seen is not None and now - seen[0] < self.settings["dedup_window"]:
+                    seen[1] += 1
+                    return
+                repeated = seen[1] if seen is not None else 0
+                self.recent[key] = [now, 0]
+                if len(self.recent) > 4096:
+                    self.recent.clear()
+
+            self.tokens = min(self.settings["burst"], self.tokens + (now - self.refilled) * self.settings["rate"])
+            self.refilled = now
+            if self.tokens < 1:
+                self.dropped += 1
+                return
+            self.tokens -= 1
+            dropped, self.dropped = self.dropped, 0
+
+        record = self._record(level, message, fields)
+        if repeated:
+            record["repeated"] = repeated
+        if dropped:
+            record["dropped"] = dropped
+        self._ensure_writer()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def _record(self, level, message, fields=None):
+        record = {"time": time.time(), "level": level, "role": self.role, "pid": os.getpid(), "msg": message}
+        if fields:
+            record.update(fields)
+        return record
+
+    def _take_repeats(self, now=None):
+        """Records for suppressed repeats whose window has closed (all of them when now is None)"""
+        window = self.settings["dedup_window"]
+        repeats = []
+        with self.lock:
+            for key, (start, count) in list(self.recent.items()):
+                if now is None or now - start >= window:
+                    del self.recent[key]
+                    if count:
+                        record = self._record(*key)
+                        record["repeated"] = count
+                        repeats.append(record)
+        return repeats
+
+    # === Writer Thread ===
+    def _ensure_writer(self):
+        if self.writer is None:
+            with self.lock:
+                if self.writer is None:
+                    self.writer = threading.Thread(target=self._write_loop, name="event-log", daemon=True)
+                    self.writer.start()
+
+    def _write_loop(self):
+        sweep_every = self.settings["dedup_window"] / 2 or 1.0
+        next_sweep = time.monotonic() + sweep_every
+        while True:
+            try:
+                record = self.queue.get(timeout=max(0.0, next_sweep - time.monotonic()))
+            except queue.Empty:
+                record = False
+            now = time.monotonic()
+            if record is None or now >= next_sweep:
+                # Counts of messages that stopped repeating; on close, everything still pending
+                self._write_all(self._take_repeats(None if record is None else now))
+                next_sweep = now + sweep_every
+            if record is False:
+                continue
+            if record is not None:
+                self._write_all([record])
+            self.queue.task_done()
+            if record is None:
+                break
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def _write_all(self, records):
+        for record in records:
+            try:
+                self._write(record)
+            except Exception:
+                pass  # logging must never take the process down
+
+    def _write(self, record):
+        if self.settings["console"]:
+            text = f"{LABELS.get(record['level'], '')} {record['msg']}"
+            if record.get("repeated"):
+                text += f" (repeated {record['repeated']}x)"
+            if record.get("dropped"):
+                text += f" ({record['dropped']} earlier messages dropped)"
+            print(text, flush=True)
+
+        if not self.settings["dir"]:
+            return
+        if self.file is None:
+            os.makedirs(self.settings["dir"], exist_ok=True)
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(json.dumps(record, default=str) + "\n")
+        self.file.flush()
+        if self.file.tell() >= self.settings["max_bytes"]:
+            self._rotate()
+
+    def _rotate(self):
+        self.file.close()
+        self.file = None
+        backups = self.settings["backups"]
+        for i in range(backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self, timeout=1.0):
+        """Write out what is queued (bounded by timeout) and stop the writer"""
+        if self.writer is None:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.writer.join(timeout)
+
+# === Module Interface ===
+_log = None
+
+def configure(role="macros", settings=None):
+    """Set this process's role (file name) and settings, e.g. the "log" object of config.json's global section"""
+    global _log
+    if _log is not None:
+        _log.close()
+    _log = EventLog(role, settings)
+    return _log
+
+def settings_from(config_path):
+    """The "log" settings of a config file, or {} when it can't be read"""
+    try:
+        with open(config_path, "r") as f:
+            settings = json.load(f).get("global", {}).get("log", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+    return settings if isinstance(settings, dict) else {}
+
+def get():
+    global _log
+    if _log is None:
+        _log = EventLog()
+    return _log
+
+def debug(message, **fields):
+    get().emit("debug", message, **fields)
+
+def info(message, **fields):
+    get().emit("info", message, **fields)
+
+def warning(message, **fields):
+    get().emit("warning", message, **fields)
+
+def error(message, **fields):
+    get().emit("error", message, **fields)
+
+@atexit.register
+def _flush_at_exit():
+    if _log is not None:
+        _log.close()
@@ -0,0 +1,180 @@
+import ast
+import time
+import operator
+
+class GuardError(ValueError):
+    """A guard expression that uses something outside the allowed subset"""
+
+# === Guard Context ===
+class WindowState:
+    """Focused window as last reported by the input hook (the runtime keeps it current)"""
+    __slots__ = ("title", "process")
+
+    def __init__(self):
+        self.title = ""
+        self.process = ""
+
+class GuardContext:
+    """What a runner's guards can see: the focused window, which macros are active, screen pixels"""
+
+    def __init__(self, window, is_active, capture_name="auto"):
+        self.window = window
+        self.is_active = is_active  # is_active(macro name) -> bool
+        self.capture_name = capture_name
+        self.capture = None
+
+    def var(self, name):
+        import shared_vars
+        return shared_vars.get_store().get(name)
+
+    def pixel(self, x, y):
+        """(r, g, b) at a screen position"""
+        if self.capture is None:
+            import screen_watch
+            self.capture = screen_watch.open_capture(self.capture_name)
+            if self.capture is None:
+                raise RuntimeError("no screen capture available")
+        b0, b1, b2 = (int(v) for v in self.capture.grab((x, y, 1, 1))[0, 0, :3])
+        return (b2, b1, b0) if self.capture.order == "BGR" else (b0, b1, b2)
+
+# === Names and Functions ===
+def _clock(ctx):
+    return time.strftime("%H:%M")
+
+NAMES = {
+    "title": lambda ctx: ctx.window.title,
+    "process": lambda ctx: ctx.window.process,
+    "time": _clock,  # "HH:MM", so time >= "09:00" compares as expected
+    "hour": lambda ctx: time.localtime().tm_hour,
+    "weekday": lambda ctx: time.localtime().tm_wday,  # 0 = Monday
+}
+
+def _color(text):
+    if not isinstance(text, str) or len(text.lstrip("#")) != 6:
+        raise GuardError("pixel() color must be \"#rrggbb\"")
+    value = text.lstrip("#")
+    try:
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        raise GuardError("pixel() color must be \"#rrggbb\"") from None
+
+def _pixel_args(args):
+    if not all(isinstance(v, int) and not isinstance(v, bool) and v >= 0 for v in args[:2] + args[3:]):
+        raise GuardError("pixel() needs x, y (and tolerance) as non-negative integers")
+    return args[:2] + (_color(args[2]),) + args[3:]
+
+def _pixel(ctx, x, y, color, tolerance=0):
+    actual = ctx.pixel(x, y)
+    return all(abs(a - c) <= tolerance for a, c in zip(actual, color))
+
+# name -> (function(ctx, *args), min args, max args, converter for constant args or None)
+FUNCTIONS = {
+    "active": (lambda ctx, name: ctx.is_active(name), 1, 1, None),
+    "pixel": (_pixel, 3, 4, _pixel_args),
+    "lower": (lambda ctx, text: str(text).lower(), 1, 1, None),
+    "var": (lambda ctx, name: ctx.var(name), 1, 1, None),  # shared variable, 0 until first set
+}
+
+COMPARE_OPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b,
+}
+
+# === Compiler ===
+def _compile(node):
+    """Closure(ctx) for one AST node of the allowed subset"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (str, int, float, bool)):
+        value = node.value
+        return lambda ctx: value
+
+    if isinstance(node, ast.Name):
+        getter = NAMES.get(node.id)
+        if getter is None:
+            raise GuardError(f"unknown name '{node.id}' (use {', '.join(NAMES)})")
+        return getter
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(v) for v in node.values]
+        if isinstance(node.op, ast.And):
+            def both(ctx):
+                for part in parts:
+                    if not part(ctx):
+                        return False
+                return True
+            return both
+
+        def either(ctx):
+            for part in parts:
+                if part(ctx):
+                    return True
+            return False
+        return either
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+        inner = _compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda ctx: not inner(ctx)
+        return lambda ctx: -inner(ctx)
+
+    if isinstance(node, ast.Compare):
+        for op in node.ops:
+            if type(op) not in COMPARE_OPS:
+                raise GuardError(f"comparison '{type(op).__name__}' is not allowed")
+        operands = [_compile(node.left)] + [_compile(c) for c in node.comparators]
+        ops = [COMPARE_OPS[type(op)] for op in node.ops]
+        if len(ops) == 1:
+            left, right, op = operands[0], operands[1], ops[0]
+            # Fold a constant side (the usual `"Chrome" in title`) into the closure
+            if isinstance(node.left, ast.Constant):
+                value = node.left.value
+                return lambda ctx: op(value, right(ctx))
+            if isinstance(node.comparators[0], ast.Constant):
+                value = node.comparators[0].value
+                return lambda ctx: op(left(ctx), value)
+            return lambda ctx: op(left(ctx), right(ctx))
+
+        def chain(ctx):
+            left = operands[0](ctx)
+            for op, operand in zip(ops, operands[1:]):
+                right = operand(ctx)
+                if not op(left, right):
+                    return False
+                left = right
+            return True
+        return chain
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise GuardError(f"only {', '.join(f + '()' for f in FUNCTIONS)} can be called, without keywords")
+        function, least, most, convert = FUNCTIONS[node.func.id]
+        if not least <= len(node.args) <= most:
+            raise GuardError(f"{node.func.id}() takes {least}-{most} arguments" if least != most
+                             else f"{node.func.id}() takes {least} argument(s)")
+        if all(isinstance(a, ast.Constant) for a in node.args):
+            # Constant arguments (the usual case) are checked and converted once, here
+            args = tuple(a.value for a in node.args)
+            if convert is not None:
+                args = convert(args)
+            return lambda ctx: function(ctx, *args)
+        if convert is not None:
+            raise GuardError(f"{node.func.id}() needs constant arguments")
+        parts = [_compile(a) for a in node.args]
+        return lambda ctx: function(ctx, *[part(ctx) for part in parts])
+
+    raise GuardError(f"'{type(node).__name__}' is not allowed in a guard")
+
+def compile_guard(text):
+    """
+    Compile a guard expression (Python syntax, restricted to comparisons, and/or/not,
+    constants, the NAMES and FUNCTIONS above) into a closure(ctx) -> bool. Parsing
+    and checking happen once; a check is then a few nested calls.
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise GuardError("guard must be a non-empty string")
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise GuardError(f"invalid guard: {e.msg}") from None
+    check = _compile(tree.body)
+    return lambda ctx: bool(check(ctx))
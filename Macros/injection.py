@@ -0,0 +1,689 @@
+import os
+import time
+import struct
+import ctypes
+import ctypes.util
+import platform
+import threading
+from collections import OrderedDict
+
+import event_log
+
+OS_TYPE = platform.system()
+
+BUTTONS = ("left", "right", "middle")
+
+# Characters that need shift on a US layout, mapped to their unshifted key
+US_SHIFTED = {
+    "!": "1", "@": "2", "#": "3", "$": "4", "%": "5", "^": "6", "&": "7", "*": "8",
+    "(": "9", ")": "0", "_": "-", "+": "=", "{": "[", "}": "]", "|": "\\", ":": ";",
+    "\"": "'", "<": ",", ">": ".", "?": "/", "~": "`",
+}
+
+# === Backends ===
+# A backend resolves key names to (code, needs_shift) and sends a list of
+# ("key" | "button", code, is_down) and ("move", x, y) events in as few system
+# calls as it can. Backends without absolute pointer moves set can_move = False.
+# unicode_events(char, state), where present, types a character the keyboard
+# layout has no key for; state is per compiled text (see compile_text).
+# restore_events(state), where present, undoes what those events changed once
+# the text has been typed; settle(), where present, waits until the events sent so
+# far reach the server and returns how long clients need before that is safe.
+
+class PyAutoGuiBackend:
+    """Fallback: one pyautogui call per event"""
+    name = "pyautogui"
+    can_move = True
+
+    def __init__(self):
+        import pyautogui
+        self.pag = pyautogui
+
+    def resolve_key(self, key):
+        return (key, False) if self.can_type(key) else None
+
+    def can_type(self, key):
+        """pyautogui ignores keys outside its key list instead of failing"""
+        return self.pag.isValidKey(key) or self.pag.isValidKey(key.lower())
+
+    def resolve_button(self, button):
+        return button
+
+    def send(self, events):
+        for kind, code, down in events:
+            if kind == "key":
+                (self.pag.keyDown if down else self.pag.keyUp)(code)
+            elif kind == "move":
+                self.pag.moveTo(code, down)
+            else:
+                (self.pag.mouseDown if down else self.pag.mouseUp)(button=code)
+
+
+class SendInputBackend:
+    """Windows: the whole batch goes through one SendInput call"""
+    name = "sendinput"
+    can_move = True
+
+    INPUT_MOUSE = 0
+    INPUT_KEYBOARD = 1
+    KEYEVENTF_EXTENDEDKEY = 0x0001
+    KEYEVENTF_KEYUP = 0x0002
+    KEYEVENTF_UNICODE = 0x0004
+    MOUSEEVENTF_MOVE_ABSOLUTE = 0x0001 | 0x8000 | 0x4000  # MOVE | ABSOLUTE | VIRTUALDESK
+    SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN = 76, 77, 78, 79
+    MOUSE_FLAGS = {
+        "left": (0x0002, 0x0004),
+        "right": (0x0008, 0x0010),
+        "middle": (0x0020, 0x0040),
+    }
+    VK_CODES = {
+        "backspace": 0x08, "tab": 0x09, "enter": 0x0D, "return": 0x0D, "shift": 0x10,
+        "ctrl": 0x11, "alt": 0x12, "pause": 0x13, "capslock": 0x14, "esc": 0x1B,
+        "escape": 0x1B, "space": 0x20, "pageup": 0x21, "pagedown": 0x22, "end": 0x23,
+        "home": 0x24, "left": 0x25, "up": 0x26, "right": 0x27, "down": 0x28,
+        "printscreen": 0x2C, "insert": 0x2D, "delete": 0x2E, "win": 0x5B, "windows": 0x5B,
+        "numlock": 0x90, "scrolllock": 0x91, "volumemute": 0xAD, "volumedown": 0xAE,
+        "volumeup": 0xAF, "playpause": 0xB3,
+    }
+    EXTENDED = {0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2D, 0x2E, 0x5B}
+
+    def __init__(self):
+        from ctypes import wintypes
+        ULONG_PTR = ctypes.c_size_t
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                        ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", ULONG_PTR)]
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ULONG_PTR)]
+
+        class HARDWAREINPUT(ctypes.Structure):
+            _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [("type", wintypes.DWORD), ("union", _INPUTUNION)]
+
+        self.INPUT = INPUT
+        self.user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self.user32.SendInput.argtypes = [wintypes.UINT, ctypes.c_void_p, ctypes.c_int]
+        self.user32.SendInput.restype = wintypes.UINT
+        self.user32.VkKeyScanW.argtypes = [wintypes.WCHAR]
+        self.user32.VkKeyScanW.restype = ctypes.c_short
+        # Absolute moves are in 0..65535 across the virtual desktop
+        metrics = self.user32.GetSystemMetrics
+        self.desktop = (metrics(self.SM_XVIRTUALSCREEN), metrics(self.SM_YVIRTUALSCREEN),
+                        max(1, metrics(self.SM_CXVIRTUALSCREEN) - 1), max(1, metrics(self.SM_CYVIRTUALSCREEN) - 1))
+
+    def resolve_key(self, key):
+        lowered = key.lower()
+        if lowered in self.VK_CODES:
+            return (self.VK_CODES[lowered], False)
+        if lowered.startswith("f") and lowered[1:].isdigit() and 1 <= int(lowered[1:]) <= 24:
+            return (0x70 + int(lowered[1:]) - 1, False)
+        if len(key) == 1:
+            scan = self.user32.VkKeyScanW(key)
+            if scan == -1 or scan & 0x600:  # unmapped, or needs ctrl/alt (AltGr)
+                return None
+            return (scan & 0xFF, bool(scan & 0x100))
+        return None
+
+    def unicode_events(self, char, state):
+        # One UTF-16 code unit per event pair; characters outside the BMP take two
+        data = char.encode("utf-16-le")
+        events = []
+        for i in range(0, len(data), 2):
+            unit = int.from_bytes(data[i:i + 2], "little")
+            events += [("unicode", unit, True), ("unicode", unit, False)]
+        return events
+
+    def resolve_button(self, button):
+        return button if button in self.MOUSE_FLAGS else None
+
+    def _fill(self, item, kind, code, down):
+        if kind == "key":
+            item.type = self.INPUT_KEYBOARD
+            flags = 0 if down else self.KEYEVENTF_KEYUP
+            if code in self.EXTENDED:
+                flags |= self.KEYEVENTF_EXTENDEDKEY
+            item.union.ki.wVk = code
+            item.union.ki.dwFlags = flags
+        elif kind == "unicode":
+            item.type = self.INPUT_KEYBOARD
+            item.union.ki.wVk = 0
+            item.union.ki.wScan = code
+            item.union.ki.dwFlags = self.KEYEVENTF_UNICODE | (0 if down else self.KEYEVENTF_KEYUP)
+        elif kind == "move":
+            left, top, width, height = self.desktop
+            item.type = self.INPUT_MOUSE
+            item.union.mi.dx = (code - left) * 65535 // width
+            item.union.mi.dy = (down - top) * 65535 // height
+            item.union.mi.dwFlags = self.MOUSEEVENTF_MOVE_ABSOLUTE
+        else:
+            item.type = self.INPUT_MOUSE
+            item.union.mi.dwFlags = self.MOUSE_FLAGS[code][0 if down else 1]
+
+    def send(self, events):
+        array = (self.INPUT * len(events))()
+        for item, event in zip(array, events):
+            self._fill(item, *event)
+        sent = self.user32.SendInput(len(events), array, ctypes.sizeof(self.INPUT))
+        if sent != len(events):
+            raise OSError(f"SendInput delivered {sent} of {len(events)} events (error {ctypes.get_last_error()})")
+
+
+class XTestBackend:
+    """X11: queue fake events with XTest and push them to the server with a single XFlush"""
+    name = "xtest"
+    can_move = True
+
+    # Clients apply keymap changes (MappingNotify) on their own schedule, so a borrowed
+    # keycode is only remapped this long after its last key event reached the server
+    MAPPING_SETTLE = 0.05
+
+    BUTTON_CODES = {"left": 1, "middle": 2, "right": 3}
+    KEYSYM_NAMES = {
+        "enter": "Return", "return": "Return", "esc": "Escape", "escape": "Escape",
+        "space": "space", " ": "space", "tab": "Tab", "\t": "Tab", "\n": "Return",
+        "backspace": "BackSpace", "delete": "Delete", "insert": "Insert", "home": "Home",
+        "end": "End", "pageup": "Prior", "pagedown": "Next", "up": "Up", "down": "Down",
+        "left": "Left", "right": "Right", "shift": "Shift_L", "ctrl": "Control_L",
+        "alt": "Alt_L", "win": "Super_L", "windows": "Super_L", "capslock": "Caps_Lock",
+        "printscreen": "Print", "pause": "Pause", "numlock": "Num_Lock",
+        "volumeup": "XF86AudioRaiseVolume", "volumedown": "XF86AudioLowerVolume",
+        "volumemute": "XF86AudioMute", "playpause": "XF86AudioPlay",
+        ".": "period", ",": "comma", "/": "slash", "\\": "backslash", ";": "semicolon",
+        "'": "apostrophe", "[": "bracketleft", "]": "bracketright", "-": "minus",
+        "=": "equal", "`": "grave", "!": "exclam", "@": "at", "#": "numbersign",
+        "$": "dollar", "%": "percent", "^": "asciicircum", "&": "ampersand",
+        "*": "asterisk", "(": "parenleft", ")": "parenright", "_": "underscore",
+        "+": "plus", "{": "braceleft", "}": "braceright", "|": "bar", ":": "colon",
+        "\"": "quotedbl", "<": "less", ">": "greater", "?": "question", "~": "asciitilde",
+    }
+
+    def __init__(self):
+        x11_path = ctypes.util.find_library("X11")
+        xtst_path = ctypes.util.find_library("Xtst")
+        if not x11_path or not xtst_path:
+            raise OSError("libX11/libXtst not found")
+        self.x11 = ctypes.cdll.LoadLibrary(x11_path)
+        self.xtst = ctypes.cdll.LoadLibrary(xtst_path)
+
+        self.x11.XInitThreads()
+        self.x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.x11.XOpenDisplay.restype = ctypes.c_void_p
+        self.x11.XStringToKeysym.argtypes = [ctypes.c_char_p]
+        self.x11.XStringToKeysym.restype = ctypes.c_ulong
+        self.x11.XKeysymToKeycode.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        self.x11.XKeysymToKeycode.restype = ctypes.c_ubyte
+        self.x11.XKeycodeToKeysym.argtypes = [ctypes.c_void_p, ctypes.c_ubyte, ctypes.c_int]
+        self.x11.XKeycodeToKeysym.restype = ctypes.c_ulong
+        self.x11.XFlush.argtypes = [ctypes.c_void_p]
+        self.x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.xtst.XTestFakeKeyEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+        self.xtst.XTestFakeButtonEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+        self.xtst.XTestFakeMotionEvent.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        self.x11.XDisplayKeycodes.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]
+        self.x11.XGetKeyboardMapping.argtypes = [ctypes.c_void_p, ctypes.c_ubyte, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
+        self.x11.XGetKeyboardMapping.restype = ctypes.POINTER(ctypes.c_ulong)
+        self.x11.XChangeKeyboardMapping.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                                    ctypes.POINTER(ctypes.c_ulong), ctypes.c_int]
+        self.x11.XFree.argtypes = [ctypes.c_void_p]
+
+        self.display = self.x11.XOpenDisplay(None)
+        if not self.display:
+            raise OSError("cannot open X display")
+        self.lock = threading.Lock()
+        self._spare_keycodes = None
+        self._original_keysyms = {}  # spare keycode -> its keysyms before we borrowed it
+        self._typed = set()  # borrowed keycodes pressed since the last settle
+
+    def spare_keycodes(self):
+        """Keycodes with no keysyms, borrowed to type characters the layout lacks"""
+        if self._spare_keycodes is None:
+            with self.lock:
+                low, high = ctypes.c_int(), ctypes.c_int()
+                self.x11.XDisplayKeycodes(self.display, ctypes.byref(low), ctypes.byref(high))
+                per = ctypes.c_int()
+                count = high.value - low.value + 1
+                table = self.x11.XGetKeyboardMapping(self.display, low.value, count, ctypes.byref(per))
+                spare = []
+                if table:
+                    for i in range(count):
+                        row = tuple(table[i * per.value + j] for j in range(per.value))
+                        if not any(row):
+                            spare.append(low.value + i)
+                            self._original_keysyms[low.value + i] = row
+                    self.x11.XFree(table)
+                self._spare_keycodes = spare
+        return self._spare_keycodes
+
+    def unicode_events(self, char, state):
+        # Remap a spare keycode to the character's keysym in the event stream itself;
+        # within one text the spares are reused least-recently-used first
+        spare = self.spare_keycodes()
+        if not spare:
+            return None
+        code = ord(char)
+        keysym = code if 0x20 <= code < 0x100 else 0x01000000 | code
+        assigned = state.setdefault("xtest_keys", OrderedDict())  # keysym -> keycode
+        events = []
+        keycode = assigned.get(keysym)
+        if keycode is None:
+            if len(assigned) < len(spare):
+                keycode = spare[len(assigned)]
+            else:
+                _, keycode = assigned.popitem(last=False)
+            assigned[keysym] = keycode
+            events.append(("map", keycode, (keysym,)))
+        else:
+            assigned.move_to_end(keysym)
+        return events + [("key", keycode, True), ("key", keycode, False)]
+
+    def restore_events(self, state):
+        """Give every borrowed keycode its original (empty) keysyms back; the keymap is server-wide"""
+        assigned = state.get("xtest_keys")
+        if not assigned:
+            return []
+        return [("map", keycode, self._original_keysyms.get(keycode, (0,))) for keycode in assigned.values()]
+
+    def keysym_for(self, key):
+        lowered = key.lower()
+        if lowered in self.KEYSYM_NAMES:
+            name = self.KEYSYM_NAMES[lowered]
+        elif lowered.startswith("f") and lowered[1:].isdigit():
+            name = "F" + lowered[1:]
+        else:
+            name = key
+        return self.x11.XStringToKeysym(name.encode())
+
+    def resolve_key(self, key):
+        keysym = self.keysym_for(key)
+        if not keysym:
+            return None
+        with self.lock:
+            keycode = self.x11.XKeysymToKeycode(self.display, keysym)
+            if not keycode:
+                return None
+            # Needs shift if the keysym only sits on the shifted level of its key
+            shifted = self.x11.XKeycodeToKeysym(self.display, keycode, 0) != keysym and \
+                self.x11.XKeycodeToKeysym(self.display, keycode, 1) == keysym
+        return (keycode, shifted)
+
+    def resolve_button(self, button):
+        return self.BUTTON_CODES.get(button)
+
+    def settle(self):
+        """Wait for the server to take everything sent so far; returns the delay clients still need"""
+        with self.lock:
+            self.x11.XSync(self.display, 0)
+            typed, self._typed = self._typed, set()
+        return self.MAPPING_SETTLE if typed else 0
+
+    def send(self, events):
+        with self.lock:
+            for kind, code, down in events:
+                if kind == "key":
+                    self.xtst.XTestFakeKeyEvent(self.display, code, int(down), 0)
+                    if code in self._original_keysyms:
+                        self._typed.add(code)
+                elif kind == "move":
+                    self.xtst.XTestFakeMotionEvent(self.display, -1, code, down, 0)
+                elif kind == "map":
+                    if code in self._typed:
+                        # Reusing a keycode typed with its old keysym; let clients catch up first
+                        self.x11.XSync(self.display, 0)
+                        time.sleep(self.MAPPING_SETTLE)
+                        self._typed.clear()
+                    # code: keycode, down: its keysyms; the server applies it before the key events after it
+                    keysyms = (ctypes.c_ulong * len(down))(*down)
+                    self.x11.XChangeKeyboardMapping(self.display, code, len(down), keysyms, 1)
+                else:
+                    self.xtst.XTestFakeButtonEvent(self.display, code, int(down), 0)
+            self.x11.XFlush(self.display)
+
+
+def _linux_key_codes(named):
+    """Linux KEY_* codes (US layout) for letters, digits and function keys, plus named keys"""
+    codes = dict(named)
+    for i, c in enumerate("1234567890"):
+        codes[c] = 2 + i
+    for row, start in (("qwertyuiop", 16), ("asdfghjkl", 30), ("zxcvbnm", 44)):
+        for i, c in enumerate(row):
+            codes[c] = start + i
+    for i in range(10):
+        codes[f"f{i + 1}"] = 59 + i
+    codes["f11"], codes["f12"] = 87, 88
+    for i in range(12):
+        codes[f"f{i + 13}"] = 183 + i
+    return codes
+
+
+class UinputBackend:
+    """Linux without X (e.g. Wayland): a virtual device fed with one write() of packed input_events"""
+    name = "uinput"
+    can_move = False  # relative device; absolute moves go through the fallback
+
+    EV_SYN, EV_KEY, EV_REL = 0x00, 0x01, 0x02
+    SYN_REPORT = 0
+    REL_X, REL_Y = 0x00, 0x01
+    UI_SET_EVBIT = 0x40045564
+    UI_SET_KEYBIT = 0x40045565
+    UI_SET_RELBIT = 0x40045566
+    UI_DEV_CREATE = 0x5501
+    UI_DEV_DESTROY = 0x5502
+    EVENT_FORMAT = "llHHi"  # struct input_event: timeval, type, code, value
+
+    BUTTON_CODES = {"left": 0x110, "right": 0x111, "middle": 0x112}
+    KEY_CODES = _linux_key_codes({
+        "esc": 1, "escape": 1, "-": 12, "=": 13, "backspace": 14, "tab": 15, "\t": 15,
+        "[": 26, "]": 27, "enter": 28, "return": 28, "\n": 28, "ctrl": 29, ";": 39, "'": 40,
+        "`": 41, "shift": 42, "\\": 43, ",": 51, ".": 52, "/": 53, "alt": 56, "space": 57,
+        " ": 57, "capslock": 58, "numlock": 69, "scrolllock": 70, "home": 102, "up": 103,
+        "pageup": 104, "left": 105, "right": 106, "end": 107, "down": 108, "pagedown": 109,
+        "insert": 110, "delete": 111, "volumemute": 113, "volumedown": 114, "volumeup": 115,
+        "pause": 119, "win": 125, "windows": 125, "printscreen": 99, "playpause": 164,
+    })
+
+    def __init__(self, path="/dev/uinput"):
+        import fcntl
+        self.fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            fcntl.ioctl(self.fd, self.UI_SET_EVBIT, self.EV_KEY)
+            fcntl.ioctl(self.fd, self.UI_SET_EVBIT, self.EV_SYN)
+            fcntl.ioctl(self.fd, self.UI_SET_EVBIT, self.EV_REL)
+            fcntl.ioctl(self.fd, self.UI_SET_RELBIT, self.REL_X)
+            fcntl.ioctl(self.fd, self.UI_SET_RELBIT, self.REL_Y)
+            for code in set(self.KEY_CODES.values()) | set(self.BUTTON_CODES.values()):
+                fcntl.ioctl(self.fd, self.UI_SET_KEYBIT, code)
+
+            # Legacy uinput_user_dev: name[80], input_id, ff_effects_max, abs arrays
+            setup = struct.pack("80sHHHHi", b"macro-app virtual input", 0x03, 0x1, 0x1, 1, 0)
+            setup += b"\0" * (4 * 64 * 4)
+            os.write(self.fd, setup)
+            fcntl.ioctl(self.fd, self.UI_DEV_CREATE)
+        except OSError:
+            os.close(self.fd)
+            raise
+        self.lock = threading.Lock()
+        time.sleep(0.2)  # give the compositor time to pick up the new device
+
+    def resolve_key(self, key):
+        lowered = key.lower()
+        if lowered in self.KEY_CODES:
+            return (self.KEY_CODES[lowered], len(key) == 1 and key.isupper())
+        if key in US_SHIFTED:
+            return (self.KEY_CODES[US_SHIFTED[key]], True)
+        return None
+
+    def resolve_button(self, button):
+        return self.BUTTON_CODES.get(button)
+
+    def send(self, events):
+        packed = bytearray()
+        for kind, code, down in events:
+            packed += struct.pack(self.EVENT_FORMAT, 0, 0, self.EV_KEY, code, int(down))
+            packed += struct.pack(self.EVENT_FORMAT, 0, 0, self.EV_SYN, self.SYN_REPORT, 0)
+        with self.lock:
+            os.write(self.fd, bytes(packed))
+
+    def close(self):
+        import fcntl
+        try:
+            fcntl.ioctl(self.fd, self.UI_DEV_DESTROY)
+        finally:
+            os.close(self.fd)
+
+
+BACKENDS = {
+    "sendinput": SendInputBackend,
+    "xtest": XTestBackend,
+    "uinput": UinputBackend,
+    "pyautogui": PyAutoGuiBackend,
+}
+
+def _auto_backend_order():
+    if OS_TYPE == "Windows":
+        return ["sendinput", "pyautogui"]
+    if OS_TYPE == "Linux":
+        wayland = os.environ.get("XDG_SESSION_TYPE", "").lower() == "wayland" or os.environ.get("WAYLAND_DISPLAY")
+        if wayland:
+            return ["uinput", "xtest", "pyautogui"]
+        return ["xtest", "uinput", "pyautogui"]
+    return ["pyautogui"]
+
+_backend = None
+_fallback = None
+_backend_lock = threading.Lock()
+_key_cache = {}  # (backend name, key) -> (code, needs_shift) or None
+
+def get_backend(preferred="auto"):
+    """Create (once) and return the injection backend"""
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is None:
+            order = _auto_backend_order() if preferred in (None, "auto") else [preferred, "pyautogui"]
+            for name in order:
+                try:
+                    _backend = BACKENDS[name]()
+                    break
+                except Exception as e:
+                    event_log.warning(f"Input backend '{name}' unavailable: {e}")
+            if _backend is None:
+                raise RuntimeError(f"No input backend could be started (tried {', '.join(order)})")
+            event_log.info(f"Using '{_backend.name}' input backend")
+    return _backend
+
+def configure(preferred):
+    """Pick the backend named in global settings; only effective before first use"""
+    if _backend is None:
+        get_backend(preferred)
+
+def _get_fallback():
+    global _fallback
+    if _fallback is None:
+        _fallback = _backend if isinstance(_backend, PyAutoGuiBackend) else PyAutoGuiBackend()
+    return _fallback
+
+# === Batching ===
+class InputBatch:
+    """
+    Collects synthetic key and mouse events and sends them together on flush().
+    Keys the backend cannot map are sent through pyautogui, in order.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or get_backend()
+        self.events = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def __len__(self):
+        return len(self.events)
+
+    def _resolve(self, key):
+        cache_key = (self.backend.name, key)
+        try:
+            return _key_cache[cache_key]
+        except KeyError:
+            resolved = _key_cache[cache_key] = self.backend.resolve_key(key)
+            return resolved
+
+    def _fallback_key(self, key, down):
+        self.flush()
+        _get_fallback().send([("key", key, down)])
+
+    def key_down(self, key):
+        resolved = self._resolve(key)
+        if resolved is None:
+            self._fallback_key(key, True)
+        else:
+            self.events.append(("key", resolved[0], True))
+        return self
+
+    def key_up(self, key):
+        resolved = self._resolve(key)
+        if resolved is None:
+            self._fallback_key(key, False)
+        else:
+            self.events.append(("key", resolved[0], False))
+        return self
+
+    def press(self, key, presses=1):
+        resolved = self._resolve(key)
+        if resolved is None:
+            for _ in range(presses):
+                self._fallback_key(key, True)
+                self._fallback_key(key, False)
+            return self
+
+        code, shifted = resolved
+        shift = self._resolve("shift") if shifted else None
+        for _ in range(presses):
+            if shift:
+                self.events.append(("key", shift[0], True))
+            self.events.append(("key", code, True))
+            self.events.append(("key", code, False))
+            if shift:
+                self.events.append(("key", shift[0], False))
+        return self
+
+    def mouse_down(self, button="left"):
+        self.events.append(("button", self._button(button), True))
+        return self
+
+    def mouse_up(self, button="left"):
+        self.events.append(("button", self._button(button), False))
+        return self
+
+    def move_to(self, x, y):
+        """Put the pointer at absolute screen coordinates"""
+        if self.backend.can_move:
+            self.events.append(("move", int(x), int(y)))
+        else:
+            self.flush()
+            _get_fallback().send([("move", int(x), int(y))])
+        return self
+
+    def click(self, button="left", clicks=1):
+        code = self._button(button)
+        for _ in range(clicks):
+            self.events.append(("button", code, True))
+            self.events.append(("button", code, False))
+        return self
+
+    def _button(self, button):
+        code = self.backend.resolve_button(button if button in BUTTONS else "left")
+        if code is None:
+            raise ValueError(f"Unsupported mouse button: {button}")
+        return code
+
+    def flush(self):
+        """Send everything queued so far; returns the number of events sent"""
+        events, self.events = self.events, []
+        if events:
+            self.backend.send(events)
+        return len(events)
+
+# === Convenience ===
+def press(key, presses=1):
+    InputBatch().press(key, presses).flush()
+
+def key_down(key):
+    InputBatch().key_down(key).flush()
+
+def key_up(key):
+    InputBatch().key_up(key).flush()
+
+def click(button="left", clicks=1):
+    InputBatch().click(button, clicks).flush()
+
+def move_to(x, y):
+    InputBatch().move_to(x, y).flush()
+
+# === Text ===
+TEXT_KEYS = {"\n": "enter", "\t": "tab"}
+
+class CompiledText:
+    """
+    A string compiled to backend events once; ends[i] is the event count after
+    character i, so playback can send any run of characters as one slice.
+    ("fallback", char, None) events are characters only pyautogui can type;
+    characters nothing can type are left out and listed in `missing`.
+    """
+    __slots__ = ("events", "ends", "shift", "restore", "missing")
+
+    def __init__(self, events, ends, shift, restore=(), missing=""):
+        self.events = events
+        self.ends = ends
+        self.shift = shift  # shift keycode if the text uses it (released if typing is cut short)
+        self.restore = restore  # events sent after typing, however it ends (e.g. borrowed keycodes)
+        self.missing = missing
+
+def compile_text(text):
+    backend = get_backend()
+    batch = InputBatch(backend)
+    shift = batch._resolve("shift")
+    unicode_events = getattr(backend, "unicode_events", None)
+    state = {}
+    events, ends = [], []
+    missing = []
+    shift_down = False
+    uses_shift = False
+
+    for char in text.replace("\r\n", "\n"):
+        resolved = batch._resolve(TEXT_KEYS.get(char, char))
+        extra = None
+        if resolved is None and unicode_events is not None:
+            extra = unicode_events(char, state)
+        needs_shift = bool(resolved and resolved[1])
+        # Shift stays down across a run of shifted characters instead of wrapping each one
+        if shift and needs_shift != shift_down:
+            events.append(("key", shift[0], needs_shift))
+            shift_down = needs_shift
+            uses_shift = True
+        if resolved is not None:
+            events += [("key", resolved[0], True), ("key", resolved[0], False)]
+        elif extra:
+            events += extra
+        elif _get_fallback().can_type(char):
+            events.append(("fallback", char, None))
+        elif char not in missing:
+            missing.append(char)
+        ends.append(len(events))
+
+    if shift_down:
+        events.append(("key", shift[0], False))
+        ends[-1] = len(events)
+    restore_events = getattr(backend, "restore_events", None)
+    restore = restore_events(state) if restore_events is not None else []
+    return CompiledText(events, ends, shift[0] if shift and uses_shift else None, restore, "".join(missing))
+
+def settle():
+    """Seconds to wait before sending a CompiledText's restore events (0 if none are needed)"""
+    backend = get_backend()
+    return backend.settle() if hasattr(backend, "settle") else 0
+
+def send_events(events):
+    """Send precompiled events, routing "fallback" characters through pyautogui in order"""
+    backend = get_backend()
+    start = 0
+    for i, event in enumerate(events):
+        if event[0] == "fallback":
+            if i > start:
+                backend.send(events[start:i])
+            fallback = _get_fallback()
+            fallback.send([("key", event[1], True), ("key", event[1], False)])
+            start = i + 1
+    if start < len(events):
+        backend.send(events[start:] if start else events)
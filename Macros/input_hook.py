@@ -0,0 +1,453 @@
+import os
+import json
+import time
+import asyncio
+import platform
+import threading
+from collections import deque
+
+import keyboard
+
+import event_log
+import screen_watch
+from abbreviations import AbbreviationMatcher
+from sequences import Binding, SequenceMachine, SequenceTracker
+from profile_layers import compile_profiles
+from macro_compiler import child_matching_exes
+from key_conflicts import BUILTIN_HOTKEYS
+from window_utils import get_foreground_window, get_ancestor_names, get_process_identity
+
+OS_TYPE = platform.system()
+
+FOCUS_INTERVAL = 0.02  # seconds between foreground-window checks (global "focus_interval")
+IDLE_FOCUS_INTERVAL = 0.5  # ...once nothing has happened for IDLE_AFTER seconds ("idle_focus_interval")
+IDLE_POLL_INTERVAL = 0.05  # trigger polling without a keyboard hook, when idle ("idle_poll_interval")
+IDLE_AFTER = 2.0
+CONFIG_POLL_INTERVAL = 0.5
+SCREEN_RETRY = 1.0  # seconds before retrying a failed screen capture, doubling up to SCREEN_RETRY_MAX
+SCREEN_RETRY_MAX = 30.0
+
+# Keys that don't type anything and leave a half-typed abbreviation alone; any other
+# non-character key (enter, arrows, tab...) starts it over
+MODIFIER_KEYS = frozenset((
+    "shift", "left shift", "right shift", "caps lock",
+    "ctrl", "left ctrl", "right ctrl", "alt", "left alt", "right alt", "alt gr",
+    "windows", "left windows", "right windows",
+))
+SHORTCUT_MODIFIERS = ("ctrl", "alt", "windows")
+
+def load_trigger_tables(config):
+    """Compiled triggers per runner key: exe name, or None for the Desktop fallback (layers merged)"""
+    return compile_profiles(config)
+
+# === Idle Backoff ===
+class Backoff:
+    """
+    Wait interval that stays at `fast` while there is activity, doubles up to `slow`
+    once things have been quiet for IDLE_AFTER seconds, and snaps back on touch().
+    """
+
+    def __init__(self, fast, slow):
+        self.fast = fast
+        self.slow = slow
+        self.current = fast
+        self.last_activity = time.monotonic()
+        self._wake = None
+
+    def touch(self):
+        """Record activity; a wait that has backed off ends immediately"""
+        self.last_activity = time.monotonic()
+        backed_off = self.current > self.fast
+        self.current = self.fast
+        if backed_off and self._wake is not None:
+            self._wake.set()
+
+    async def wait(self):
+        if time.monotonic() - self.last_activity < IDLE_AFTER:
+            self.current = self.fast
+        else:
+            self.current = min(self.current * 2, max(self.slow, self.fast))
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), self.current)
+        except asyncio.TimeoutError:
+            pass
+
+# === Input Hook ===
+class InputHook:
+    """
+    Focus tracking and trigger edge detection. Nothing here injects input; every
+    change is reported through send(event) as one of
+    ("focus", key), ("window", title, process), ("trigger", key, macro_name, pressed)
+    or ("hotkey", hotkey).
+    """
+
+    def __init__(self, config_path, send):
+        self.config_path = config_path
+        self.send = send
+        self.tables = {None: []}
+        self.active_key = None
+        self.proc_name = None
+        self.proc_ancestors = ()  # names of the focused process's parents, when any profile matches children
+        self.resolved_ancestry = (None, ())  # (get_process_identity(), ancestor names) last walked by read_focus
+        self.ancestor_keys = set()  # exe keys whose profile also covers child processes
+        self.pinned = False  # True while a profile is forced through the control API
+        self.pressed = {}  # macro name -> state last reported for the active table
+        self.hotkey_states = {}
+        self.last_window_info = ""
+        self.config_mtime = None
+        self.global_settings = {}
+        self.loop = None
+        self._stop_event = None
+        self._hook = None
+        self._input_pending = False
+        self.screen_tables = {}  # runner key -> compiled pixel/region triggers
+        self.screen_watchers = {}  # runner key -> ScreenWatcher, built on first use
+        self.screen_interval = screen_watch.SCREEN_INTERVAL
+        self._screen_wake = None
+        self.matchers = {}  # runner key -> AbbreviationMatcher, for tables with abbreviations
+        self.matcher = None  # the active table's; read by the keyboard hook thread
+        self.machines = {}  # runner key -> SequenceMachine, for tables with sequence triggers
+        self.sequences = SequenceTracker(self.report_trigger, self.call_later)
+        self._key_events = deque()  # (name, down, time) from the hook thread, drained on the loop
+        self.focus_backoff = Backoff(FOCUS_INTERVAL, IDLE_FOCUS_INTERVAL)
+        self.poll_backoff = Backoff(0.01, IDLE_POLL_INTERVAL)
+
+    def load_tables(self):
+        try:
+            self.config_mtime = os.path.getmtime(self.config_path)
+            with open(self.config_path, "r") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            event_log.error(f"Could not load {self.config_path}: {e}")
+            return
+        self.tables = load_trigger_tables(config)
+        self.ancestor_keys = child_matching_exes(config) & set(self.tables)
+        self.screen_tables = {key: [c for c in table if c.screen is not None] for key, table in self.tables.items()}
+        self.screen_watchers = {}
+        self.matchers = {}
+        for key, table in self.tables.items():
+            abbreviations = {c.abbreviation: c.name for c in table if c.abbreviation is not None}
+            if abbreviations:
+                self.matchers[key] = AbbreviationMatcher(abbreviations)
+        self.machines = {}
+        for key, table in self.tables.items():
+            bindings = [Binding(c) for c in table if c.sequence is not None]
+            if bindings:
+                try:
+                    self.machines[key] = SequenceMachine(bindings)
+                except ValueError as e:
+                    event_log.error(f"Sequences of {key or 'Desktop'}: {e}")
+        self.global_settings = settings = config.get("global", {})
+        self.screen_interval = settings.get("screen_interval", screen_watch.SCREEN_INTERVAL)
+        self.focus_backoff.fast = settings.get("focus_interval", FOCUS_INTERVAL)
+        self.focus_backoff.slow = settings.get("idle_focus_interval", IDLE_FOCUS_INTERVAL)
+        self.poll_backoff.fast = settings.get("loop_delay", 0.01)
+        self.poll_backoff.slow = settings.get("idle_poll_interval", IDLE_POLL_INTERVAL)
+        # The executor rebuilds its runners too; report held triggers again against the new tables
+        self.pressed = {}
+        if not self.pinned or self.active_key not in self.tables:
+            self.pinned = False
+            self.active_key = self.key_for(self.proc_name, self.proc_ancestors)
+        self.matcher = self.matchers.get(self.active_key)
+        self.sequences.use(self.machines.get(self.active_key))
+        self.poll()
+        self.wake_screen()
+
+    def key_for(self, proc_name, ancestors=()):
+        if proc_name in self.tables:
+            return proc_name
+        # Helper processes of a launcher/browser take the nearest matching ancestor's profile
+        for name in ancestors:
+            if name in self.ancestor_keys:
+                return name
+        return None
+
+    def set_focus(self, proc_name, ancestors=()):
+        self.proc_name = proc_name
+        self.proc_ancestors = ancestors
+        if not self.pinned:
+            self.switch(self.key_for(proc_name, ancestors))
+
+    def pin(self, key):
+        """Use one runner key's triggers regardless of the focused window"""
+        self.pinned = True
+        self.switch(key if key in self.tables else None)
+
+    def unpin(self):
+        self.pinned = False
+        self.switch(self.key_for(self.proc_name, self.proc_ancestors))
+
+    def switch(self, key):
+        if key == self.active_key:
+            return
+        self.focus_backoff.touch()
+        for name, is_pressed in self.pressed.items():
+            if is_pressed:
+                self.send(("trigger", self.active_key, name, False))
+        self.pressed = {}
+        self.active_key = key
+        self.matcher = self.matchers.get(key)
+        if self.matcher is not None:
+            self.matcher.reset()  # text typed elsewhere doesn't count
+        self.sequences.use(self.machines.get(key))
+        self.send(("focus", key))
+        self.poll()
+        self.wake_screen()
+
+    def poll(self):
+        """Read the focused profile's triggers and report the ones that changed"""
+        key = self.active_key
+        for compiled in self.tables.get(key, ()):
+            if compiled.key is None:
+                continue  # screen triggers are sampled by watch_screen, sequences and abbreviations fed key events
+            # Handle multiple modifiers by checking if all are pressed
+            is_pressed = keyboard.is_pressed(compiled.key) and all(keyboard.is_pressed(m) for m in compiled.modifiers)
+            if is_pressed != self.pressed.get(compiled.name, False):
+                self.pressed[compiled.name] = is_pressed
+                self.send(("trigger", key, compiled.name, is_pressed))
+
+    def check_hotkeys(self):
+        for hotkey in BUILTIN_HOTKEYS:
+            pressed = keyboard.is_pressed(hotkey)
+            if pressed and not self.hotkey_states.get(hotkey, False):
+                self.send(("hotkey", hotkey))
+            self.hotkey_states[hotkey] = pressed
+
+    # === Tasks ===
+    async def run(self):
+        """Track focus and triggers until stop() is called or the task is cancelled"""
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._screen_wake = asyncio.Event()
+        self.load_tables()
+
+        tasks = [
+            asyncio.ensure_future(self.track_focus()),
+            asyncio.ensure_future(self.watch_config()),
+            asyncio.ensure_future(self.watch_screen()),
+        ]
+        if not self.install_keyboard_hook():
+            tasks.append(asyncio.ensure_future(self.poll_input()))
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self._hook is not None:
+                try:
+                    keyboard.unhook(self._hook)
+                except Exception:
+                    pass
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def track_focus(self):
+        while True:
+            try:
+                # Window queries can block (xdotool on X11), so keep them off the loop thread
+                window_title, proc_name, ancestors = await self.loop.run_in_executor(None, self.read_focus)
+                if window_title != "Unknown" and proc_name != "Unknown":
+                    info = f"Focused Window: {window_title} | Process: {proc_name}"
+                    if info != self.last_window_info:
+                        self.last_window_info = info
+                        event_log.info(info, window=window_title, process=proc_name)
+                        self.send(("window", window_title, proc_name))
+                    self.set_focus(proc_name, ancestors)
+            except Exception as e:
+                event_log.error(f"loop cycle: {e}")
+            # Slows down while idle; a key event or focus change brings it straight back
+            await self.focus_backoff.wait()
+
+    def read_focus(self):
+        """Focused window and process, plus the process's ancestors when a profile matches children (worker thread)"""
+        window_title, proc_name, pid = get_foreground_window()
+        ancestors = ()
+        if pid is not None and self.ancestor_keys and proc_name not in self.tables:
+            # The walk up the tree runs only when the focused process changes, not every tick
+            identity = get_process_identity(pid)
+            if identity is not None:
+                resolved, ancestors = self.resolved_ancestry
+                if identity != resolved:
+                    ancestors = get_ancestor_names(pid)
+                    self.resolved_ancestry = (identity, ancestors)
+        return window_title, proc_name, ancestors
+
+    async def watch_config(self):
+        while True:
+            await asyncio.sleep(CONFIG_POLL_INTERVAL)
+            try:
+                mtime = os.path.getmtime(self.config_path)
+            except OSError:
+                continue
+            if mtime != self.config_mtime:
+                self.load_tables()
+
+    def wake_screen(self):
+        if self._screen_wake is not None and self.screen_tables.get(self.active_key):
+            self._screen_wake.set()
+
+    async def watch_screen(self):
+        """Sample the active table's pixel/region triggers every screen_interval; idle while it has none"""
+        capture = None
+        retry = None  # Backoff between attempts while no capture can be opened
+        while True:
+            key = self.active_key
+            if not self.screen_tables.get(key):
+                self._screen_wake.clear()
+                await self._screen_wake.wait()
+                continue
+            if capture is None:
+                capture = await self.loop.run_in_executor(None, screen_watch.open_capture,
+                                                          self.global_settings.get("screen_capture", "auto"))
+                if capture is None:
+                    if retry is None:
+                        retry = Backoff(SCREEN_RETRY, SCREEN_RETRY_MAX)
+                    event_log.error("Screen capture unavailable; screen triggers are paused until it opens")
+                    await retry.wait()
+                    continue
+                if retry is not None:
+                    event_log.info("Screen capture available; screen triggers resumed")
+                    retry = None
+                continue  # tables may have changed meanwhile
+
+            watcher = self.screen_watchers.get(key)
+            if watcher is None:
+                watcher = self.screen_watchers[key] = screen_watch.ScreenWatcher(self.screen_tables[key], capture)
+            started = time.monotonic()
+            try:
+                # The grab and the comparisons release the GIL; keep them off the loop thread
+                states = await self.loop.run_in_executor(None, watcher.sample)
+            except Exception as e:
+                event_log.error(f"screen sample: {e}")
+                states = {}
+            if key == self.active_key and self.screen_watchers.get(key) is watcher:
+                self.report_screen(key, states)
+            await asyncio.sleep(max(0.0, self.screen_interval - (time.monotonic() - started)))
+
+    def report_screen(self, key, states):
+        for name, is_pressed in states.items():
+            self.report_trigger(name, is_pressed)
+
+    def report_trigger(self, name, is_pressed):
+        """Send an edge for a trigger of the active table, if its state changed"""
+        if is_pressed != self.pressed.get(name, False):
+            self.pressed[name] = is_pressed
+            self.send(("trigger", self.active_key, name, is_pressed))
+
+    def call_later(self, delay, callback, *args):
+        return self.loop.call_later(delay, callback, *args)
+
+    async def poll_input(self):
+        """Fallback when no keyboard hook could be installed: read triggers every loop_delay, slower when idle"""
+        while True:
+            self.on_input()
+            if any(self.pressed.values()) or any(self.hotkey_states.values()):
+                self.poll_backoff.touch()
+            await self.poll_backoff.wait()
+
+    # === Input Events ===
+    def install_keyboard_hook(self):
+        try:
+            self._hook = keyboard.hook(self._on_key_event)
+            return True
+        except Exception as e:
+            event_log.warning(f"Keyboard hook unavailable ({e}); polling triggers instead (abbreviations are off)")
+            return False
+
+    def _on_key_event(self, event):
+        # Runs on the keyboard library's thread: coalesce bursts into one wakeup of the loop
+        matcher = self.matcher
+        if matcher is not None and event.event_type == "down":
+            self.feed_abbreviation(matcher, event.name)
+        self._key_events.append((event.name, event.event_type == "down", time.monotonic()))
+        if not self._input_pending:
+            self._input_pending = True
+            self.loop.call_soon_threadsafe(self.on_key_event)
+
+    def feed_abbreviation(self, matcher, name):
+        """Advance the active abbreviation automaton by one key press (keyboard hook thread)"""
+        if not name or name in MODIFIER_KEYS:
+            return
+        if name == "backspace":
+            matcher.backspace()
+            return
+        char = " " if name == "space" else name
+        if len(char) != 1 or any(keyboard.is_pressed(m) for m in SHORTCUT_MODIFIERS):
+            matcher.reset()
+            return
+        found = matcher.feed(char)
+        if found is not None:
+            self.loop.call_soon_threadsafe(self.report_abbreviation, matcher, found)
+
+    def report_abbreviation(self, matcher, name):
+        if matcher is not self.matcher:
+            return  # typed just before a focus change or reload
+        # A tap: the executor runs the macro once on the press
+        self.send(("trigger", self.active_key, name, True))
+        self.send(("trigger", self.active_key, name, False))
+
+    def on_key_event(self):
+        # Typing means someone is at the machine: re-check focus promptly from now on
+        self.focus_backoff.touch()
+        self.on_input()
+
+    def on_input(self):
+        self._input_pending = False
+        try:
+            events = self._key_events
+            while events:
+                self.sequences.key_event(*events.popleft())
+            self.poll()
+            self.check_hotkeys()
+        except Exception as e:
+            event_log.error(f"loop cycle: {e}")
+
+# === Process Entry Point ===
+def raise_priority():
+    """Best effort: detection should win the CPU over the editor and the executor"""
+    try:
+        import psutil
+        process = psutil.Process()
+        process.nice(psutil.HIGH_PRIORITY_CLASS if OS_TYPE == "Windows" else -5)
+    except Exception:
+        pass
+
+def run_input_hook(config_path, conn):
+    """Entry point of the input hook process; events go to the executor through conn"""
+    event_log.configure("input_hook", event_log.settings_from(config_path))
+    raise_priority()
+    hook = None
+
+    def send(event):
+        try:
+            conn.send(event)
+        except OSError:
+            hook.stop()  # executor is gone
+
+    def receive():
+        # Commands from the executor: ("pin", key) / ("unpin",)
+        while True:
+            try:
+                command = conn.recv()
+            except (EOFError, OSError):
+                return
+            if hook.loop is None:
+                continue
+            if command[0] == "pin":
+                hook.loop.call_soon_threadsafe(hook.pin, command[1])
+            elif command[0] == "unpin":
+                hook.loop.call_soon_threadsafe(hook.unpin)
+
+    hook = InputHook(config_path, send)
+    threading.Thread(target=receive, name="hook-commands", daemon=True).start()
+    try:
+        asyncio.run(hook.run())
+    except KeyboardInterrupt:
+        pass
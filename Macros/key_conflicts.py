@@ -0,0 +1,286 @@
+import sys
+import json
+from collections import namedtuple
+from itertools import combinations
+
+from macro_compiler import iter_macro_lists
+from abbreviations import AbbreviationMatcher
+
+# Hotkeys handled by the runtime itself (runtime.BUILTIN_ACTIONS), outside any profile
+BUILTIN_HOTKEYS = {
+    "ctrl+alt+m": "Mouse Info",
+}
+
+# Spellings that the keyboard library treats as the same physical key
+KEY_ALIASES = {
+    "control": "ctrl",
+    "left ctrl": "ctrl",
+    "right ctrl": "ctrl",
+    "left control": "ctrl",
+    "right control": "ctrl",
+    "left alt": "alt",
+    "option": "alt",
+    "left shift": "shift",
+    "right shift": "shift",
+    "win": "windows",
+    "left windows": "windows",
+    "right windows": "windows",
+    "command": "windows",
+    "cmd": "windows",
+    "return": "enter",
+    "escape": "esc",
+    "comma": ",",
+}
+
+# Chords larger than this are not expanded into subsets (keeps the scan linear)
+MAX_CHORD_SIZE = 6
+
+# other_layer names the list the other macro comes from when it is inherited from another layer
+Conflict = namedtuple("Conflict", "kind profile exe index name other_index other_name trigger other_layer",
+                      defaults=(None,))
+
+# === Trigger Parsing ===
+def normalize_key(name):
+    name = " ".join(str(name).strip().lower().split())
+    return KEY_ALIASES.get(name, name)
+
+def parse_chord(text, separator="+"):
+    return frozenset(normalize_key(part) for part in str(text).split(separator) if part.strip())
+
+def parse_trigger(macro):
+    """Return the set of keys that must be held for a macro to fire, or None for untriggered macros"""
+    key = macro.get("key")
+    if not key or "trigger" in macro or "sequence" in macro or "abbreviation" in macro:
+        return None
+    chord = parse_chord(key)
+    mod = macro.get("modifier")
+    if mod:
+        chord = chord | parse_chord(mod, "&")
+    return chord or None
+
+def format_chord(chord):
+    modifiers = ("ctrl", "alt", "shift", "windows")
+    ordered = [k for k in modifiers if k in chord] + sorted(k for k in chord if k not in modifiers)
+    return "+".join(ordered)
+
+def describe_trigger(macro):
+    """How a macro's trigger is shown in conflict reports"""
+    chord = parse_trigger(macro)
+    if chord is not None:
+        return format_chord(chord)
+    if "trigger" in macro:
+        return "screen trigger"
+    if "sequence" in macro:
+        return macro["sequence"]
+    return f'"{macro.get("abbreviation")}"'
+
+# === Analyzer ===
+def _builtin_index():
+    # The keyboard library fires a hotkey only for its exact modifiers and key
+    return [(parse_chord(text), text, label) for text, label in BUILTIN_HOTKEYS.items()]
+
+def analyze_macros(profile_name, exe_name, macros, builtins=None):
+    """Find conflicts inside one macro list"""
+    if builtins is None:
+        builtins = _builtin_index()
+
+    conflicts = []
+    by_chord = {}
+
+    for i, macro in enumerate(macros):
+        if not isinstance(macro, dict):
+            continue
+        chord = parse_trigger(macro)
+        if chord is None:
+            continue
+        by_chord.setdefault(chord, []).append(i)
+
+        for builtin_chord, text, label in builtins:
+            if chord == builtin_chord:
+                conflicts.append(Conflict("builtin", profile_name, exe_name, i, macro.get("name"),
+                                          None, f"{label} ({text})", format_chord(chord)))
+
+    def name_of(i):
+        return macros[i].get("name")
+
+    for chord, indices in by_chord.items():
+        # Exact duplicates: every later binding collides with the first one
+        first = indices[0]
+        for i in indices[1:]:
+            if "when" in macros[i] and "when" in macros[first]:
+                continue  # guarded bindings of one key are meant to take turns
+            conflicts.append(Conflict("duplicate", profile_name, exe_name, i, name_of(i),
+                                      first, name_of(first), format_chord(chord)))
+
+        # Shadowing: any binding whose chord is a strict subset also fires
+        if len(chord) < 2 or len(chord) > MAX_CHORD_SIZE:
+            continue
+        for size in range(1, len(chord)):
+            for subset in combinations(chord, size):
+                shadowing = by_chord.get(frozenset(subset))
+                if not shadowing:
+                    continue
+                # Duplicates of the shorter binding are already reported above
+                j = shadowing[0]
+                for i in indices:
+                    conflicts.append(Conflict("shadowed", profile_name, exe_name, i, name_of(i),
+                                              j, name_of(j), format_chord(chord)))
+
+    conflicts.extend(_sequence_conflicts(profile_name, exe_name, macros, by_chord))
+    conflicts.extend(_abbreviation_conflicts(profile_name, exe_name, macros))
+    conflicts.sort(key=lambda c: c.index)
+    return conflicts
+
+def _sequence_conflicts(profile_name, exe_name, macros, by_chord):
+    """Sequences typed twice, or whose first step already fires a key trigger or one-step sequence"""
+    conflicts = []
+    sequences = {}
+    for i, macro in enumerate(macros):
+        if not isinstance(macro, dict) or "trigger" in macro or not isinstance(macro.get("sequence"), str):
+            continue
+        steps = tuple(parse_chord(step) for step in macro["sequence"].split(","))
+        if not all(steps):
+            continue
+        steps = (steps, macro.get("gesture"))
+        if steps in sequences:
+            j = sequences[steps]
+            conflicts.append(Conflict("duplicate", profile_name, exe_name, i, macro.get("name"),
+                                      j, macros[j].get("name"), macro["sequence"]))
+        else:
+            sequences[steps] = i
+
+    for (steps, gesture), i in sequences.items():
+        if len(steps) < 2 and gesture is None:
+            continue
+        shorter = list(by_chord.get(steps[0], ()))
+        if ((steps[0],), None) in sequences:
+            shorter.append(sequences[((steps[0],), None)])
+        for j in shorter:
+            conflicts.append(Conflict("shadowed", profile_name, exe_name, i, macros[i].get("name"),
+                                      j, macros[j].get("name"), macros[i]["sequence"]))
+    return conflicts
+
+def _abbreviation_conflicts(profile_name, exe_name, macros):
+    """Same abbreviation twice, or one that fires before a longer one can be finished"""
+    conflicts = []
+    first = {}
+    for i, macro in enumerate(macros):
+        if not isinstance(macro, dict) or "trigger" in macro:
+            continue
+        text = macro.get("abbreviation")
+        if not isinstance(text, str) or not text:
+            continue
+        if text in first:
+            j = first[text]
+            conflicts.append(Conflict("duplicate", profile_name, exe_name, i, macro.get("name"),
+                                      j, macros[j].get("name"), f'"{text}"'))
+        else:
+            first[text] = i
+
+    # Type each abbreviation into the same automaton the hook uses: a different match
+    # before (or at) its last character means it can never fire
+    matcher = AbbreviationMatcher(first)
+    for text, i in first.items():
+        matcher.reset()
+        for char in text:
+            j = matcher.feed(char)
+            if j is not None:
+                if j != i:
+                    conflicts.append(Conflict("shadowed", profile_name, exe_name, i, macros[i].get("name"),
+                                              j, macros[j].get("name"), f'"{text}"'))
+                break
+    return conflicts
+
+def find_layer_conflicts(config, profiles=None):
+    """
+    Conflicts between layers, found in the merged tables the runtime loads (Global ->
+    profile -> exe, and Desktop on Global). Each is reported once, on the macro from
+    the more specific layer: "hides" when it takes the trigger of an inherited macro
+    with another name, "shadowed"/"shadows" when one chord fires along with the other.
+    """
+    from profile_layers import compile_layers  # profile_layers builds on the parsing above
+
+    where = {id(macro): (profile_name, exe_name, i)
+             for profile_name, exe_name, macros in iter_macro_lists(config) for i, macro in enumerate(macros)}
+    conflicts = []
+    seen = set()
+
+    def report(kind, own, other, trigger):
+        if (kind, id(own), id(other)) in seen:
+            return
+        seen.add((kind, id(own), id(other)))
+        profile_name, exe_name, index = where[id(own)]
+        if profiles is not None and profile_name not in profiles:
+            return
+        other_profile, other_exe, other_index = where[id(other)]
+        conflicts.append(Conflict(kind, profile_name, exe_name, index, own.get("name"), other_index,
+                                  other.get("name"), trigger, _layer_name(other_profile, other_exe)))
+
+    for layer in compile_layers(config).values():
+        table = [c.macro for c in layer.table]
+        for c in analyze_macros(None, None, table, builtins=()):
+            if where[id(table[c.index])][:2] == where[id(table[c.other_index])][:2]:
+                continue  # both in one list: analyze_macros reports it there
+            # Inherited macros come first in the table, so the higher index is the more specific layer
+            if c.index > c.other_index:
+                report(c.kind, table[c.index], table[c.other_index], c.trigger)
+            else:
+                kind = "shadows" if c.kind == "shadowed" else c.kind
+                report(kind, table[c.other_index], table[c.index], describe_trigger(table[c.other_index]))
+        while layer is not None:
+            for own, hidden in layer.hidden:
+                report("hides", own.macro, hidden.macro, describe_trigger(own.macro))
+            layer = layer.base
+    conflicts.sort(key=lambda c: (c.profile, c.exe or "", c.index))
+    return conflicts
+
+def _layer_name(profile_name, exe_name):
+    return profile_name if not exe_name else f"{profile_name}/{exe_name}"
+
+def find_conflicts(config, profiles=None):
+    """Analyze every macro list in config (or only the named profiles), then the layers they are merged into"""
+    builtins = _builtin_index()
+    conflicts = []
+    for profile_name, exe_name, macros in iter_macro_lists(config):
+        if profiles is not None and profile_name not in profiles:
+            continue
+        conflicts.extend(analyze_macros(profile_name, exe_name, macros, builtins))
+    conflicts.extend(find_layer_conflicts(config, profiles))
+    return conflicts
+
+def describe(conflict):
+    where = _layer_name(conflict.profile, conflict.exe)
+    other = f"'{conflict.other_name}'"
+    if conflict.other_layer is not None:
+        other += f" from {conflict.other_layer}"
+    if conflict.kind == "duplicate":
+        return f"[{where}] '{conflict.name}' uses the same trigger ({conflict.trigger}) as {other}"
+    if conflict.kind == "shadowed":
+        return f"[{where}] '{conflict.name}' ({conflict.trigger}) also fires {other}"
+    if conflict.kind == "shadows":
+        return f"[{where}] '{conflict.name}' ({conflict.trigger}) also fires when {other} is triggered"
+    if conflict.kind == "hides":
+        return f"[{where}] '{conflict.name}' ({conflict.trigger}) replaces {other} here"
+    return f"[{where}] '{conflict.name}' ({conflict.trigger}) collides with built-in hotkey {conflict.other_name}"
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else "config.json"
+    try:
+        with open(path, "r") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[Error] Could not read {path}: {e}")
+        return 2
+
+    conflicts = find_conflicts(config)
+    for conflict in conflicts:
+        print(describe(conflict))
+    if conflicts:
+        print(f"{len(conflicts)} conflict(s) found.")
+        return 1
+    print("No key conflicts found.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
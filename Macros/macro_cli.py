@@ -0,0 +1,426 @@
+import os
+import sys
+import csv
+import json
+import argparse
+from fnmatch import fnmatchcase
+
+from config_journal import write_config_atomic
+from macro_compiler import (validate_config, validate_macro, validate_trigger, iter_macro_lists, ScreenTrigger,
+                            BOOL_FIELDS, NUMBER_FIELDS)
+from key_conflicts import find_conflicts, describe
+from profile_layers import compile_profiles
+from control_api import ControlClient, ControlError
+
+CSV_FIELDS = ["profile", "exe", "name", "key", "modifier", "type", "key_to_press",
+              "Interval", "function_name", "run_once", "toggle"]
+
+# Fields that are always text in config.json, even when a cell looks like a number or JSON
+STRING_FIELDS = ("profile", "exe", "name", "key", "modifier", "type", "key_to_press", "function_name",
+                 "text", "abbreviation", "sequence", "gesture", "when", "variable", "image", "curve")
+INTEGER_FIELDS = ("add", "set")  # variable macros
+
+class CliError(Exception):
+    pass
+
+# === Config Access ===
+def load_config(path):
+    if not os.path.exists(path):
+        return {"profiles": {}, "global": {"loop_delay": 0.001}}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except ValueError as e:
+        raise CliError(f"{path} is not valid JSON: {e}")
+
+def get_macro_list(config, profile, exe=None, create=False):
+    """Find the macro list of a profile (optionally a specific exe entry), creating it if asked"""
+    profiles = config.setdefault("profiles", {})
+    profile_data = profiles.get(profile)
+    if profile_data is None:
+        if not create:
+            raise CliError(f"Profile '{profile}' does not exist.")
+        profile_data = profiles[profile] = {exe: {"macros": []}} if exe else {"macros": []}
+
+    if exe:
+        data = profile_data.get(exe)
+        if not isinstance(data, dict) or "macros" not in data:
+            if not create:
+                raise CliError(f"Profile '{profile}' has no exe '{exe}'.")
+            data = profile_data[exe] = {"macros": []}
+        return data["macros"]
+
+    if "macros" in profile_data:
+        return profile_data["macros"]
+    for data in profile_data.values():
+        if isinstance(data, dict) and "macros" in data:
+            return data["macros"]
+    if not create:
+        raise CliError(f"Profile '{profile}' has no macros.")
+    profile_data["macros"] = []
+    return profile_data["macros"]
+
+def upsert_macro(macros, macro):
+    """Replace the macro with the same name, or append it"""
+    for i, existing in enumerate(macros):
+        if existing.get("name") == macro.get("name"):
+            macros[i] = macro
+            return "updated"
+    macros.append(macro)
+    return "added"
+
+def find_index(macros, name):
+    for i, macro in enumerate(macros):
+        if macro.get("name") == name:
+            return i
+    raise CliError(f"Macro '{name}' not found.")
+
+# === Bulk Input ===
+def parse_value(field, text):
+    """Convert a CSV cell to the type config.json uses for that field"""
+    if field in STRING_FIELDS:
+        return text
+    if field in BOOL_FIELDS:
+        return text.strip().lower() in ("1", "true", "yes", "y")
+    if field == "Interval" or field in NUMBER_FIELDS or field in INTEGER_FIELDS:
+        try:
+            value = float(text)
+        except ValueError:
+            raise CliError(f"{field} '{text}' is not a number.")
+        integer = field in INTEGER_FIELDS or NUMBER_FIELDS.get(field, (0, False))[1]
+        return int(value) if integer and value.is_integer() else value
+    # Other fields (confidence, rate, region, jitter, ...) take numbers, booleans, lists and objects as JSON
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        if text.strip()[:1] in ("[", "{"):
+            raise CliError(f"{field} is not valid JSON: {e}")
+    return text
+
+def read_records(path, fmt=None):
+    """Read macro records from JSON or CSV; each record may carry 'profile' and 'exe'"""
+    if fmt is None:
+        fmt = "csv" if path.lower().endswith(".csv") else "json"
+
+    stream = sys.stdin if path == "-" else open(path, "r", newline="")
+    try:
+        if fmt == "csv":
+            records = []
+            for row in csv.DictReader(stream):
+                record = {}
+                for field, text in row.items():
+                    if field is None or text is None or text == "":
+                        continue
+                    record[field.strip()] = parse_value(field.strip(), text)
+                records.append(record)
+            return records
+
+        data = json.load(stream)
+    except ValueError as e:
+        raise CliError(f"Could not parse {path}: {e}")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    if isinstance(data, dict) and "profiles" in data:
+        # A whole (or partial) config.json: flatten into records
+        records = []
+        for profile_name, exe_name, macros in iter_macro_lists(data):
+            for macro in macros:
+                records.append(dict(macro, profile=profile_name, exe=exe_name))
+        return records
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not all(isinstance(r, dict) for r in data):
+        raise CliError("JSON input must be a config, a macro object or a list of macro objects.")
+    return data
+
+def apply_records(config, records, default_profile=None, default_exe=None):
+    """Validate every record, then add or update them all; nothing is written if any is invalid"""
+    placed = []
+    problems = []
+    for record in records:
+        macro = dict(record)
+        profile = macro.pop("profile", None) or default_profile
+        exe = macro.pop("exe", None) or default_exe
+        if not profile:
+            raise CliError(f"Macro '{macro.get('name')}' has no profile (use --profile).")
+        for message in validate_macro(macro, needs_key=profile != "OnBoot"):
+            problems.append(f"{macro.get('name') or '<unnamed>'}: {message}")
+        placed.append((profile, exe, macro))
+    if problems:
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        raise CliError(f"{len(problems)} problem(s) found; config.json was not changed.")
+
+    counts = {"added": 0, "updated": 0}
+    for profile, exe, macro in placed:
+        counts[upsert_macro(get_macro_list(config, profile, exe, create=True), macro)] += 1
+    return counts
+
+# === Commands ===
+def cmd_list(config, args):
+    for profile_name, exe_name, macros in iter_macro_lists(config):
+        if args.profile and profile_name != args.profile:
+            continue
+        header = profile_name if not exe_name else f"{profile_name} [{exe_name}]"
+        print(f"{header} ({len(macros)} macros)")
+        for i, macro in enumerate(macros):
+            trigger = macro.get("key") or ""
+            if isinstance(macro.get("trigger"), dict) and not validate_trigger(macro["trigger"]):
+                trigger = ScreenTrigger(macro["trigger"]).describe()
+            elif isinstance(macro.get("sequence"), str):
+                trigger = macro["sequence"] + (f" ({macro['gesture']})" if macro.get("gesture") else "")
+            elif isinstance(macro.get("abbreviation"), str):
+                trigger = f'typed "{macro["abbreviation"]}"'
+            elif macro.get("modifier"):
+                trigger = f"{macro['modifier'].replace(' ', '')}&{trigger}"
+            print(f"  {i:>4}  {macro.get('name', ''):<28} {trigger:<20} {macro.get('type', '')}")
+    return False
+
+def cmd_add(config, args):
+    if args.json:
+        try:
+            macro = json.loads(args.json)
+        except ValueError as e:
+            raise CliError(f"--json is not valid JSON: {e}")
+    else:
+        if not args.name:
+            raise CliError("add needs --name or --json.")
+        macro = {"name": args.name, "key": args.key, "type": args.type}
+        if args.modifier:
+            macro["modifier"] = args.modifier
+        if args.key_to_press:
+            macro["key_to_press"] = args.key_to_press
+        if args.function:
+            macro["function_name"] = args.function
+        if args.interval is not None:
+            macro["Interval"] = args.interval
+        macro["run_once"] = args.run_once
+        macro["toggle"] = args.toggle
+    result = apply_records(config, [macro], args.profile, args.exe)
+    print(f"Macro '{macro.get('name')}' {'added' if result['added'] else 'updated'}.")
+    return True
+
+def cmd_remove(config, args):
+    macros = get_macro_list(config, args.profile, args.exe)
+    keep = [m for m in macros if not any(fnmatchcase(m.get("name", ""), pattern) for pattern in args.names)]
+    removed = len(macros) - len(keep)
+    if not removed:
+        raise CliError("No matching macros.")
+    macros[:] = keep
+    print(f"Removed {removed} macro(s).")
+    return True
+
+def cmd_move(config, args):
+    macros = get_macro_list(config, args.profile, args.exe)
+    macro = macros.pop(find_index(macros, args.name))
+
+    if args.to_profile:
+        target = get_macro_list(config, args.to_profile, args.to_exe, create=True)
+    else:
+        target = macros
+    position = len(target) if args.to is None else max(0, min(args.to, len(target)))
+    target.insert(position, macro)
+    print(f"Moved '{args.name}' to position {position}" + (f" of '{args.to_profile}'." if args.to_profile else "."))
+    return True
+
+def cmd_import(config, args):
+    records = read_records(args.file, args.format)
+    counts = apply_records(config, records, args.profile, args.exe)
+    print(f"Imported {len(records)} macro(s): {counts['added']} added, {counts['updated']} updated.")
+    return True
+
+def cmd_export(config, args):
+    rows = []
+    for profile_name, exe_name, macros in iter_macro_lists(config):
+        if args.profile and profile_name != args.profile:
+            continue
+        for macro in macros:
+            rows.append(dict(macro, profile=profile_name, exe=exe_name))
+
+    out = sys.stdout if not args.output or args.output == "-" else open(args.output, "w", newline="")
+    try:
+        if args.format == "csv":
+            extra = sorted({k for row in rows for k in row} - set(CSV_FIELDS))
+            writer = csv.DictWriter(out, fieldnames=CSV_FIELDS + extra)
+            writer.writeheader()
+            for row in rows:
+                # Lists and objects as JSON, which import reads back
+                writer.writerow({k: "" if v is None else json.dumps(v) if isinstance(v, (dict, list)) else v
+                                 for k, v in row.items()})
+        else:
+            for row in rows:
+                if row["exe"] is None:
+                    del row["exe"]
+            json.dump(rows, out, indent=2)
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return False
+
+def cmd_validate(config, args):
+    problems = validate_config(config)
+    for profile_name, exe_name, name, message in problems:
+        where = profile_name if not exe_name else f"{profile_name}/{exe_name}"
+        print(f"[{where}] {name or '<unnamed>'}: {message}" if profile_name else message)
+    if problems:
+        raise CliError(f"{len(problems)} problem(s) found.")
+    print("Config is valid.")
+    return False
+
+def cmd_check(config, args):
+    conflicts = find_conflicts(config, [args.profile] if args.profile else None)
+    for conflict in conflicts:
+        print(describe(conflict))
+    if conflicts:
+        raise CliError(f"{len(conflicts)} conflict(s) found.")
+    print("No key conflicts found.")
+    return False
+
+def cmd_compile(config, args):
+    table = {}
+    skipped = 0
+
+    def on_error(profile_name, exe_name, macro, errors):
+        nonlocal skipped
+        skipped += 1
+        print(f"[Warning] Skipping '{macro.get('name')}': {', '.join(errors)}")
+
+    # The tables the runtime loads: Global and profile layers merged into each exe (and Desktop)
+    for key, compiled in compile_profiles(config, on_error).items():
+        table[key or "Desktop"] = [cm.to_dict() for cm in compiled]
+
+    total = sum(len(v) for v in table.values())
+    print(f"Compiled {total} macro(s) in {len(table)} trigger table(s), skipped {skipped}.")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(table, f, indent=2)
+    return False
+
+def parse_fields(pairs):
+    """FIELD=VALUE arguments; values are JSON when they parse as JSON, strings otherwise"""
+    fields = {}
+    for pair in pairs:
+        field, sep, text = pair.partition("=")
+        if not sep or not field:
+            raise CliError(f"Expected FIELD=VALUE, got '{pair}'.")
+        try:
+            fields[field] = json.loads(text)
+        except ValueError:
+            fields[field] = text
+    return fields
+
+def cmd_ctl(config, args):
+    fields = parse_fields(args.fields)
+    try:
+        with ControlClient(args.address) as client:
+            if args.cmd == "subscribe":
+                try:
+                    for event in client.events():
+                        print(json.dumps(event), flush=True)
+                except KeyboardInterrupt:
+                    pass
+                return False
+            reply = client.request(args.cmd, **fields)
+    except ControlError as e:
+        raise CliError(str(e))
+    except OSError as e:
+        raise CliError(f"Could not reach the running macros (is the tray app started?): {e}")
+    reply.pop("ok", None)
+    reply.pop("id", None)
+    if reply:
+        print(json.dumps(reply, indent=2))
+    return False
+
+# === Entry Point ===
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m macros", description="Manage config.json without the editor.")
+    parser.add_argument("--config", default="config.json", help="path to config.json (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def target(p, required=True):
+        p.add_argument("--profile", required=required)
+        p.add_argument("--exe", help="exe entry inside the profile")
+
+    p = sub.add_parser("list", help="list profiles and macros")
+    p.add_argument("--profile")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("add", help="add or update a macro")
+    target(p)
+    p.add_argument("--json", help="macro as a JSON object")
+    p.add_argument("--name")
+    p.add_argument("--key")
+    p.add_argument("--modifier")
+    p.add_argument("--type", default="keyboard_press")
+    p.add_argument("--key-to-press")
+    p.add_argument("--function")
+    p.add_argument("--interval", type=float)
+    p.add_argument("--run-once", action="store_true")
+    p.add_argument("--toggle", action="store_true")
+    p.set_defaults(func=cmd_add)
+
+    p = sub.add_parser("remove", help="remove macros by name (glob patterns allowed)")
+    target(p)
+    p.add_argument("names", nargs="+")
+    p.set_defaults(func=cmd_remove)
+
+    p = sub.add_parser("move", help="reorder a macro or move it to another profile")
+    target(p)
+    p.add_argument("name")
+    p.add_argument("--to", type=int, help="new position (default: end)")
+    p.add_argument("--to-profile")
+    p.add_argument("--to-exe")
+    p.set_defaults(func=cmd_move)
+
+    p = sub.add_parser("import", help="add or update macros from a JSON or CSV file ('-' for stdin)")
+    target(p, required=False)
+    p.add_argument("file")
+    p.add_argument("--format", choices=["json", "csv"])
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="write macros as JSON or CSV")
+    p.add_argument("--profile")
+    p.add_argument("--format", choices=["json", "csv"], default="json")
+    p.add_argument("-o", "--output")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("validate", help="check every macro against the schema")
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("check", help="report key conflicts and shadowed bindings")
+    p.add_argument("--profile")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("compile", help="build the runtime trigger tables")
+    p.add_argument("-o", "--output", help="write the compiled tables as JSON")
+    p.set_defaults(func=cmd_compile)
+
+    p = sub.add_parser("ctl", help="send a command to the running macros over the control API")
+    p.add_argument("cmd", help="ping, status, list, trigger, start, stop, profile, metrics, stats, vars or subscribe")
+    p.add_argument("fields", nargs="*", metavar="FIELD=VALUE", help="e.g. name=Spam exe=game.exe pressed=true")
+    p.add_argument("--address", help="socket path or named pipe (default: per-user address)")
+    p.set_defaults(func=cmd_ctl)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        config = load_config(args.config)
+        changed = args.func(config, args)
+        if changed:
+            # Every change from one invocation lands in a single atomic write
+            write_config_atomic(args.config, config)
+    except CliError as e:
+        print(f"[Error] {e}", file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"[Error] {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import json
+from types import MappingProxyType
+
+import event_log
+
+# Prefix used to recognise our payload on the system clipboard
+CLIPBOARD_MARKER = "macros-clipboard:v1:"
+
+# === Shared Records ===
+def freeze(value):
+    """Immutable copy of a JSON value (dicts become read-only views, lists tuples), shared by every paste"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def _plain(value):
+    # json.dumps writes tuples as lists itself; read-only views need converting
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def unique_name(name, existing):
+    """Return name, or name_copy / name_copy2 ... if it is already taken"""
+    if name not in existing:
+        return name
+    candidate = f"{name}_copy"
+    counter = 2
+    while candidate in existing:
+        candidate = f"{name}_copy{counter}"
+        counter += 1
+    return candidate
+
+# === Clipboard ===
+class MacroClipboard:
+    """
+    Holds frozen profile or macro records. Pastes share them: a pasted macro is a new
+    top-level dict (so it can be renamed) over the same read-only nested values, and
+    nothing is deep-copied until the journal puts it into the config.
+    """
+
+    def __init__(self):
+        self.kind = None  # "profiles" or "macros"
+        self.items = ()
+        self._serialized = None
+
+    def copy_profiles(self, profiles):
+        """Store (name, profile_data) pairs"""
+        self.kind = "profiles"
+        self.items = tuple((name, freeze(data)) for name, data in profiles)
+        self._serialized = None
+
+    def copy_macros(self, macros):
+        """Store a list of macro dicts"""
+        self.kind = "macros"
+        self.items = tuple(freeze(m) for m in macros)
+        self._serialized = None
+
+    def has(self, kind):
+        return self.kind == kind and bool(self.items)
+
+    def paste_profiles(self):
+        """Return [(name, profile_data)]; the data is the shared read-only record"""
+        if self.kind != "profiles":
+            return []
+        return list(self.items)
+
+    def paste_macros(self):
+        """Return new macro dicts whose nested values are the shared read-only records"""
+        if self.kind != "macros":
+            return []
+        return [dict(m) for m in self.items]
+
+    def serialize(self):
+        """Compact text form for the system clipboard"""
+        if self._serialized is None:
+            items = [list(item) for item in self.items] if self.kind == "profiles" else self.items
+            payload = {"kind": self.kind, "items": items}
+            self._serialized = CLIPBOARD_MARKER + json.dumps(payload, separators=(",", ":"), default=_plain)
+        return self._serialized
+
+    def load_serialized(self, text):
+        """Replace contents from serialize() output; returns False if text is not ours"""
+        if not text or not text.startswith(CLIPBOARD_MARKER):
+            return False
+        if text == self._serialized:
+            return True
+        try:
+            payload = json.loads(text[len(CLIPBOARD_MARKER):])
+            kind = payload.get("kind")
+            items = payload.get("items", [])
+            if kind == "profiles":
+                self.copy_profiles((name, data) for name, data in items)
+            elif kind == "macros":
+                self.copy_macros(m for m in items if isinstance(m, dict))
+            else:
+                return False
+        except (ValueError, TypeError, AttributeError) as e:
+            event_log.error(f"Could not read clipboard data: {e}")
+            return False
+        self._serialized = text
+        return True
@@ -0,0 +1,370 @@
+import numbers
+
+from timing import validate_jitter
+from guards import GuardError, compile_guard
+
+# Fields each macro type needs besides name/type (and key, for triggered macros)
+MACRO_TYPES = {
+    "keyboard_press": ("key_to_press",),
+    "click_loop": (),
+    "function": ("function_name",),
+    "hold": ("key_to_press",),
+    "find_and_click": ("image",),
+    "move": ("points",),
+    "drag": ("points",),
+    "type_text": ("text",),
+    "variable": ("variable",),
+}
+
+MOTION_CURVES = ("linear", "bezier", "human")
+
+BOOL_FIELDS = ("run_once", "toggle", "replace")
+
+# Profile whose macros are layered under every app profile and Desktop
+GLOBAL_PROFILE = "Global"
+
+# Optional numeric fields: (minimum, must be an integer)
+NUMBER_FIELDS = {
+    "burst": (1, True),
+    "burst_spacing": (0, False),
+    "clicks": (1, True),
+    "duration": (0, False),
+    "cps": (0, False),
+    "timeout": (0, False),
+    "hold_time": (0, False),
+}
+
+# Screen triggers ("trigger" object, used instead of "key"): pressed while the screen matches
+SCREEN_TRIGGERS = ("pixel", "region")
+
+# Abbreviations ("abbreviation" string, used instead of "key"): fire once when typed
+MAX_ABBREVIATION = 64
+
+# Sequences ("sequence" string, used instead of "key"): "ctrl+k, ctrl+c", chords like "j+k",
+# and with a gesture, one chord tapped twice or held down
+GESTURES = ("double_tap", "long_press")
+MAX_SEQUENCE_STEPS = 8
+
+def validate_sequence(text, gesture=None):
+    """Return a list of problems with a sequence string and its gesture"""
+    if not isinstance(text, str) or not text.strip():
+        return ["sequence must be a non-empty string"]
+    steps = text.split(",")
+    errors = []
+    if any(not [k for k in step.split("+") if k.strip()] for step in steps):
+        errors.append("sequence has an empty step (write the comma key as 'comma')")
+    if len(steps) > MAX_SEQUENCE_STEPS:
+        errors.append(f"sequence can have at most {MAX_SEQUENCE_STEPS} steps")
+    if gesture is not None:
+        if gesture not in GESTURES:
+            errors.append(f"gesture must be one of {', '.join(GESTURES)}")
+        elif len(steps) > 1:
+            errors.append(f"{gesture} needs a single-step sequence")
+    return errors
+
+def parse_color(value):
+    """(r, g, b) from "#rrggbb" or [r, g, b], or None"""
+    if isinstance(value, str):
+        text = value.strip().lstrip("#")
+        if len(text) != 6:
+            return None
+        try:
+            return tuple(int(text[i:i + 2], 16) for i in (0, 2, 4))
+        except ValueError:
+            return None
+    if isinstance(value, (list, tuple)) and len(value) == 3 \
+            and all(isinstance(c, int) and not isinstance(c, bool) and 0 <= c <= 255 for c in value):
+        return tuple(value)
+    return None
+
+def _is_int(value, minimum):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+
+# === Validation ===
+def validate_trigger(trigger):
+    """Return a list of problems with a screen trigger object"""
+    if not isinstance(trigger, dict):
+        return ["trigger must be an object"]
+    kind = trigger.get("type")
+    if kind not in SCREEN_TRIGGERS:
+        return [f"unknown trigger type '{kind}'"]
+
+    errors = []
+    if kind == "pixel":
+        if not (_is_int(trigger.get("x"), 0) and _is_int(trigger.get("y"), 0)):
+            errors.append("pixel trigger needs x and y (non-negative integers)")
+        if parse_color(trigger.get("color")) is None:
+            errors.append("pixel trigger needs color (\"#rrggbb\" or [r, g, b])")
+    else:
+        region = trigger.get("region")
+        if not (isinstance(region, list) and len(region) == 4 and all(_is_int(v, 0) for v in region)
+                and region[2] > 0 and region[3] > 0):
+            errors.append("region trigger needs region [x, y, width, height]")
+        if "color" in trigger and parse_color(trigger["color"]) is None:
+            errors.append("color must be \"#rrggbb\" or [r, g, b]")
+
+    if "tolerance" in trigger and not (_is_int(trigger["tolerance"], 0) and trigger["tolerance"] <= 255):
+        errors.append("tolerance must be an integer from 0 to 255")
+    fraction = trigger.get("fraction")
+    if fraction is not None and (isinstance(fraction, bool) or not isinstance(fraction, numbers.Real)
+                                 or not 0 <= fraction <= 1):
+        errors.append("fraction must be a number from 0 to 1")
+    return errors
+
+def _validate_find(macro):
+    errors = []
+    region = macro.get("region")
+    if region is not None and not (isinstance(region, list) and len(region) == 4
+                                   and all(_is_int(v, 0) for v in region) and region[2] > 0 and region[3] > 0):
+        errors.append("region must be [x, y, width, height]")
+    confidence = macro.get("confidence")
+    if confidence is not None and (isinstance(confidence, bool) or not isinstance(confidence, numbers.Real)
+                                   or not 0 < confidence <= 1):
+        errors.append("confidence must be a number above 0 and at most 1")
+    offset = macro.get("offset")
+    if offset is not None and not (isinstance(offset, list) and len(offset) == 2
+                                   and all(isinstance(v, int) and not isinstance(v, bool) for v in offset)):
+        errors.append("offset must be [dx, dy]")
+    return errors
+
+def _validate_motion(macro):
+    errors = []
+    points = macro.get("points")
+    if points is not None and not (isinstance(points, list) and len(points) >= 2 and all(
+            isinstance(p, list) and len(p) == 2 and all(isinstance(v, int) and not isinstance(v, bool) for v in p)
+            for p in points)):
+        errors.append("points must be a list of at least two [x, y] pairs")
+    if macro.get("curve", "linear") not in MOTION_CURVES:
+        errors.append(f"curve must be one of {', '.join(MOTION_CURVES)}")
+    rate = macro.get("rate")
+    if rate is not None and (isinstance(rate, bool) or not isinstance(rate, numbers.Real) or not 0 < rate <= 1000):
+        errors.append("rate must be a number above 0 and at most 1000")
+    return errors
+
+def _validate_variable(macro):
+    errors = []
+    name = macro.get("variable")
+    if "variable" in macro and (not isinstance(name, str) or not 0 < len(name.encode("utf-8")) <= 48):
+        errors.append("variable must be a name of 1-48 bytes")
+    changes = [f for f in ("add", "set") if f in macro]
+    if len(changes) != 1:
+        errors.append("variable macros need exactly one of 'add' or 'set'")
+    elif isinstance(macro[changes[0]], bool) or not isinstance(macro[changes[0]], int):
+        errors.append(f"{changes[0]} must be an integer")
+    return errors
+
+def validate_macro(macro, needs_key=True):
+    """Return a list of problems with one macro dict (empty when valid)"""
+    if not isinstance(macro, dict):
+        return ["macro is not an object"]
+
+    errors = []
+    name = macro.get("name")
+    if not isinstance(name, str) or not name.strip():
+        errors.append("missing name")
+
+    macro_type = macro.get("type")
+    if macro_type not in MACRO_TYPES:
+        errors.append(f"unknown type '{macro_type}'")
+    else:
+        for field in MACRO_TYPES[macro_type]:
+            if macro.get(field) in (None, ""):
+                errors.append(f"type '{macro_type}' needs '{field}'")
+
+    if needs_key and "trigger" in macro:
+        errors.extend(validate_trigger(macro["trigger"]))
+    elif needs_key and "sequence" in macro:
+        errors.extend(validate_sequence(macro["sequence"], macro.get("gesture")))
+    elif needs_key and "abbreviation" in macro:
+        abbreviation = macro["abbreviation"]
+        if not isinstance(abbreviation, str) or not abbreviation.strip():
+            errors.append("abbreviation must be a non-empty string")
+        elif len(abbreviation) > MAX_ABBREVIATION or any(c in abbreviation for c in "\t\r\n"):
+            errors.append(f"abbreviation must be one line of at most {MAX_ABBREVIATION} characters")
+    elif needs_key:
+        key = macro.get("key")
+        if not isinstance(key, str) or not key.strip():
+            errors.append("missing key")
+        mod = macro.get("modifier")
+        if mod is not None and not isinstance(mod, str):
+            errors.append("modifier must be a string")
+
+    if "when" in macro:
+        try:
+            compile_guard(macro["when"])
+        except GuardError as e:
+            errors.append(f"when: {e}")
+
+    if "gesture" in macro and "sequence" not in macro:
+        errors.append("gesture needs a sequence")
+
+    interval = macro.get("Interval")
+    if interval is not None:
+        if isinstance(interval, bool) or not isinstance(interval, numbers.Real) or interval < 0:
+            errors.append("Interval must be a non-negative number")
+
+    for field, (minimum, integer) in NUMBER_FIELDS.items():
+        if field not in macro:
+            continue
+        value = macro[field]
+        if isinstance(value, bool) or not isinstance(value, numbers.Real) or value < minimum \
+                or (integer and value != int(value)):
+            kind = "an integer" if integer else "a number"
+            errors.append(f"{field} must be {kind} >= {minimum}")
+
+    if macro_type == "find_and_click":
+        errors.extend(_validate_find(macro))
+    elif macro_type in ("move", "drag"):
+        errors.extend(_validate_motion(macro))
+    elif macro_type == "variable":
+        errors.extend(_validate_variable(macro))
+    elif macro_type == "type_text" and "text" in macro and not isinstance(macro["text"], str):
+        errors.append("text must be a string")
+
+    if "jitter" in macro and macro["jitter"] is not None:
+        errors.extend(validate_jitter(macro["jitter"]))
+
+    for field in BOOL_FIELDS:
+        if field in macro and not isinstance(macro[field], bool):
+            errors.append(f"{field} must be true or false")
+
+    return errors
+
+def validate_config(config):
+    """Return [(profile, exe, macro_name, message)] for every problem in a full config"""
+    problems = []
+    profiles = config.get("profiles") if isinstance(config, dict) else None
+    if not isinstance(profiles, dict):
+        return [(None, None, None, "config has no 'profiles' object")]
+
+    for profile_name, exe_name, macros in iter_macro_lists(config):
+        seen = set()
+        for macro in macros:
+            name = macro.get("name") if isinstance(macro, dict) else None
+            for message in validate_macro(macro, needs_key=profile_name != "OnBoot"):
+                problems.append((profile_name, exe_name, name, message))
+            if name in seen:
+                problems.append((profile_name, exe_name, name, "duplicate macro name"))
+            seen.add(name)
+    return problems
+
+def iter_macro_lists(config):
+    """Yield (profile, exe, macros) for every macro list the runner can load"""
+    for profile_name, profile_data in config.get("profiles", {}).items():
+        if not isinstance(profile_data, dict):
+            continue
+        if isinstance(profile_data.get("macros"), list):
+            yield profile_name, None, profile_data["macros"]
+        for exe_name, data in profile_data.items():
+            if isinstance(data, dict) and isinstance(data.get("macros"), list):
+                yield profile_name, exe_name, data["macros"]
+
+def iter_exe_profiles(config):
+    """Yield (profile, exe, macros) for every exe entry that gets its own runner (Desktop is the fallback)"""
+    for profile_name, exe_name, macros in iter_macro_lists(config):
+        if exe_name and profile_name not in ("Desktop", GLOBAL_PROFILE):
+            yield profile_name, exe_name, macros
+
+def child_matching_exes(config):
+    """Exe entries with "match_children": true also apply to every process they started"""
+    exes = set()
+    for profile_name, profile_data in config.get("profiles", {}).items():
+        if not isinstance(profile_data, dict) or profile_name in ("Desktop", GLOBAL_PROFILE):
+            continue
+        for exe_name, data in profile_data.items():
+            if isinstance(data, dict) and isinstance(data.get("macros"), list) and data.get("match_children") is True:
+                exes.add(exe_name)
+    return exes
+
+# === Compilation ===
+class ScreenTrigger:
+    """
+    A pixel/region trigger with its fields resolved: box is (left, top, width, height).
+    With a color it is pressed while at least `fraction` of the box matches the color
+    (each channel within tolerance); without one, while at least `fraction` of the box
+    (minimum one pixel) differs from the previous sample by more than tolerance.
+    """
+    __slots__ = ("kind", "box", "color", "tolerance", "fraction")
+
+    def __init__(self, trigger):
+        self.kind = trigger["type"]
+        if self.kind == "pixel":
+            self.box = (trigger["x"], trigger["y"], 1, 1)
+        else:
+            self.box = tuple(trigger["region"])
+        self.color = parse_color(trigger["color"]) if "color" in trigger else None
+        self.tolerance = trigger.get("tolerance", 0)
+        self.fraction = trigger.get("fraction", 1.0 if self.color else 0.0)
+
+    def describe(self):
+        x, y, w, h = self.box
+        where = f"pixel({x},{y})" if self.kind == "pixel" else f"region({x},{y},{w}x{h})"
+        return where + ("=#%02x%02x%02x" % self.color if self.color else "~change")
+
+class CompiledMacro:
+    """A macro with its trigger parsed once, ready for the per-tick check"""
+    __slots__ = ("name", "type", "key", "modifiers", "screen", "abbreviation", "sequence", "run_once", "toggle", "interval", "macro",
+                 "guard", "prepared")
+
+    def __init__(self, macro):
+        self.macro = macro
+        self.name = macro["name"]
+        self.type = macro["type"]
+        self.screen = None
+        self.abbreviation = None
+        self.sequence = None
+        if "trigger" in macro:
+            self.screen = ScreenTrigger(macro["trigger"])
+            self.key = None
+            self.modifiers = ()
+        elif "sequence" in macro:
+            self.sequence = macro["sequence"]
+            self.key = None
+            self.modifiers = ()
+        elif "abbreviation" in macro:
+            self.abbreviation = macro["abbreviation"]
+            self.key = None
+            self.modifiers = ()
+        else:
+            self.key = macro["key"].strip()
+            mod = macro.get("modifier")
+            self.modifiers = tuple(m.strip() for m in mod.split("&") if m.strip()) if mod else ()
+        self.run_once = macro.get("run_once", False)
+        self.toggle = macro.get("toggle", False)
+        self.interval = macro.get("Interval", 0.05)
+        self.guard = compile_guard(macro["when"]) if "when" in macro else None  # closure(GuardContext) -> bool
+        self.prepared = None  # runner-side data derived once (move path, compiled text)
+
+    def trigger(self):
+        if self.screen is not None:
+            return self.screen.describe()
+        if self.abbreviation is not None:
+            return f'typed "{self.abbreviation}"'
+        if self.sequence is not None:
+            gesture = self.macro.get("gesture")
+            return self.sequence + (f" ({gesture.replace('_', ' ')})" if gesture else "")
+        return "+".join(self.modifiers + (self.key,))
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "type": self.type,
+            "trigger": self.trigger(),
+            "key": self.key,
+            "modifiers": list(self.modifiers),
+            "run_once": self.run_once,
+            "toggle": self.toggle,
+            "interval": self.interval,
+        }
+
+def compile_macros(macros, on_error=None):
+    """Compile a macro list, skipping (and reporting) macros that cannot be triggered"""
+    compiled = []
+    for macro in macros:
+        errors = validate_macro(macro)
+        if errors:
+            if on_error:
+                on_error(macro, errors)
+            continue
+        compiled.append(CompiledMacro(macro))
+    return compiled
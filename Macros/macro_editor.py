@@ -1,9 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import json
 import os
+import time
+
+from macro_clipboard import MacroClipboard, unique_name
+from config_journal import ConfigJournal
+from key_conflicts import find_conflicts, describe
+from macro_stats import STATS_FILE, read_snapshot, iter_rows
+import event_log
 
 CONFIG_PATH = "config.json"
+SNAPSHOT_DELAY_MS = 1500  # write config.json once edits have been quiet this long
+STATS_REFRESH_MS = 1000  # how often the stats window checks the runtime's snapshot file
+# Widgets that keep their own Ctrl+Z / Ctrl+Y text undo (ttk.Combobox is a ttk.Entry)
+TEXT_INPUTS = (tk.Text, tk.Entry, ttk.Entry)
+# Macro types the detail form can edit; others are shown read-only and edited in config.json
+FORM_TYPES = ("keyboard_press", "click_loop", "function", "hold")
+# Fields the detail form writes; everything else on a macro is kept as it is on save
+FORM_FIELDS = ("key", "modifier", "key_to_press", "button", "function_name", "Interval", "interval",
+               "run_once", "toggle")
+# Triggers used instead of "key" (screen, sequence, abbreviation)
+KEYLESS_TRIGGERS = ("trigger", "sequence", "abbreviation")
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 user_functions_dir = os.path.join(script_dir, "user_functions")
@@ -19,7 +36,8 @@ class MacroEditor:
         self.root.minsize(1180, 660)
         self.root.configure(bg="#f0f0f0")
 
-        self.config = self.load_config()
+        self.snapshot_job = None
+        self.load_config()
         self.selected_profile = None
         self.selected_macro_index = None
 
@@ -34,13 +52,13 @@ class MacroEditor:
         self.macro_drag_start_pos = None
 
         # Clipboard storage
-        self.profile_clipboard = None
-        self.macro_clipboard = None
+        self.clipboard = MacroClipboard()
 
         # State preservation variables
         self.main_ui_widgets = []
         self.function_editor_widgets = []
         self.current_view = "main"  # "main" or "function_editor"
+        self.stats_window = None
 
         self.build_ui()
         self.refresh_profiles()
@@ -48,14 +66,77 @@ class MacroEditor:
         self.setup_keyboard_shortcuts()
 
     def load_config(self):
-        if os.path.exists(CONFIG_PATH):
-            with open(CONFIG_PATH, "r") as f:
-                return json.load(f)
-        return {"profiles": {}, "global": {"loop_delay": 0.001}}
+        self.journal = ConfigJournal(CONFIG_PATH, default={"profiles": {}, "global": {"loop_delay": 0.001}})
+        return self.journal.config
+
+    @property
+    def config(self):
+        """The journal's in-memory config (undo and redo swap in a new object)"""
+        return self.journal.config
 
     def save_config(self):
-        with open(CONFIG_PATH, "w") as f:
-            json.dump(self.config, f, indent=2)
+        """Edits are journaled as they happen; write the full file once editing goes quiet"""
+        if self.snapshot_job:
+            self.root.after_cancel(self.snapshot_job)
+            self.snapshot_job = None
+        if self.journal.needs_snapshot():
+            self.flush_config()
+        else:
+            self.snapshot_job = self.root.after(SNAPSHOT_DELAY_MS, self.flush_config)
+
+    def flush_config(self):
+        self.snapshot_job = None
+        if self.journal.pending_ops:
+            try:
+                self.journal.snapshot()
+            except OSError as e:
+                event_log.error(f"Could not write {CONFIG_PATH}: {e}")
+
+    def on_close(self):
+        if self.snapshot_job:
+            self.root.after_cancel(self.snapshot_job)
+            self.snapshot_job = None
+        try:
+            self.journal.close()
+        except OSError as e:
+            event_log.error(f"Could not write {CONFIG_PATH}: {e}")
+        self.root.destroy()
+
+    def undo(self, event=None):
+        """Undo the last config edit"""
+        if isinstance(self.root.focus_get(), TEXT_INPUTS):
+            return
+        try:
+            changed = self.journal.undo()
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            messagebox.showerror("Error", f"Undo failed; the config was left unchanged: {e}")
+            return "break"
+        if changed:
+            self.after_history_change()
+        return "break"
+
+    def redo(self, event=None):
+        """Redo the last undone config edit"""
+        if isinstance(self.root.focus_get(), TEXT_INPUTS):
+            return
+        try:
+            changed = self.journal.redo()
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            messagebox.showerror("Error", f"Redo failed; the config was left unchanged: {e}")
+            return "break"
+        if changed:
+            self.after_history_change()
+        return "break"
+
+    def after_history_change(self):
+        if self.selected_profile not in self.config["profiles"]:
+            self.selected_profile = None
+            self.selected_macro_index = None
+        self.refresh_profiles()
+        self.refresh_macros()
+        if self.selected_macro_index is None and self.selected_profile:
+            self.show_profile_mode()
+        self.save_config()
 
     def get_function_files(self):
         """Get list of Python files in user_functions directory without .py extension"""
@@ -71,6 +152,9 @@ class MacroEditor:
         self.root.bind('<Control-c>', self.handle_copy)
         self.root.bind('<Control-v>', self.handle_paste)
         self.root.bind('<Delete>', self.handle_delete)
+        self.root.bind('<Control-z>', self.undo)
+        self.root.bind('<Control-y>', self.redo)
+        self.root.bind('<Control-Z>', self.redo)  # Ctrl+Shift+Z
         # Also bind right-click context menus
         self.profile_listbox.bind('<Button-3>', self.show_profile_context_menu)
         self.macro_listbox.bind('<Button-3>', self.show_macro_context_menu)
@@ -104,6 +188,7 @@ class MacroEditor:
         context_menu = tk.Menu(self.root, tearoff=0)
         context_menu.add_command(label="Copy Profile", command=self.copy_profile)
         context_menu.add_command(label="Paste Profile", command=self.paste_profile)
+        context_menu.add_command(label="Export to System Clipboard", command=self.export_to_system_clipboard)
         context_menu.add_separator()
         context_menu.add_command(label="Add Profile", command=self.add_profile)
         context_menu.add_command(label="Remove Profile", command=self.remove_profile)
@@ -118,6 +203,7 @@ class MacroEditor:
         context_menu = tk.Menu(self.root, tearoff=0)
         context_menu.add_command(label="Copy Macro", command=self.copy_macro)
         context_menu.add_command(label="Paste Macro", command=self.paste_macro)
+        context_menu.add_command(label="Export to System Clipboard", command=self.export_to_system_clipboard)
         context_menu.add_separator()
         context_menu.add_command(label="Add Macro", command=self.add_macro)
         context_menu.add_command(label="Remove Macro", command=self.remove_macro)
@@ -128,129 +214,195 @@ class MacroEditor:
             context_menu.grab_release()
 
     def copy_profile(self):
-        """Copy selected profile to clipboard"""
-        if not self.selected_profile:
+        """Copy selected profiles to clipboard"""
+        names = [self.profile_listbox.get(i) for i in self.profile_listbox.curselection()]
+        if not names and self.selected_profile:
+            names = [self.selected_profile]
+        if not names:
             messagebox.showwarning("Warning", "No profile selected to copy.")
             return
-        
-        # Deep copy the profile data
-        profile_data = json.loads(json.dumps(self.config["profiles"][self.selected_profile]))
-        self.profile_clipboard = {
-            "name": self.selected_profile,
-            "data": profile_data
-        }
-        messagebox.showinfo("Success", f"Profile '{self.selected_profile}' copied to clipboard.")
+
+        self.clipboard.copy_profiles((name, self.config["profiles"][name]) for name in names)
+
+        if len(names) == 1:
+            messagebox.showinfo("Success", f"Profile '{names[0]}' copied to clipboard.")
+        else:
+            messagebox.showinfo("Success", f"{len(names)} profiles copied to clipboard.")
 
     def paste_profile(self):
-        """Paste profile from clipboard"""
-        if not self.profile_clipboard:
+        """Paste profiles from clipboard"""
+        if not self.clipboard.has("profiles"):
+            self.import_from_system_clipboard()
+        if not self.clipboard.has("profiles"):
             messagebox.showwarning("Warning", "No profile in clipboard to paste.")
             return
-        
-        # Ask for new profile name
-        original_name = self.profile_clipboard["name"]
-        new_name = simpledialog.askstring("Paste Profile", 
-                                        f"Enter name for pasted profile:", 
-                                        initialvalue=f"{original_name}_copy")
-        if not new_name:
-            return
-        
-        if new_name in self.config["profiles"]:
-            messagebox.showerror("Error", "Profile name already exists.")
-            return
-        
-        # Paste the profile data
-        self.config["profiles"][new_name] = json.loads(json.dumps(self.profile_clipboard["data"]))
+
+        pasted = self.clipboard.paste_profiles()
+
+        if len(pasted) == 1:
+            # Ask for new profile name
+            original_name, data = pasted[0]
+            new_name = simpledialog.askstring("Paste Profile", 
+                                            f"Enter name for pasted profile:", 
+                                            initialvalue=f"{original_name}_copy")
+            if not new_name:
+                return
+
+            if new_name in self.config["profiles"]:
+                messagebox.showerror("Error", "Profile name already exists.")
+                return
+            pasted = [(new_name, data)]
+        else:
+            existing = set(self.config["profiles"])
+            renamed = []
+            for original_name, data in pasted:
+                new_name = unique_name(original_name, existing)
+                existing.add(new_name)
+                renamed.append((new_name, data))
+            pasted = renamed
+
+        self.journal.begin()
+        for new_name, data in pasted:
+            self.journal.set(["profiles"], new_name, data)
+        self.journal.commit()
         self.save_config()
         self.refresh_profiles()
-        
-        # Select the newly pasted profile
+
+        # Select the first pasted profile
+        new_name = pasted[0][0]
         profile_names = list(self.config["profiles"].keys())
         if new_name in profile_names:
             idx = profile_names.index(new_name)
+            self.profile_listbox.selection_clear(0, tk.END)
             self.profile_listbox.selection_set(idx)
             self.profile_listbox.see(idx)
             self.selected_profile = new_name
             self.refresh_macros()
             self.show_profile_mode()
-        
-        messagebox.showinfo("Success", f"Profile pasted as '{new_name}'.")
+
+        if len(pasted) == 1:
+            messagebox.showinfo("Success", f"Profile pasted as '{new_name}'.")
+        else:
+            messagebox.showinfo("Success", f"{len(pasted)} profiles pasted.")
 
     def copy_macro(self):
-        """Copy selected macro to clipboard"""
-        if not self.selected_profile or self.selected_macro_index is None:
+        """Copy selected macros to clipboard"""
+        if not self.selected_profile:
             messagebox.showwarning("Warning", "No macro selected to copy.")
             return
-        
-        profile_data = self.config["profiles"][self.selected_profile]
-        
-        # Get the macro data
-        macros = []
-        if "macros" in profile_data:
-            macros = profile_data["macros"]
-        else:
-            for filepath, data in profile_data.items():
-                if isinstance(data, dict) and "macros" in data:
-                    macros = data["macros"]
-                    break
-        
-        if self.selected_macro_index >= len(macros):
+
+        macros = self.get_current_macros()
+        indices = list(self.macro_listbox.curselection())
+        if not indices and self.selected_macro_index is not None:
+            indices = [self.selected_macro_index]
+        if not indices:
+            messagebox.showwarning("Warning", "No macro selected to copy.")
+            return
+
+        if any(i >= len(macros) for i in indices):
             messagebox.showerror("Error", "Selected macro index is invalid.")
             return
-        
-        # Deep copy the macro data
-        macro_data = json.loads(json.dumps(macros[self.selected_macro_index]))
-        self.macro_clipboard = macro_data
-        
-        messagebox.showinfo("Success", f"Macro '{macro_data.get('name', 'unnamed')}' copied to clipboard.")
+
+        self.clipboard.copy_macros(macros[i] for i in indices)
+
+        if len(indices) == 1:
+            messagebox.showinfo("Success", f"Macro '{macros[indices[0]].get('name', 'unnamed')}' copied to clipboard.")
+        else:
+            messagebox.showinfo("Success", f"{len(indices)} macros copied to clipboard.")
 
     def paste_macro(self):
-        """Paste macro from clipboard"""
-        if not self.macro_clipboard:
+        """Paste macros from clipboard"""
+        if not self.clipboard.has("macros"):
+            self.import_from_system_clipboard()
+        if not self.clipboard.has("macros"):
             messagebox.showwarning("Warning", "No macro in clipboard to paste.")
             return
-        
+
         if not self.selected_profile:
             messagebox.showwarning("Warning", "No profile selected. Please select a profile first.")
             return
-        
-        # Ask for new macro name
-        original_name = self.macro_clipboard.get("name", "unnamed")
-        new_name = simpledialog.askstring("Paste Macro", 
-                                        f"Enter name for pasted macro:", 
-                                        initialvalue=f"{original_name}_copy")
-        if not new_name:
-            return
-        
-        # Create new macro with copied data
-        new_macro = json.loads(json.dumps(self.macro_clipboard))
-        new_macro["name"] = new_name
-        
-        # Add to current profile
-        profile_data = self.config["profiles"][self.selected_profile]
-        
-        if "macros" in profile_data:
-            profile_data["macros"].append(new_macro)
+
+        new_macros = self.clipboard.paste_macros()
+
+        if len(new_macros) == 1:
+            # Ask for new macro name
+            original_name = new_macros[0].get("name", "unnamed")
+            new_name = simpledialog.askstring("Paste Macro", 
+                                            f"Enter name for pasted macro:", 
+                                            initialvalue=f"{original_name}_copy")
+            if not new_name:
+                return
+            new_macros[0]["name"] = new_name
         else:
-            for filepath, data in profile_data.items():
-                if isinstance(data, dict) and "macros" in data:
-                    data["macros"].append(new_macro)
-                    break
-            else:
-                profile_data["macros"] = [new_macro]
-        
+            existing = {m.get("name") for m in self.get_current_macros()}
+            for macro in new_macros:
+                macro["name"] = unique_name(macro.get("name", "unnamed"), existing)
+                existing.add(macro["name"])
+
+        # Add to current profile
+        path = self.get_current_macros_path()
+
+        self.journal.begin()
+        if path is None:
+            path = ["profiles", self.selected_profile, "macros"]
+            self.journal.set(path[:-1], "macros", [])
+        for macro in new_macros:
+            self.journal.insert(path, None, macro)
+        self.journal.commit()
+
         self.save_config()
         self.refresh_macros()
-        
-        # Select the newly pasted macro
+
+        # Select the pasted macros
         macro_count = len(self.get_current_macros())
         if macro_count > 0:
-            self.macro_listbox.selection_set(macro_count - 1)
+            first = macro_count - len(new_macros)
+            self.macro_listbox.selection_clear(0, tk.END)
+            self.macro_listbox.selection_set(first, macro_count - 1)
             self.macro_listbox.see(macro_count - 1)
-            self.selected_macro_index = macro_count - 1
+            self.selected_macro_index = first
             self.on_macro_select(None)
-        
-        messagebox.showinfo("Success", f"Macro pasted as '{new_name}'.")
+
+        if len(new_macros) == 1:
+            messagebox.showinfo("Success", f"Macro pasted as '{new_macros[0]['name']}'.")
+        else:
+            messagebox.showinfo("Success", f"{len(new_macros)} macros pasted.")
+
+    def export_to_system_clipboard(self):
+        """Put the copied profiles or macros on the system clipboard, for another editor instance"""
+        if not self.clipboard.items:
+            messagebox.showwarning("Warning", "Copy profiles or macros first.")
+            return
+        try:
+            self.root.clipboard_clear()
+            self.root.clipboard_append(self.clipboard.serialize())
+        except tk.TclError as e:
+            event_log.error(f"Could not write system clipboard: {e}")
+            messagebox.showerror("Error", f"Could not write system clipboard: {e}")
+            return
+        messagebox.showinfo("Success", "Copied to the system clipboard.")
+
+    def import_from_system_clipboard(self):
+        """Pick up macros or profiles exported by another editor instance (when nothing of that kind is copied here)"""
+        try:
+            text = self.root.clipboard_get()
+        except tk.TclError:
+            return
+        self.clipboard.load_serialized(text)
+
+    def get_current_macros_path(self):
+        """Journal path of the selected profile's macro list, or None"""
+        if not self.selected_profile:
+            return None
+
+        profile_data = self.config["profiles"][self.selected_profile]
+
+        if "macros" in profile_data:
+            return ["profiles", self.selected_profile, "macros"]
+        for filepath, data in profile_data.items():
+            if isinstance(data, dict) and "macros" in data:
+                return ["profiles", self.selected_profile, filepath, "macros"]
+        return None
 
     def get_current_macros(self):
         """Get current macros list for the selected profile"""
@@ -298,6 +450,10 @@ class MacroEditor:
             y = event.y_root - self.root.winfo_rooty()
             self.drag_label.place(x=x, y=y)
 
+        if self.profile_dragging:
+            # Don't let the extended-selection binding grow the selection while dragging
+            return "break"
+
     def profile_drag_end(self, event):
         if self.profile_dragging:
             if self.drag_label:
@@ -308,11 +464,7 @@ class MacroEditor:
             start_index = self.profile_drag_data["start_index"]
 
             if start_index is not None and end_index != start_index:
-                keys = list(self.config["profiles"].keys())
-                item = keys.pop(start_index)
-                keys.insert(end_index, item)
-
-                self.config["profiles"] = {k: self.config["profiles"][k] for k in keys}
+                self.journal.move_key(["profiles"], start_index, end_index)
                 self.save_config()
                 self.refresh_profiles()
                 self.profile_listbox.selection_set(end_index)
@@ -353,6 +505,10 @@ class MacroEditor:
             y = event.y_root - self.root.winfo_rooty()
             self.drag_label.place(x=x, y=y)
 
+        if self.macro_dragging:
+            # Don't let the extended-selection binding grow the selection while dragging
+            return "break"
+
     def macro_drag_end(self, event):
         if self.macro_dragging:
             if self.drag_label:
@@ -363,20 +519,10 @@ class MacroEditor:
             start_index = self.macro_drag_data["start_index"]
 
             if start_index is not None and end_index != start_index:
-                profile_data = self.config["profiles"][self.selected_profile]
-
-                macros = []
-                if "macros" in profile_data:
-                    macros = profile_data["macros"]
-                else:
-                    for filepath, data in profile_data.items():
-                        if isinstance(data, dict) and "macros" in data:
-                            macros = data["macros"]
-                            break
+                path = self.get_current_macros_path()
 
-                if macros:
-                    item = macros.pop(start_index)
-                    macros.insert(end_index, item)
+                if path and self.get_current_macros():
+                    self.journal.move(path, start_index, end_index)
 
                     self.save_config()
                     self.refresh_macros()
@@ -426,6 +572,7 @@ class MacroEditor:
         style.configure("TEntry", foreground=fg_color, fieldbackground="#f9f9f9", padding=6, font=entry_font)
         style.configure("TCombobox", foreground=fg_color, fieldbackground="#f9f9f9", padding=6, font=entry_font)
         style.map("TCombobox", fieldbackground=[("readonly", "#f9f9f9")])
+        style.configure("Conflict.TLabel", font=("Segoe UI", 9), background=frame_bg, foreground="#c0392b")
 
         self.root.columnconfigure(0, weight=1, uniform="a")
         self.root.columnconfigure(1, weight=0)
@@ -446,6 +593,8 @@ class MacroEditor:
 
         self.profile_listbox = tk.Listbox(
             profile_list_frame,
+            selectmode=tk.EXTENDED,
+            exportselection=False,
             bg="#ffffff", fg=fg_color,
             font=label_font,
             selectbackground=accent,
@@ -494,6 +643,8 @@ class MacroEditor:
 
         self.macro_listbox = tk.Listbox(
             macro_list_frame,
+            selectmode=tk.EXTENDED,
+            exportselection=False,
             bg="#ffffff", fg=fg_color,
             font=label_font,
             selectbackground=accent,
@@ -521,6 +672,9 @@ class MacroEditor:
         self.btn_remove_macro = ttk.Button(macro_btn_frame, text="Remove Macro", command=self.remove_macro)
         self.btn_remove_macro.grid(row=0, column=1, sticky="ew", padx=(5,0))
 
+        self.conflict_label = ttk.Label(macro_frame, text="", style="Conflict.TLabel", justify="left", wraplength=320)
+        self.conflict_label.grid(row=10, column=0, sticky="w", pady=(8,0))
+
         detail_frame = ttk.Frame(macro_frame, style="TFrame", padding=15)
         detail_frame.grid(row=1, column=2, rowspan=9, sticky="nsew", padx=(20,0))
         detail_frame.columnconfigure(1, weight=1)
@@ -537,7 +691,7 @@ class MacroEditor:
             if label == "Type":
                 combo = ttk.Combobox(
                     detail_frame,
-                    values=["keyboard_press", "click_loop", "function"],
+                    values=list(FORM_TYPES),
                     state="readonly",
                     width=25,
                     font=label_font
@@ -622,9 +776,22 @@ class MacroEditor:
         )
         self.function_button.place(x=5, y=5)
 
+        self.stats_button = tk.Button(
+            self.root,
+            text="📊",
+            command=self.open_stats_window,
+            font=("Segoe UI", 12),
+            bd=0,
+            highlightthickness=0,
+            bg=self.root["bg"],
+            activebackground=self.root["bg"],
+            relief="flat"
+        )
+        self.stats_button.place(x=35, y=5)
+
         # Store main UI widgets for state preservation
         self.main_ui_widgets = [
-            profile_frame, separator, macro_frame, self.function_button
+            profile_frame, separator, macro_frame, self.function_button, self.stats_button
         ]
         self.current_view = "main"
 
@@ -665,8 +832,15 @@ class MacroEditor:
                 self.key_button_entry.grid(row=4, column=1, sticky="ew", pady=8)
                 self.fields["key/button"] = self.key_button_entry
 
-            self.Interval_label.grid(row=self.Interval_row, column=0, sticky="e", pady=8, padx=(0, 15))
-            self.Interval_entry.grid(row=self.Interval_row, column=1, sticky="ew", pady=8)
+            if t == "hold":
+                # Held for exactly as long as the trigger, so no interval or run-once
+                self.Interval_label.grid_remove()
+                self.Interval_entry.grid_remove()
+                self.run_once_checkbox.grid_remove()
+            else:
+                self.Interval_label.grid(row=self.Interval_row, column=0, sticky="e", pady=8, padx=(0, 15))
+                self.Interval_entry.grid(row=self.Interval_row, column=1, sticky="ew", pady=8)
+                self.run_once_checkbox.grid()
 
     def refresh_profiles(self):
         self.profile_listbox.delete(0, tk.END)
@@ -693,6 +867,7 @@ class MacroEditor:
         idx = self.selected_macro_index
         self.macro_listbox.delete(0, tk.END)
         if not self.selected_profile:
+            self.conflict_label.config(text="")
             return
         
         profile_data = self.config["profiles"][self.selected_profile]
@@ -708,6 +883,8 @@ class MacroEditor:
         
         for m in macros:
             self.macro_listbox.insert(tk.END, m["name"])
+
+        self.update_conflicts(macros)
         
         if idx is not None and idx < len(macros):
             self.macro_listbox.selection_set(idx)
@@ -716,7 +893,25 @@ class MacroEditor:
         else:
             self.clear_fields()
 
+    def update_conflicts(self, macros):
+        """Highlight macros whose triggers collide and list the collisions under the macro list"""
+        path = self.get_current_macros_path()
+        exe_name = path[2] if path and len(path) == 4 else None
+        # Includes collisions with macros this list inherits from Global or its profile
+        conflicts = [c for c in find_conflicts(self.config, [self.selected_profile]) if c.exe == exe_name]
+        conflicts.sort(key=lambda c: c.index)
+
+        for conflict in conflicts:
+            self.macro_listbox.itemconfig(conflict.index, fg="#c0392b")
+
+        lines = [describe(c).split("] ", 1)[-1] for c in conflicts[:4]]
+        if len(conflicts) > 4:
+            lines.append(f"...and {len(conflicts) - 4} more")
+        self.conflict_label.config(text="\n".join(lines))
+
     def clear_fields(self):
+        for field in ("key", "modifier"):
+            self.fields[field].configure(state="normal")
         for field in self.fields.values():
             try:
                 field.delete(0, tk.END)
@@ -764,11 +959,19 @@ class MacroEditor:
         self.fields["name"].delete(0, tk.END)
         self.fields["name"].insert(0, macro.get("name", ""))
 
-        self.fields["key"].delete(0, tk.END)
-        self.fields["key"].insert(0, macro.get("key", ""))
-
-        self.fields["modifier"].delete(0, tk.END)
-        self.fields["modifier"].insert(0, macro.get("modifier") or "")
+        # Screen, sequence and abbreviation triggers replace the key; show them read-only
+        trigger = next((f for f in KEYLESS_TRIGGERS if f in macro), None)
+        for field in ("key", "modifier"):
+            self.fields[field].configure(state="normal")
+            self.fields[field].delete(0, tk.END)
+        if trigger is None:
+            self.fields["key"].insert(0, macro.get("key", ""))
+            self.fields["modifier"].insert(0, macro.get("modifier") or "")
+        else:
+            shown = macro[trigger] if isinstance(macro[trigger], str) else "screen"
+            self.fields["key"].insert(0, f"{trigger}: {shown}")
+            for field in ("key", "modifier"):
+                self.fields[field].configure(state="disabled")
 
         self.fields["type"].set(macro.get("type", "keyboard_press"))
         self.update_type_fields()
@@ -812,9 +1015,9 @@ class MacroEditor:
         
         filepath = simpledialog.askstring("File Path", "Enter executable file path (optional):")
         if filepath:
-            self.config["profiles"][name] = {filepath: {"macros": []}}
+            self.journal.set(["profiles"], name, {filepath: {"macros": []}})
         else:
-            self.config["profiles"][name] = {"macros": []}
+            self.journal.set(["profiles"], name, {"macros": []})
         
         self.save_config()
         self.refresh_profiles()
@@ -826,7 +1029,7 @@ class MacroEditor:
         confirm = messagebox.askyesno("Confirm", f"Delete profile '{self.selected_profile}'?")
         if not confirm:
             return
-        del self.config["profiles"][self.selected_profile]
+        self.journal.delete_key(["profiles"], self.selected_profile)
         self.selected_profile = None
         self.save_config()
         self.refresh_profiles()
@@ -846,15 +1049,9 @@ class MacroEditor:
             "run_once": False
         }
         
-        profile_data = self.config["profiles"][self.selected_profile]
-        
-        if "macros" in profile_data:
-            profile_data["macros"].append(new)
-        else:
-            for filepath, data in profile_data.items():
-                if isinstance(data, dict) and "macros" in data:
-                    data["macros"].append(new)
-                    break
+        path = self.get_current_macros_path()
+        if path:
+            self.journal.insert(path, None, new)
         
         self.save_config()
         self.refresh_macros()
@@ -868,15 +1065,9 @@ class MacroEditor:
         if not confirm:
             return
         
-        profile_data = self.config["profiles"][self.selected_profile]
-        
-        if "macros" in profile_data:
-            del profile_data["macros"][sel[0]]
-        else:
-            for filepath, data in profile_data.items():
-                if isinstance(data, dict) and "macros" in data:
-                    del data["macros"][sel[0]]
-                    break
+        path = self.get_current_macros_path()
+        if path:
+            self.journal.delete(path, sel[0])
         
         self.save_config()
         self.refresh_macros()
@@ -885,34 +1076,33 @@ class MacroEditor:
         if self.selected_profile is None or self.selected_macro_index is None:
             return
 
-        profile_data = self.config["profiles"][self.selected_profile]
-
-        macro = None
-        if "macros" in profile_data:
-            macro = profile_data["macros"][self.selected_macro_index]
-        else:
-            for filepath, data in profile_data.items():
-                if isinstance(data, dict) and "macros" in data:
-                    macro = data["macros"][self.selected_macro_index]
-                    break
+        path = self.get_current_macros_path()
+        if not path:
+            return
 
-        if not macro:
+        original = self.get_current_macros()[self.selected_macro_index]
+        if original.get("type", "keyboard_press") not in FORM_TYPES:
+            messagebox.showinfo(
+                "Not Editable",
+                f"'{original.get('type')}' macros can't be edited here; change them in {CONFIG_PATH}."
+            )
             return
+        # Edit a working copy, then journal only the fields that changed; fields the
+        # form doesn't show ("when", "jitter", triggers, ...) are left as they are
+        macro = dict(original)
 
         # Update common fields
         macro["name"] = self.fields["name"].get()
         macro["type"] = self.fields["type"].get()
 
         if self.selected_profile == "OnBoot":
-            keys_to_remove = list(macro.keys())
-            for key in keys_to_remove:
-                if key not in ("name", "type", "function_name"):
-                    macro.pop(key, None)
+            for f in FORM_FIELDS:
+                macro.pop(f, None)
             macro["function_name"] = self.func_dropdown.get()
         else:
-
-            macro["key"] = self.fields["key"].get()
-            macro["modifier"] = self.fields["modifier"].get() or None
+            if not any(f in macro for f in KEYLESS_TRIGGERS):
+                macro["key"] = self.fields["key"].get()
+                macro["modifier"] = self.fields["modifier"].get() or None
 
             for f in ("key_to_press", "button", "function_name", "interval"):
                 macro.pop(f, None)
@@ -938,6 +1128,16 @@ class MacroEditor:
                         macro["Interval"] = d
                     except ValueError:
                         messagebox.showerror("Invalid Input", "Interval must be a number.")
+                        return
+
+        macro_path = path + [self.selected_macro_index]
+        self.journal.begin()
+        for key in list(original.keys()):
+            if key not in macro:
+                self.journal.delete_key(macro_path, key)
+        for key, value in macro.items():
+            self.journal.set(macro_path, key, value)
+        self.journal.commit()
 
         self.save_config()
         self.refresh_macros()
@@ -1040,11 +1240,14 @@ class MacroEditor:
                 self.key_button_entry.grid(row=4, column=1, sticky="ew", pady=8)
                 self.field_labels["key/button"].config(text="Key/Button:")
 
-            if self.fields["type"].get() != "function":
+            if self.fields["type"].get() not in ("function", "hold"):
                 self.Interval_label.grid(row=5, column=0, sticky="e", pady=8, padx=(0, 15))
                 self.Interval_entry.grid(row=5, column=1, sticky="ew", pady=8)
 
-            self.run_once_checkbox.grid(row=6, column=0, pady=(15, 20), sticky="w")
+            if self.fields["type"].get() != "hold":
+                self.run_once_checkbox.grid(row=6, column=0, pady=(15, 20), sticky="w")
+            else:
+                self.run_once_checkbox.grid_remove()
 
             if self.fields["type"].get() != "click_loop":
                 self.toggle_checkbox.grid(row=6, column=1, pady=(15, 20), sticky="w")
@@ -1060,20 +1263,24 @@ class MacroEditor:
         new_name = self.fields["name"].get().strip()
         new_filepath = self.filepath_entry.get().strip()
         
+        if new_name != self.selected_profile and new_name in self.config["profiles"]:
+            messagebox.showerror("Error", "Profile name already exists.")
+            return
+
+        self.journal.begin()
+
         if new_name != self.selected_profile:
-            if new_name in self.config["profiles"]:
-                messagebox.showerror("Error", "Profile name already exists.")
-                return
-            
-            self.config["profiles"][new_name] = self.config["profiles"].pop(self.selected_profile)
+            self.journal.rename_key(["profiles"], self.selected_profile, new_name)
             self.selected_profile = new_name
         
+        profile_path = ["profiles", self.selected_profile]
         profile_data = self.config["profiles"][self.selected_profile]
         
         if "macros" in profile_data:
             if new_filepath:
-                macros = profile_data.pop("macros")
-                profile_data[new_filepath] = {"macros": macros}
+                macros = profile_data["macros"]
+                self.journal.delete_key(profile_path, "macros")
+                self.journal.set(profile_path, new_filepath, {"macros": macros})
         else:
             old_filepath = None
             macros = []
@@ -1085,17 +1292,87 @@ class MacroEditor:
             
             if old_filepath and new_filepath != old_filepath:
                 if new_filepath:
-                    profile_data[new_filepath] = {"macros": macros}
-                    del profile_data[old_filepath]
+                    self.journal.set(profile_path, new_filepath, {"macros": macros})
+                    self.journal.delete_key(profile_path, old_filepath)
                 else:
-                    profile_data["macros"] = macros
-                    del profile_data[old_filepath]
+                    self.journal.set(profile_path, "macros", macros)
+                    self.journal.delete_key(profile_path, old_filepath)
         
+        self.journal.commit()
         self.save_config()
         self.refresh_profiles()
         self.update_profile_meta()
         messagebox.showinfo("Success", "Profile updated successfully!")
 
+    # Stats window
+
+    STATS_COLUMNS = (
+        ("profile", "Profile", 140), ("macro", "Macro", 160), ("triggers", "Triggers", 80),
+        ("runs", "Runs", 80), ("avg_ms", "Avg ms", 80), ("p99_ms", "p99 ms", 80),
+        ("clicks", "Clicks", 90), ("failures", "Failures", 80), ("tasks", "Tasks", 70),
+    )
+
+    def open_stats_window(self):
+        """Live per-macro counters from the runtime's stats snapshot, busiest macros first"""
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("Macro Stats")
+        window.geometry("900x400")
+        window.configure(bg="#ffffff")
+        self.stats_window = window
+        self.stats_mtime = None
+
+        frame = ttk.Frame(window, style="TFrame", padding=15)
+        frame.pack(fill="both", expand=True)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
+
+        ttk.Label(frame, text="Macro Stats", style="Header.TLabel").grid(row=0, column=0, sticky="w", pady=(0, 10))
+
+        columns = [key for key, _, _ in self.STATS_COLUMNS]
+        self.stats_tree = ttk.Treeview(frame, columns=columns, show="headings")
+        for key, title, width in self.STATS_COLUMNS:
+            self.stats_tree.heading(key, text=title)
+            self.stats_tree.column(key, width=width, anchor="w" if key in ("profile", "macro") else "e")
+        self.stats_tree.grid(row=1, column=0, sticky="nsew")
+
+        stats_scroll = ttk.Scrollbar(frame, orient="vertical", command=self.stats_tree.yview)
+        stats_scroll.grid(row=1, column=1, sticky="ns")
+        self.stats_tree.config(yscrollcommand=stats_scroll.set)
+
+        self.stats_status = ttk.Label(frame, text="", style="TLabel")
+        self.stats_status.grid(row=2, column=0, sticky="w", pady=(10, 0))
+
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        if self.stats_window is None or not self.stats_window.winfo_exists():
+            self.stats_window = None
+            return
+        path = self.config.get("global", {}).get("stats_file", STATS_FILE)
+        try:
+            mtime = os.path.getmtime(path) if path else None
+        except OSError:
+            mtime = None
+
+        if mtime is None:
+            self.stats_tree.delete(*self.stats_tree.get_children())
+            self.stats_status.config(text="No stats yet. They appear once the tray app has run a macro.")
+        elif mtime != self.stats_mtime:
+            data = read_snapshot(path)
+            if data is not None:
+                self.stats_tree.delete(*self.stats_tree.get_children())
+                for profile, name, stats in iter_rows(data):
+                    values = [profile, name] + [stats.get(key, 0) for key, _, _ in self.STATS_COLUMNS[2:]]
+                    self.stats_tree.insert("", tk.END, values=values)
+                updated = time.strftime("%H:%M:%S", time.localtime(data.get("updated", mtime)))
+                self.stats_status.config(text=f"Updated {updated}")
+        self.stats_mtime = mtime
+        self.stats_window.after(STATS_REFRESH_MS, self.refresh_stats)
+
     # Function page
 
     def open_function_editor(self):
@@ -1154,7 +1431,7 @@ class MacroEditor:
         self.refresh_function_list()
 
     def update_filepath_visibility(self):
-        if self.selected_profile in ["OnBoot", "Desktop"]:
+        if self.selected_profile in ["OnBoot", "Desktop", "Global"]:
             self.filepath_label.grid_remove()
             self.filepath_entry.grid_remove()
         else:
@@ -1258,6 +1535,8 @@ class MacroEditor:
                 widget.grid(row=0, column=2, sticky="nsew", padx=(10,20), pady=20)
             elif widget == self.main_ui_widgets[3]:  # function_button
                 widget.place(x=5, y=5)
+            elif widget == self.main_ui_widgets[4]:  # stats_button
+                widget.place(x=35, y=5)
 
         self.function_editor_widgets = []
 
@@ -1278,4 +1557,5 @@ class MacroEditor:
 def run():
     root = tk.Tk()
     app = MacroEditor(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
\ No newline at end of file
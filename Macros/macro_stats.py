@@ -0,0 +1,109 @@
+import math
+import json
+import time
+
+from config_journal import write_config_atomic
+
+STATS_FILE = "macro_stats.json"
+
+# Run-time histogram: log-scale buckets, 8 per doubling from 10 us, so percentiles are within ~9%
+BUCKET_BASE = 10e-6
+BUCKETS_PER_DOUBLING = 8
+MAX_BUCKET = BUCKETS_PER_DOUBLING * 32
+
+class Histogram:
+    """Sparse log-bucket histogram; add() is one log2 and one dict update"""
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+
+    def add(self, seconds):
+        if seconds <= BUCKET_BASE:
+            index = 0
+        else:
+            index = min(int(math.log2(seconds / BUCKET_BASE) * BUCKETS_PER_DOUBLING) + 1, MAX_BUCKET)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, in seconds"""
+        if not self.total:
+            return 0.0
+        target = self.total * p / 100.0
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return BUCKET_BASE * 2 ** (index / BUCKETS_PER_DOUBLING)
+        return BUCKET_BASE * 2 ** (MAX_BUCKET / BUCKETS_PER_DOUBLING)
+
+class MacroStats:
+    """Counters for one macro, updated in place by DynamicMacroRunner"""
+    __slots__ = ("triggers", "runs", "failures", "clicks", "tasks", "total_time", "max_time", "last_run", "histogram")
+
+    def __init__(self):
+        self.triggers = 0
+        self.runs = 0
+        self.failures = 0
+        self.clicks = 0
+        self.tasks = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_run = None
+        self.histogram = Histogram()
+
+    def record_run(self, seconds, ok=True):
+        self.runs += 1
+        if not ok:
+            self.failures += 1
+        self.total_time += seconds
+        if seconds > self.max_time:
+            self.max_time = seconds
+        self.last_run = time.time()
+        self.histogram.add(seconds)
+
+    def to_dict(self):
+        return {
+            "triggers": self.triggers,
+            "runs": self.runs,
+            "failures": self.failures,
+            "clicks": self.clicks,
+            "tasks": self.tasks,
+            "avg_ms": round(self.total_time / self.runs * 1000, 3) if self.runs else 0.0,
+            # bucket bounds can overshoot the slowest run actually seen
+            "p50_ms": round(min(self.histogram.percentile(50), self.max_time) * 1000, 3),
+            "p99_ms": round(min(self.histogram.percentile(99), self.max_time) * 1000, 3),
+            "max_ms": round(self.max_time * 1000, 3),
+            "last_run": self.last_run,
+        }
+
+# === Snapshots ===
+def snapshot(stats_by_profile):
+    """{profile label: {macro name: stats dict}} for a {runner key: {name: MacroStats}} mapping"""
+    return {
+        key or "Desktop": {name: stats.to_dict() for name, stats in macros.items()}
+        for key, macros in stats_by_profile.items() if macros
+    }
+
+def write_snapshot(path, profiles):
+    write_config_atomic(path, {"updated": time.time(), "profiles": profiles})
+
+def read_snapshot(path=STATS_FILE):
+    """Parsed snapshot file, or None when there is none (yet)"""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+def iter_rows(data):
+    """Yield (profile, macro, stats dict) from a snapshot, hottest macros first"""
+    rows = []
+    for profile, macros in (data or {}).get("profiles", {}).items():
+        for name, stats in macros.items():
+            rows.append((profile, name, stats))
+    rows.sort(key=lambda row: (-row[2].get("runs", 0), -row[2].get("triggers", 0)))
+    return rows
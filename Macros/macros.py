@@ -2,10 +2,26 @@ import os
 import sys
 import time
 import json
-import threading
-import keyboard
+import atexit
+import asyncio
+import weakref
+
+if __name__ == "__main__":
+    # `python -m macros` is the headless config CLI; dispatch before the input libraries load
+    from macro_cli import main
+    sys.exit(main())
+
 import pyautogui as pag
-import subprocess
+
+import injection
+import event_log
+import template_match
+import shared_vars
+from macro_compiler import compile_macros
+from macro_stats import MacroStats
+from guards import GuardContext, WindowState
+from motion import compile_path
+from timing import JitterSampler
 
 pag.FAILSAFE = False
 pag.PAUSE = False
@@ -21,47 +37,190 @@ def load_config(path="config.json"):
 
 # === Macro Executor Helpers ===
 def run_keyboard_press(key):
-    pag.press(key)
-
-def run_click_loop(active_flag, interval, button="left"):
-    
-    while active_flag["active"]:
-        if button == "left":
-            pag.leftClick()
-        elif button == "right":
-            pag.rightClick()
-        else:
-            pag.leftClick()
-        time.sleep(interval)
-    active_flag["active"] = False
-
-def run_function_by_name(name):
-    script_path = os.path.join(user_functions_dir, f"{name}.py")
-    if not os.path.isfile(script_path):
-        print(f"[Error] Script file not found: {script_path}")
+    injection.press(key)
+
+def mouse_button(macro):
+    """Mouse button named by a click macro's key_to_press ("left click", "right click")"""
+    button = macro.get("key_to_press", "left click").lower()
+    return "right" if "right" in button else "left"
+
+# Runners that may be holding keys down; released on interpreter exit
+_live_runners = weakref.WeakSet()
+
+@atexit.register
+def release_all_held_keys():
+    for runner in list(_live_runners):
+        runner.release_all()
+
+async def wait_until(deadline):
+    """
+    Sleep until an absolute perf_counter() deadline. Never spins: the loop also serves
+    other macros, the hook pipe and the control API. A wake-up may be late by a timer
+    tick, but callers that step the deadline keep that from accumulating.
+    """
+    delay = deadline - time.perf_counter()
+    await asyncio.sleep(delay if delay > 0 else 0)
+
+async def run_click_loop(active_flag, interval, button="left", burst=1, spacing=0.0, next_interval=None):
+    """
+    Click `burst` times every `interval` seconds until active_flag["active"] is cleared.
+    With spacing 0 a whole burst is injected in one batch; the achieved rate is kept in active_flag["cps"].
+    next_interval, if given, supplies each tick's interval instead (jitter).
+    """
+    batch = injection.InputBatch()
+    button = button if button in ("left", "right") else "left"
+    clicks = 0
+    started = time.perf_counter()
+    next_tick = started
+
+    try:
+        while active_flag["active"]:
+            if spacing > 0 and burst > 1:
+                deadline = time.perf_counter()
+                for i in range(burst):
+                    batch.click(button).flush()
+                    if i < burst - 1:
+                        deadline += spacing
+                        await wait_until(deadline)
+            else:
+                batch.click(button, burst).flush()
+
+            clicks += burst
+            now = time.perf_counter()
+            active_flag["clicks"] = clicks
+            active_flag["cps"] = clicks / (now - started) if now > started else 0.0
+
+            # Schedule against deadlines so per-iteration overhead doesn't stretch the interval
+            next_tick += next_interval() if next_interval else interval
+            if next_tick < now - interval:
+                next_tick = now  # fell far behind (e.g. system stall); don't catch up in one rush
+            delay = next_tick - time.perf_counter()
+            await asyncio.sleep(delay if delay > 0 else 0)
+    finally:
+        active_flag["active"] = False
+
+async def play_path(path, button=None):
+    """Move the pointer along a precompiled Path on its schedule, holding button down for drags"""
+    batch = injection.InputBatch()
+    coords = path.coords
+    last = path.count - 1
+    batch.move_to(coords[0], coords[1])
+    if button:
+        batch.mouse_down(button)
+    batch.flush()
+
+    started = time.perf_counter()
+    index = 0
+    try:
+        while index < last:
+            delay = started + (index + 1) * path.step - time.perf_counter()
+            await asyncio.sleep(delay if delay > 0 else 0)
+            # Index by elapsed time: after a stall we skip ahead instead of stretching the move
+            index = min(last, int((time.perf_counter() - started) / path.step))
+            batch.move_to(coords[2 * index], coords[2 * index + 1]).flush()
+    finally:
+        if button:
+            batch.mouse_up(button).flush()
+
+TYPE_TICK = 0.01  # type_text sends one batch of characters per tick
+DEFAULT_CPS = 20000  # characters per second; a few KB type in well under a second
+
+async def type_compiled(text, cps=DEFAULT_CPS):
+    """Inject a CompiledText in batches at `cps` characters per second (0: all at once)"""
+    count = len(text.ends)
+    if not count:
         return
-
-    def run_script():
+    if not cps:
         try:
-            subprocess.run([sys.executable, script_path], check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"[Error] Script '{name}.py' exited with error: {e}")
+            injection.send_events(text.events)
+        finally:
+            if text.restore:
+                await restore_text(text)
+        return
+    chunk = max(1, round(cps * TYPE_TICK))
+    step = chunk / cps
+    started = time.perf_counter()
+    sent = 0  # characters
+    try:
+        while sent < count:
+            end = min(count, sent + chunk)
+            injection.send_events(text.events[text.ends[sent - 1] if sent else 0:text.ends[end - 1]])
+            sent = end
+            if sent < count:
+                delay = started + (sent // chunk) * step - time.perf_counter()
+                await asyncio.sleep(delay if delay > 0 else 0)
+    finally:
+        if sent < count and text.shift is not None:
+            injection.get_backend().send([("key", text.shift, False)])  # stopped mid-run of capitals
+        if text.restore:
+            await restore_text(text)
+
+async def restore_text(text):
+    """Undo a CompiledText's keymap changes once the keys typed with them have been read"""
+    try:
+        await asyncio.sleep(injection.settle())
+    finally:
+        injection.get_backend().send(text.restore)
+
+async def run_function_by_name(name):
+    """Run user_functions/<name>.py; True if it exited cleanly"""
+    script_path = os.path.join(user_functions_dir, f"{name}.py")
+    if not os.path.isfile(script_path):
+        event_log.error(f"Script file not found: {script_path}")
+        return False
+
+    try:
+        # Scripts can `import shared_vars` and attach to the runtime's variables (MACROS_VARS)
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (script_dir, env.get("PYTHONPATH")) if p)
+        process = await asyncio.create_subprocess_exec(sys.executable, script_path, env=env)
+    except OSError as e:
+        event_log.error(f"Could not start '{name}.py': {e}")
+        return False
+    returncode = await process.wait()
+    if returncode != 0:
+        event_log.error(f"Script '{name}.py' exited with error: exit status {returncode}", function=name, returncode=returncode)
+    return returncode == 0
 
-    threading.Thread(target=run_script, daemon=True).start()
-    
 # === Dynamic Macro Profile Runner ===
 class DynamicMacroRunner:
-    def __init__(self, profile_name, exe_name=None, config_path="config.json"):
+    """
+    Trigger state and running actions of one profile. Trigger edges come from
+    input_hook.InputHook; every method runs on the runtime's event loop thread
+    and actions are asyncio tasks, not threads.
+    """
+
+    def __init__(self, profile_name, exe_name=None, config_path="config.json", config=None, emit=None, activity=None, stats=None,
+                 compiled=None, window=None):
         self.profile_name = profile_name
         self.exe_name = exe_name
         self.config_path = config_path
+        self.emit = emit  # optional callback(kind, **fields) for runtime events
+        self.activity = activity  # optional callback(+1 / -1) as action tasks start and finish
+        # macro name -> MacroStats; the runtime passes in a dict it keeps across reloads
+        self.stats = stats if stats is not None else {}
 
-        self.last_mtime = os.path.getmtime(self.config_path)
-        full = load_config(self.config_path)
+        full = config if config is not None else load_config(self.config_path)
         self.global_settings = full.get("global", {})
+        injection.configure(self.global_settings.get("injection_backend", "auto"))
+        # What "when" guards see; the runtime shares one WindowState between its runners
+        self.guard_context = GuardContext(window if window is not None else WindowState(), self.is_active,
+                                          self.global_settings.get("screen_capture", "auto"))
+
+        if compiled is not None:
+            # Layered table precomputed by the runtime (profile_layers.compile_profiles)
+            self._apply_compiled(compiled)
+        else:
+            self._apply_profile(self._find_profile(full))
 
-        profile = None
+        self.tasks = {}  # macro name -> asyncio.Task running its action
+        self.loop_flags = {}
+        self.pressed = {}  # macro name -> trigger state seen by the last poll
+        self.held_keys = {}  # macro name -> key currently held down by a hold macro
+        self.hold_started = {}  # macro name -> perf_counter() when its key went down
+        _live_runners.add(self)
 
+    def _find_profile(self, full):
         if self.exe_name:
             profile = full["profiles"].get(self.profile_name, {})
             if isinstance(profile, dict):
@@ -71,137 +230,347 @@ class DynamicMacroRunner:
 
         if not isinstance(profile, dict) or "macros" not in profile:
             if self.profile_name != "OnBoot":
-                print(f"[Warning] Profile '{self.profile_name}' is invalid or missing macros. Falling back to 'Desktop'.")
+                event_log.warning(f"Profile '{self.profile_name}' is invalid or missing macros. Falling back to 'Desktop'.")
             profile = full["profiles"].get("Desktop", {})
-
-        self._apply_profile(profile)
-
-        self.threads = {}
-        self.loop_flags = {}
-        self.triggered_once = {}
+        return profile
 
     def _apply_profile(self, profile):
-        self.config = profile
-        self.macros = profile.get("macros", [])
+        self._apply_compiled(compile_macros(profile.get("macros", []), self._report_invalid))
+
+    def _apply_compiled(self, compiled):
+        self.compiled = compiled
+        self.macros = [c.macro for c in compiled]
+        self.by_name = {}
+        for c in self.compiled:
+            self.by_name.setdefault(c.name, c)
+        self.samplers = {}  # macro name -> JitterSampler, rebuilt with the profile
+        # Move/drag trajectories are computed here, once per load, never during playback;
+        # macros inherited from shared layers keep theirs on the CompiledMacro for every app
+        for c in self.compiled:
+            if c.prepared is None and c.type in ("move", "drag"):
+                c.prepared = compile_path(c.macro)
+            elif c.prepared is None and c.type == "type_text":
+                c.prepared = injection.compile_text(c.macro["text"])
+                if c.prepared.missing:
+                    event_log.warning(f"'{c.name}': no key types {c.prepared.missing!r} here; "
+                                      f"type_text skips those characters")
+        self.paths = {c.name: c.prepared for c in self.compiled if c.type in ("move", "drag")}
+        self.texts = {c.name: c.prepared for c in self.compiled if c.type == "type_text"}
         self.loop_delay = self.global_settings.get("loop_delay", 0.01)
 
-    def reload_config_if_updated(self):
+    def _report_invalid(self, macro, errors):
+        if self.profile_name != "OnBoot":
+            event_log.warning(f"Skipping macro '{macro.get('name')}' in '{self.profile_name}': {', '.join(errors)}")
+
+    # === Trigger Edges ===
+    def set_trigger(self, name, is_pressed):
+        """Apply a trigger press/release reported by the input hook"""
+        compiled = self.by_name.get(name)
+        if compiled is None or is_pressed == self.pressed.get(name, False):
+            return
+        if is_pressed and compiled.guard is not None and not self.check_guard(compiled):
+            return  # never marked pressed, so its release is ignored too
+        self.pressed[name] = is_pressed
+        if is_pressed:
+            self.stat(name).triggers += 1
+        self.on_trigger(compiled, is_pressed)
+
+    def check_guard(self, compiled):
         try:
-            mtime = os.path.getmtime(self.config_path)
-            if mtime != self.last_mtime:
-                print("[Info] Detected config.json change; reloading profile...")
-                self.last_mtime = mtime
-                full = load_config(self.config_path)
-                self.global_settings = full.get("global", {})
-
-                if self.exe_name:
-                    profile = full["profiles"].get(self.profile_name, {})
-                    profile = profile.get(self.exe_name, {})
-                else:
-                    profile = full["profiles"].get(self.profile_name, {})
-
-                if profile:
-                    self._apply_profile(profile)
-                    self.threads.clear()
-                    self.loop_flags.clear()
-                    self.triggered_once.clear()
-                else:
-                    print(f"[Warning] Profile '{self.profile_name}' not found or missing exe '{self.exe_name}' in updated config.")
+            return compiled.guard(self.guard_context)
         except Exception as e:
-            print(f"[Error] reload_config_if_updated failed: {e}")
+            event_log.error(f"Guard of '{compiled.name}' failed: {e}", macro=compiled.name)
+            return False
+
+    def reset_triggers(self):
+        """Treat every held trigger as released (the window lost focus)"""
+        for compiled in self.compiled:
+            if self.pressed.get(compiled.name):
+                self.pressed[compiled.name] = False
+                self.on_trigger(compiled, False)
+
+    def on_trigger(self, compiled, is_pressed):
+        """Start or stop a macro's action on a trigger press/release edge"""
+        macro = compiled.macro
+        name = compiled.name
+        macro_type = compiled.type
+
+        if compiled.abbreviation is not None:
+            # Typed abbreviations are one-shot: erase what was typed, then run the action once
+            if is_pressed:
+                if macro.get("replace", True):
+                    injection.press("backspace", len(compiled.abbreviation))
+                self.run_once(compiled)
+            return
 
-    def run_macro_if_needed(self):
-        self.reload_config_if_updated()
-
-        for macro in self.macros:
-            key = macro["key"]
-            mod = macro.get("modifier")
-            name = macro["name"]
-            run_once = macro.get("run_once", False)
-            macro_type = macro["type"]
-            toggle = macro.get("toggle", False)
-
-            # Handle multiple modifiers by checking if all are pressed
-            if mod:
-                mods = mod.split("&")
-                mods_pressed = all(keyboard.is_pressed(m.strip()) for m in mods)
-            else:
-                mods_pressed = True
-
-            is_pressed = keyboard.is_pressed(key) and mods_pressed
-
-            if run_once:
-                if is_pressed and not self.triggered_once.get(name, False):
-                    self.triggered_once[name] = True
-                    if macro_type == "click_loop":
-                        if name in self.loop_flags and self.loop_flags[name]["active"]:
-                            self.loop_flags[name]["active"] = False
-                        else:
-                            self.loop_flags[name] = {"active": True}
-                            threading.Thread(target=self.run_macro, args=(macro,), daemon=True).start()
-                    else:
-                        threading.Thread(target=self.run_macro, args=(macro,), daemon=True).start()
-                elif not is_pressed:
-                    self.triggered_once[name] = False
-                continue
-
-            if toggle and macro_type != "click_loop":
-                if is_pressed and not self.triggered_once.get(name, False):
-                    self.triggered_once[name] = True
-                    if name in self.loop_flags and self.loop_flags[name].get("active"):
-                        self.loop_flags[name]["active"] = False
-                    else:
-                        self.loop_flags[name] = {"active": True}
-                        threading.Thread(target=self.run_macro_toggleable, args=(macro,), daemon=True).start()
-                elif not is_pressed:
-                    self.triggered_once[name] = False
-                continue
+        if macro_type == "hold":
+            self._update_hold(compiled, is_pressed)
+            return
 
+        if compiled.run_once:
             if is_pressed:
-                if macro_type == "click_loop":
-                    if name not in self.loop_flags or not self.loop_flags[name].get("active", False):
-                        self.loop_flags[name] = {"active": True}
-                        threading.Thread(target=self.run_macro, args=(macro,), daemon=True).start()
-                elif name not in self.threads or not self.threads[name].is_alive():
-                    self.threads[name] = threading.Thread(target=self.run_macro, args=(macro,), daemon=True)
-                    self.threads[name].start()
-            else:
-                if macro_type == "click_loop" and name in self.loop_flags:
+                if macro_type == "click_loop" and self.is_looping(name):
                     self.loop_flags[name]["active"] = False
+                elif macro_type == "click_loop":
+                    self.start_click_loop(macro)
+                else:
+                    self.spawn(name, self.run_macro(macro))
+            return
 
+        if compiled.toggle and macro_type != "click_loop":
+            if is_pressed:
+                if self.is_looping(name):
+                    self.loop_flags[name]["active"] = False
+                else:
+                    self.loop_flags[name] = {"active": True}
+                    self.spawn(name, self.run_macro_toggleable(macro))
+            return
 
-    def run_macro(self, macro):
+        if macro_type == "click_loop":
+            if is_pressed:
+                if not self.is_looping(name):
+                    self.start_click_loop(macro)
+            elif name in self.loop_flags:
+                self.loop_flags[name]["active"] = False
+        elif is_pressed and not self.is_running(name):
+            self.spawn(name, self.run_while_held(compiled))
+
+    def _update_hold(self, compiled, is_pressed):
+        """Hold key_to_press while the trigger is held (or between presses, with toggle)"""
+        name = compiled.name
+        held = name in self.held_keys
+
+        if compiled.toggle:
+            if is_pressed:
+                if held:
+                    self._release_hold(name)
+                else:
+                    self._press_hold(name, compiled.macro["key_to_press"])
+        elif is_pressed and not held:
+            self._press_hold(name, compiled.macro["key_to_press"])
+        elif not is_pressed and held:
+            self._release_hold(name)
+
+    def _press_hold(self, name, key):
+        self.held_keys[name] = key
+        self.hold_started[name] = time.perf_counter()
+        injection.key_down(key)
+
+    def _release_hold(self, name):
+        key = self.held_keys.pop(name, None)
+        if key is not None:
+            started = self.hold_started.pop(name, None)
+            ok = True
+            try:
+                injection.key_up(key)
+            except Exception as e:
+                ok = False
+                event_log.error(f"Releasing held key '{key}': {e}")
+            if started is not None:
+                self.stat(name).record_run(time.perf_counter() - started, ok)
+
+    def release_all(self):
+        """Release every key held by this runner (focus change, reload, shutdown)"""
+        for name in list(self.held_keys):
+            self._release_hold(name)
+
+    # === Direct Control ===
+    def get_compiled(self, name):
+        compiled = self.by_name.get(name)
+        if compiled is None:
+            raise KeyError(f"no macro named '{name}' in '{self.profile_name}'")
+        return compiled
+
+    def fire(self, name):
+        """Run a macro's action once without its trigger (click loops toggle)"""
+        compiled = self.get_compiled(name)
+        self.stat(name).triggers += 1
+        self.run_once(compiled)
+
+    def run_once(self, compiled):
+        name = compiled.name
+        if compiled.type == "hold":
+            started = time.perf_counter()
+            run_keyboard_press(compiled.macro["key_to_press"])
+            self.stat(name).record_run(time.perf_counter() - started)
+        elif compiled.type == "click_loop":
+            if self.is_looping(name):
+                self.loop_flags[name]["active"] = False
+            else:
+                self.start_click_loop(compiled.macro)
+        else:
+            self.spawn(name, self.run_macro(compiled.macro))
+
+    def start_macro(self, name):
+        """Start a macro's loop (or hold its key) until stop_macro()"""
+        compiled = self.get_compiled(name)
+        self.stat(name).triggers += 1
+        if compiled.type == "hold":
+            if name not in self.held_keys:
+                self._press_hold(name, compiled.macro["key_to_press"])
+        elif self.is_looping(name):
+            return
+        elif compiled.type == "click_loop":
+            self.start_click_loop(compiled.macro)
+        else:
+            self.loop_flags[name] = {"active": True}
+            self.spawn(name, self.run_macro_toggleable(compiled.macro))
+
+    def stop_macro(self, name=None):
+        """Stop one macro's loop / hold / repeat, or every macro when name is None"""
+        names = [self.get_compiled(name).name] if name is not None else list(self.by_name)
+        for name in names:
+            if name in self.loop_flags:
+                self.loop_flags[name]["active"] = False
+            self.pressed[name] = False  # ends run_while_held after the current run
+            self._release_hold(name)
+
+    # === Statistics ===
+    def stat(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = MacroStats()
+        return stats
+
+    # === Tasks ===
+    def spawn(self, name, coro):
+        task = asyncio.ensure_future(coro)
+        self.tasks[name] = task
+        self.stat(name).tasks += 1
+        task.add_done_callback(lambda t: self._task_done(name, t))
+        if self.activity:
+            self.activity(1)
+        return task
+
+    def _task_done(self, name, task):
+        if self.tasks.get(name) is task:
+            del self.tasks[name]
+        if self.activity:
+            self.activity(-1)
+        if not task.cancelled() and task.exception() is not None:
+            self.stat(name).failures += 1
+            event_log.error(f"Macro '{name}' failed: {task.exception()}", macro=name, profile=self.profile_name)
+
+    def start_click_loop(self, macro):
+        # The flag exists before the task first runs, so a release edge in between still stops it
+        flag = self.loop_flags[macro["name"]] = {"active": True}
+        return self.spawn(macro["name"], self.run_macro(macro, flag))
+
+    def is_running(self, name):
+        return name in self.tasks
+
+    def is_looping(self, name):
+        return self.loop_flags.get(name, {}).get("active", False)
+
+    def is_active(self, name):
+        """Running, looping or holding its key (what a guard's active() checks)"""
+        return name in self.tasks or self.is_looping(name) or name in self.held_keys
+
+    def stop(self):
+        """Stop every loop, cancel running actions and release held keys (reload, shutdown)"""
+        for flag in self.loop_flags.values():
+            flag["active"] = False
+        for task in list(self.tasks.values()):
+            task.cancel()
+        self.release_all()
+        self.pressed.clear()
+
+    # === Actions ===
+    async def run_macro(self, macro, flag=None):
         t = macro["type"]
         interval = macro.get("Interval", 0.05)  # Always get interval from config.json
+        stats = self.stat(macro["name"])
+        started = time.perf_counter()
 
         if t == "keyboard_press":
             # If this is a single press, still respect interval if looped elsewhere
             run_keyboard_press(macro["key_to_press"])
-            time.sleep(interval)
+            stats.record_run(time.perf_counter() - started)  # the press itself, not the interval
+            await asyncio.sleep(self.next_interval(macro))
 
         elif t == "function":
-            run_function_by_name(macro["function_name"])
+            ok = await run_function_by_name(macro["function_name"])
+            stats.record_run(time.perf_counter() - started, ok)
 
         elif t == "click_loop":
             name = macro["name"]
-            self.loop_flags[name] = {"active": True}
-            button = macro.get("key_to_press", "left click").lower()
-            if "left" in button:
-                btn = "left"
-            elif "right" in button:
-                btn = "right"
+            if flag is None:
+                flag = self.loop_flags[name] = {"active": True}
+            btn = mouse_button(macro)
+            burst = max(1, int(macro.get("burst", 1)))
+            spacing = float(macro.get("burst_spacing", 0.0))
+            sampler = self.get_sampler(macro)
+            try:
+                await run_click_loop(flag, interval, btn, burst, spacing, sampler.next if sampler else None)
+            finally:
+                stats.clicks += flag.get("clicks", 0)
+                stats.record_run(time.perf_counter() - started)
+                event_log.info(f"Click loop '{name}' stopped: {flag.get('clicks', 0)} clicks at {flag.get('cps', 0.0):.1f} CPS",
+                               macro=name, clicks=flag.get("clicks", 0), cps=flag.get("cps", 0.0))
+                if self.emit:
+                    self.emit("loop_stopped", name=name, clicks=flag.get("clicks", 0), cps=flag.get("cps", 0.0))
+
+        elif t in ("move", "drag"):
+            await play_path(self.paths[macro["name"]], mouse_button(macro) if t == "drag" else None)
+            stats.record_run(time.perf_counter() - started)
+            await asyncio.sleep(self.next_interval(macro))
+
+        elif t == "type_text":
+            await type_compiled(self.texts[macro["name"]], macro.get("cps", DEFAULT_CPS))
+            stats.record_run(time.perf_counter() - started)
+            await asyncio.sleep(self.next_interval(macro))
+
+        elif t == "find_and_click":
+            finder = template_match.get_finder(self.global_settings.get("screen_capture", "auto"))
+            # Capture and correlation run on a worker thread; the loop keeps serving triggers
+            hit = await asyncio.get_running_loop().run_in_executor(
+                None, finder.find, macro["name"], macro["image"], macro.get("region"), macro.get("confidence", 0.9))
+            if hit is not None:
+                dx, dy = macro.get("offset", (0, 0))
+                injection.InputBatch().move_to(hit[0] + dx, hit[1] + dy).click(mouse_button(macro), macro.get("clicks", 1)).flush()
+            stats.record_run(time.perf_counter() - started)
+            if self.emit:
+                self.emit("find", name=macro["name"], found=hit is not None, x=hit[0] if hit else None, y=hit[1] if hit else None)
+            await asyncio.sleep(self.next_interval(macro))
+
+        elif t == "variable":
+            store = shared_vars.get_store()
+            if "add" in macro:
+                value = store.add(macro["variable"], macro["add"])
             else:
-                btn = "left"    
-
-            run_click_loop(self.loop_flags[name], interval, btn)
+                value = macro["set"]
+                store.set(macro["variable"], value)
+            stats.record_run(time.perf_counter() - started)
+            if self.emit:
+                self.emit("variable", name=macro["variable"], value=value)
+            await asyncio.sleep(self.next_interval(macro))
 
         else:
-            print(f"[Error] Unknown macro type: {t}")
-
+            event_log.error(f"Unknown macro type: {t}")
+
+    async def run_while_held(self, compiled):
+        """Repeat a keyboard_press or function macro for as long as its trigger stays down"""
+        while self.pressed.get(compiled.name, False):
+            await self.run_macro(compiled.macro)
+            if compiled.type == "function":
+                await asyncio.sleep(self.loop_delay)  # a script that fails at once must not starve the loop
+
+    def get_sampler(self, macro):
+        """Jitter sampler for a macro with a "jitter" profile (kept across runs so the sequence continues)"""
+        if not macro.get("jitter"):
+            return None
+        name = macro["name"]
+        sampler = self.samplers.get(name)
+        if sampler is None:
+            sampler = self.samplers[name] = JitterSampler(macro.get("Interval", 0.05), macro["jitter"])
+        return sampler
 
+    def next_interval(self, macro):
+        sampler = self.get_sampler(macro)
+        return sampler.next() if sampler else macro.get("Interval", 0.05)
 
-    def run_macro_toggleable(self, macro):
+    async def run_macro_toggleable(self, macro):
         name = macro["name"]
         while self.loop_flags.get(name, {}).get("active", False):
-            self.run_macro(macro)
-            time.sleep(macro.get("interval", 0.1))
+            await self.run_macro(macro)
+            await asyncio.sleep(macro.get("interval", 0.1))
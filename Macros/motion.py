@@ -0,0 +1,85 @@
+import math
+import random
+import bisect
+from array import array
+
+DEFAULT_RATE = 125  # pointer updates per second ("rate")
+DEFAULT_DURATION = 0.25  # seconds from first to last point ("duration")
+BEZIER_SAMPLES = 64  # dense samples per control point before resampling by arc length
+HUMAN_BEND = 0.15  # max sideways control-point offset, as a share of each segment's length
+
+def min_jerk(t):
+    """Ease-in/ease-out profile of a relaxed hand movement (0 -> 1)"""
+    return t * t * t * (10 - 15 * t + 6 * t * t)
+
+def _bezier(points, count):
+    """count points along the Bezier curve with these control points (de Casteljau)"""
+    out = []
+    for i in range(count):
+        t = i / (count - 1)
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        for level in range(len(points) - 1, 0, -1):
+            for j in range(level):
+                xs[j] += (xs[j + 1] - xs[j]) * t
+                ys[j] += (ys[j + 1] - ys[j]) * t
+        out.append((xs[0], ys[0]))
+    return out
+
+def _human(points, rng):
+    """Each leg as a cubic curve bent slightly sideways by a random amount"""
+    out = [tuple(points[0])]
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        # Perpendicular offsets scale with the leg, so short hops stay almost straight
+        c1 = (x0 + dx / 3 - dy * rng.uniform(-HUMAN_BEND, HUMAN_BEND),
+              y0 + dy / 3 + dx * rng.uniform(-HUMAN_BEND, HUMAN_BEND))
+        c2 = (x0 + dx * 2 / 3 - dy * rng.uniform(-HUMAN_BEND, HUMAN_BEND),
+              y0 + dy * 2 / 3 + dx * rng.uniform(-HUMAN_BEND, HUMAN_BEND))
+        out.extend(_bezier([(x0, y0), c1, c2, (x1, y1)], BEZIER_SAMPLES)[1:])
+    return out
+
+def _resample(dense, steps, ease):
+    """steps + 1 points spaced along the curve's length by ease(t)"""
+    lengths = [0.0]
+    for (x0, y0), (x1, y1) in zip(dense, dense[1:]):
+        lengths.append(lengths[-1] + math.hypot(x1 - x0, y1 - y0))
+    total = lengths[-1]
+    out = []
+    for i in range(steps + 1):
+        target = ease(i / steps) * total
+        j = min(max(bisect.bisect_left(lengths, target), 1), len(dense) - 1)
+        span = lengths[j] - lengths[j - 1]
+        f = (target - lengths[j - 1]) / span if span else 0.0
+        (x0, y0), (x1, y1) = dense[j - 1], dense[j]
+        out.append((round(x0 + (x1 - x0) * f), round(y0 + (y1 - y0) * f)))
+    return out
+
+# === Compiled Paths ===
+class Path:
+    """A whole trajectory: coords is array('i') of x0, y0, x1, y1, ...; one point every `step` seconds"""
+    __slots__ = ("coords", "step", "count")
+
+    def __init__(self, coords, step):
+        self.coords = coords
+        self.step = step
+        self.count = len(coords) // 2
+
+def compile_path(macro, seed=None):
+    """Precompute a move/drag macro's trajectory once, so playback is only indexing"""
+    points = [tuple(p) for p in macro["points"]]
+    curve = macro.get("curve", "linear")
+    rate = macro.get("rate", DEFAULT_RATE)
+    steps = max(1, round(macro.get("duration", DEFAULT_DURATION) * rate))
+
+    if curve == "bezier":
+        dense, ease = _bezier(points, BEZIER_SAMPLES * len(points)), lambda t: t
+    elif curve == "human":
+        dense, ease = _human(points, random.Random(seed)), min_jerk
+    else:
+        dense, ease = points, lambda t: t
+
+    coords = array("i")
+    for point in _resample(dense, steps, ease):
+        coords.extend(point)
+    return Path(coords, 1.0 / rate)
@@ -0,0 +1,68 @@
+from key_conflicts import normalize_key, parse_chord
+from macro_compiler import GLOBAL_PROFILE, compile_macros, iter_exe_profiles
+
+def trigger_id(compiled):
+    """What a compiled macro is triggered by; equal ids mean one replaces the other across layers"""
+    if compiled.screen is not None:
+        return ("screen", compiled.screen.describe())
+    if compiled.sequence is not None:
+        steps = tuple(parse_chord(step) for step in compiled.sequence.split(","))
+        return ("sequence", steps, compiled.macro.get("gesture"))
+    if compiled.abbreviation is not None:
+        return ("abbreviation", compiled.abbreviation)
+    return ("key", parse_chord(compiled.key) | frozenset(normalize_key(m) for m in compiled.modifiers))
+
+class Layer:
+    """
+    One layer's compiled macros stacked on a base layer. A macro replaces every base
+    macro with the same name or trigger; everything else is inherited. The merged
+    table holds the base's CompiledMacro objects themselves, so a Global macro exists
+    once however many apps inherit it. `hidden` pairs each own macro with the base
+    macros of another name that it took the trigger from.
+    """
+
+    def __init__(self, compiled, base=None):
+        self.base = base
+        own = [(trigger_id(c), c) for c in compiled]
+        names = {c.name for c in compiled}
+        triggers = {}
+        for tid, c in own:
+            triggers.setdefault(tid, c)
+        inherited = [] if base is None else \
+            [(tid, c) for tid, c in base.entries if c.name not in names and tid not in triggers]
+        self.entries = tuple(inherited + own)
+        self.table = tuple(c for _, c in self.entries)
+        self.hidden = () if base is None else \
+            tuple((triggers[tid], c) for tid, c in base.entries if c.name not in names and tid in triggers)
+
+def _profile_macros(config, profile_name):
+    profile = config.get("profiles", {}).get(profile_name)
+    macros = profile.get("macros") if isinstance(profile, dict) else None
+    return macros if isinstance(macros, list) else []
+
+def compile_profiles(config, on_error=None):
+    """
+    Merged trigger tables per runner key (exe name, or None for Desktop), computed once
+    per load: Global -> profile ("group") macros -> the exe's own macros; Desktop sits
+    directly on Global. on_error(profile, exe, macro, errors) hears about each invalid
+    macro once, not once per app that inherits it.
+    """
+    return {key: merged.table for key, merged in compile_layers(config, on_error).items()}
+
+def compile_layers(config, on_error=None):
+    """The top Layer per runner key that compile_profiles takes its tables from"""
+    def layer(profile_name, exe_name, macros, base):
+        report = None
+        if on_error is not None:
+            report = lambda macro, errors: on_error(profile_name, exe_name, macro, errors)
+        return Layer(compile_macros(macros, report), base)
+
+    global_layer = layer(GLOBAL_PROFILE, None, _profile_macros(config, GLOBAL_PROFILE), None)
+    layers = {None: layer("Desktop", None, _profile_macros(config, "Desktop"), global_layer)}
+    groups = {}
+    for profile_name, exe_name, macros in iter_exe_profiles(config):
+        group = groups.get(profile_name)
+        if group is None:
+            group = groups[profile_name] = layer(profile_name, None, _profile_macros(config, profile_name), global_layer)
+        layers[exe_name] = layer(profile_name, exe_name, macros, group)
+    return layers
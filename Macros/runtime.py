@@ -0,0 +1,558 @@
+import os
+import time
+import queue
+import asyncio
+import platform
+import threading
+import subprocess
+import multiprocessing
+
+import event_log
+from macros import DynamicMacroRunner, load_config, run_function_by_name
+from macro_compiler import iter_exe_profiles
+from profile_layers import compile_profiles
+from input_hook import InputHook, run_input_hook, CONFIG_POLL_INTERVAL
+from control_api import ControlServer
+import macro_stats
+import shared_vars
+from guards import WindowState
+
+STATS_INTERVAL = 2.0  # seconds between stats snapshot writes (only when something changed)
+
+OS_TYPE = platform.system()
+
+# === Built-in Hotkeys ===
+async def show_mouse_info():
+    try:
+        if OS_TYPE == "Windows":
+            # Windows: Use pyautogui mouseInfo
+            subprocess.Popen(
+                ["pythonw", "-c", "import pyautogui; pyautogui.mouseInfo()"],
+                creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
+            )
+            return
+
+        # Linux: Use xdotool
+        process = await asyncio.create_subprocess_exec(
+            'xdotool', 'getmouselocation', '--shell',
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=1)
+        except asyncio.TimeoutError:
+            process.kill()
+            return
+        if process.returncode == 0:
+            text = stdout.decode(errors="replace")
+            event_log.info(f"Mouse Info:\n{text.rstrip()}")
+            # Try to show notification
+            try:
+                await asyncio.create_subprocess_exec(
+                    'notify-send', 'Mouse Info', text,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+            except FileNotFoundError:
+                pass  # notify-send not available
+    except Exception as e:
+        event_log.error(f"launching mouseInfo: {e}")
+
+# Handlers for key_conflicts.BUILTIN_HOTKEYS
+BUILTIN_ACTIONS = {
+    "ctrl+alt+m": show_mouse_info,
+}
+
+def set_timer_resolution(enabled):
+    """Ask Windows for 1 ms timer ticks so loop timers aren't rounded up to ~15.6 ms (costs power; only while busy)"""
+    if OS_TYPE != "Windows":
+        return
+    try:
+        import ctypes
+        winmm = ctypes.WinDLL("winmm")
+        if enabled:
+            winmm.timeBeginPeriod(1)
+        else:
+            winmm.timeEndPeriod(1)
+    except (OSError, AttributeError):
+        pass
+
+# === Runtime ===
+class MacroRuntime:
+    """
+    Asyncio core that owns macro timers, user function subprocesses and config
+    watching on one event loop. With detect=True it also hosts the InputHook on
+    the same loop; otherwise events arrive through dispatch() from another process.
+    Other threads (tray, editor, pipe readers) talk to it through submit() and call().
+    """
+
+    def __init__(self, config_path="config.json", detect=True):
+        self.config_path = config_path
+        self.loop = asyncio.new_event_loop()
+        self.thread = None
+        self.runners = {}
+        self.desktop_runner = None
+        self.active_runner = None
+        self.config_mtime = None
+        self.global_settings = {}
+        self.input_hook = InputHook(config_path, self.dispatch) if detect else None
+        self.hook_conn = None  # pipe to the input hook process, when it runs separately
+        self.pinned = False
+        self.control_server = None
+        self.subscribers = ()  # event queues of control API streams (replaced, never mutated)
+        self.started = time.monotonic()
+        self.event_count = 0
+        self.busy_tasks = 0
+        self.stats = {}  # runner key -> {macro name: MacroStats}, kept across reloads
+        self.window = WindowState()  # focused window for "when" guards, shared by every runner
+        self._written_stats = None
+        self._stop_event = None
+
+    # === Thread Interface ===
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="macro-runtime", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Run the loop in the calling thread until stop()"""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.main())
+        except Exception as e:
+            event_log.error(f"runtime stopped: {e}")
+        finally:
+            if self.busy_tasks:
+                self.busy_tasks = 0
+                set_timer_resolution(False)
+
+    def submit(self, coro):
+        """Run a coroutine on the runtime loop from any thread; returns a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, callback, *args):
+        """Run a plain callback on the runtime loop from any thread"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def run_function(self, name):
+        self.call(self.dispatch, ("run_function", name))
+
+    def stop(self, timeout=1.0):
+        """Stop every macro, release held keys and wait for the loop thread to finish"""
+        if self.thread is None or not self.thread.is_alive():
+            return
+        self.call(self._request_stop)
+        self.thread.join(timeout)
+
+    def _request_stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    def pump(self, conn):
+        """Forward events from a pipe to the loop (run on a reader thread); stop when it closes"""
+        while True:
+            try:
+                event = conn.recv()
+            except (EOFError, OSError):
+                event = ("stop",)
+            try:
+                self.call(self.dispatch, event)
+            except RuntimeError:
+                return  # loop already closed
+            if event[0] == "stop":
+                return
+
+    # === Main Task ===
+    async def main(self):
+        self._stop_event = asyncio.Event()
+        try:
+            # Created before any macro runs so user functions inherit MACROS_VARS
+            shared_vars.get_store()
+        except (OSError, shared_vars.VariableError) as e:
+            event_log.error(f"Shared variables unavailable: {e}")
+        self.load_runners()
+        self.start_control_api()
+
+        tasks = [
+            asyncio.ensure_future(self.watch_config()),
+            asyncio.ensure_future(self.write_stats()),
+        ]
+        if self.input_hook:
+            tasks.append(asyncio.ensure_future(self.input_hook.run()))
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            if self.control_server:
+                self.control_server.close()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.stop_runners()
+            self.save_stats()
+            shared_vars.close_store()
+
+    # === Events ===
+    def dispatch(self, event):
+        """Handle one event from the input hook or the tray process"""
+        kind = event[0]
+        self.event_count += 1
+        try:
+            if kind == "trigger":
+                _, key, name, is_pressed = event
+                self.runner_for(key).set_trigger(name, is_pressed)
+                self.emit("trigger", exe=key, name=name, pressed=is_pressed)
+            elif kind == "focus":
+                self.set_active_runner(self.runner_for(event[1]))
+                self.emit("focus", exe=event[1])
+            elif kind == "window":
+                self.window.title, self.window.process = event[1], event[2]
+            elif kind == "hotkey":
+                action = BUILTIN_ACTIONS.get(event[1])
+                if action:
+                    asyncio.ensure_future(action())
+                self.emit("hotkey", hotkey=event[1])
+            elif kind == "run_function":
+                asyncio.ensure_future(run_function_by_name(event[1]))
+                self.emit("function", name=event[1])
+            elif kind == "stop":
+                self._request_stop()
+            else:
+                event_log.warning(f"Unknown runtime event: {kind}")
+        except Exception as e:
+            event_log.error(f"loop cycle: {e}")
+
+    # === Profiles ===
+    def load_runners(self):
+        """(Re)build one runner per exe entry plus the Desktop fallback from config.json"""
+        try:
+            self.config_mtime = os.path.getmtime(self.config_path)
+            config = load_config(self.config_path)
+        except (OSError, ValueError) as e:
+            event_log.error(f"Could not load {self.config_path}: {e}")
+            if self.desktop_runner is None:
+                config = {"profiles": {}}
+            else:
+                return  # keep the runners we have
+
+        runners = {}
+        try:
+            # Global -> profile -> exe layers merged once here, shared by every runner
+            tables = compile_profiles(config, self._report_invalid)
+            for profile_name, exe_name, _ in iter_exe_profiles(config):
+                runners[exe_name] = DynamicMacroRunner(profile_name, exe_name=exe_name, config_path=self.config_path,
+                                                       config=config, emit=self.emit, activity=self._task_activity,
+                                                       stats=self.stats.setdefault(exe_name, {}),
+                                                       compiled=tables[exe_name], window=self.window)
+            desktop_runner = DynamicMacroRunner("Desktop", config_path=self.config_path, config=config,
+                                                emit=self.emit, activity=self._task_activity,
+                                                stats=self.stats.setdefault(None, {}), compiled=tables[None],
+                                                window=self.window)
+        except Exception as e:
+            event_log.error(f"create_macros dynamic load: {e}")
+            return
+
+        active_exe = self.active_runner.exe_name if self.active_runner else None
+        self.stop_runners()
+        self.runners = runners
+        self.desktop_runner = desktop_runner
+        self.global_settings = config.get("global", {})
+        self.active_runner = self.runner_for(active_exe)
+        self.emit("reload", profiles=len(runners) + 1)
+
+    def _report_invalid(self, profile_name, exe_name, macro, errors):
+        where = f"{profile_name}/{exe_name}" if exe_name else profile_name
+        event_log.warning(f"Skipping macro '{macro.get('name')}' in '{where}': {', '.join(errors)}")
+
+    def _task_activity(self, delta):
+        # Precise timers only while some macro is actually running; an idle daemon keeps the default tick
+        self.busy_tasks += delta
+        if delta > 0 and self.busy_tasks == 1:
+            set_timer_resolution(True)
+        elif delta < 0 and self.busy_tasks == 0:
+            set_timer_resolution(False)
+
+    def runner_for(self, key):
+        return self.runners.get(key, self.desktop_runner)
+
+    def stop_runners(self):
+        for runner in list(self.runners.values()) + [self.desktop_runner]:
+            if runner is not None:
+                runner.stop()
+
+    def set_active_runner(self, runner):
+        if runner is self.active_runner:
+            return
+        # Never leave a key held down (or a hold-to-run loop going) in the window we just left
+        if self.active_runner:
+            self.active_runner.reset_triggers()
+            self.active_runner.release_all()
+        self.active_runner = runner
+
+    async def watch_config(self):
+        while True:
+            await asyncio.sleep(CONFIG_POLL_INTERVAL)
+            try:
+                mtime = os.path.getmtime(self.config_path)
+            except OSError:
+                continue
+            if mtime != self.config_mtime:
+                event_log.info("Detected config.json change; reloading profiles...")
+                self.load_runners()
+
+    # === Statistics ===
+    def stats_path(self):
+        return self.global_settings.get("stats_file", macro_stats.STATS_FILE)
+
+    def _changed_stats(self):
+        """Snapshot of every runner's stats, or None if nothing changed since the last write"""
+        profiles = macro_stats.snapshot(self.stats)
+        if profiles == self._written_stats:
+            return None
+        self._written_stats = profiles
+        return profiles
+
+    async def write_stats(self):
+        """Export stats for the editor's stats panel; the file write happens off the loop thread"""
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            path = self.stats_path()
+            profiles = self._changed_stats() if path else None
+            if profiles is None:
+                continue
+            try:
+                await self.loop.run_in_executor(None, macro_stats.write_snapshot, path, profiles)
+            except OSError as e:
+                event_log.warning(f"Could not write {path}: {e}")
+
+    def save_stats(self):
+        path = self.stats_path()
+        profiles = self._changed_stats() if path else None
+        if profiles is None:
+            return
+        try:
+            macro_stats.write_snapshot(path, profiles)
+        except OSError as e:
+            event_log.warning(f"Could not write {path}: {e}")
+
+    # === Control API ===
+    def start_control_api(self):
+        if not self.global_settings.get("control_api", True) or self.control_server:
+            return
+        self.control_server = ControlServer(self._control_threadsafe, self._subscribe, self._unsubscribe,
+                                            self.global_settings.get("control_socket"))
+        if not self.control_server.start():
+            self.control_server = None
+
+    def _control_threadsafe(self, request):
+        # Called on a client thread; the request itself runs on the loop like every other event
+        async def run():
+            return self.handle_control(request)
+        try:
+            return asyncio.run_coroutine_threadsafe(run(), self.loop).result(5)
+        except Exception as e:
+            return {"ok": False, "error": f"runtime unavailable: {e}"}
+
+    def _subscribe(self, events):
+        self.subscribers = self.subscribers + (events,)
+
+    def _unsubscribe(self, events):
+        self.subscribers = tuple(q for q in self.subscribers if q is not events)
+
+    def emit(self, kind, **fields):
+        """Publish an event to control API streams (dropped for subscribers that fall behind)"""
+        if not self.subscribers:
+            return
+        fields["event"] = kind
+        fields["time"] = time.time()
+        for events in self.subscribers:
+            try:
+                events.put_nowait(fields)
+            except queue.Full:
+                pass
+
+    def handle_control(self, request):
+        """Run one control API request on the loop thread and build its reply"""
+        handler = getattr(self, f"control_{request.get('cmd')}", None)
+        if handler is None:
+            return {"ok": False, "error": f"unknown command '{request.get('cmd')}'"}
+        try:
+            reply = handler(request)
+        except KeyError as e:
+            return {"ok": False, "error": e.args[0] if e.args else "not found"}
+        except (TypeError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+        reply["ok"] = True
+        return reply
+
+    def _require(self, request, field):
+        if field not in request:
+            raise ValueError(f"missing '{field}'")
+        return request[field]
+
+    def _target_runner(self, request):
+        if "exe" not in request:
+            return self.active_runner
+        if request["exe"] in (None, "Desktop"):
+            return self.desktop_runner
+        if request["exe"] not in self.runners:
+            raise KeyError(f"no profile for '{request['exe']}'")
+        return self.runners[request["exe"]]
+
+    def control_ping(self, request):
+        return {}
+
+    def control_status(self, request):
+        runner = self.active_runner
+        return {
+            "profile": runner.profile_name,
+            "exe": runner.exe_name,
+            "pinned": self.pinned,
+            "exes": sorted(self.runners),
+            "running": sorted(runner.tasks),
+            "held": sorted(runner.held_keys),
+        }
+
+    def control_list(self, request):
+        runner = self._target_runner(request)
+        return {"profile": runner.profile_name, "exe": runner.exe_name,
+                "macros": [compiled.to_dict() for compiled in runner.compiled]}
+
+    def control_trigger(self, request):
+        """{"name", "exe"?, "pressed"?}: with "pressed" act like the hotkey edge, else run the macro once"""
+        runner = self._target_runner(request)
+        name = self._require(request, "name")
+        if "pressed" in request:
+            runner.get_compiled(name)
+            runner.set_trigger(name, bool(request["pressed"]))
+        else:
+            runner.fire(name)
+        return {}
+
+    def control_start(self, request):
+        self._target_runner(request).start_macro(self._require(request, "name"))
+        return {}
+
+    def control_stop(self, request):
+        self._target_runner(request).stop_macro(request.get("name"))
+        return {}
+
+    def control_profile(self, request):
+        """{"exe": name | "Desktop"} pins a profile regardless of focus; {"exe": null} follows focus again"""
+        exe = request.get("exe")
+        if exe is not None and exe != "Desktop" and exe not in self.runners:
+            raise KeyError(f"no profile for '{exe}'")
+        key = None if exe == "Desktop" else exe
+        if exe is None:
+            self.pinned = False
+            self._send_hook(("unpin",))
+        else:
+            self.pinned = True
+            self._send_hook(("pin", key))
+        return {"pinned": self.pinned}
+
+    def _send_hook(self, command):
+        if self.input_hook:
+            getattr(self.input_hook, command[0])(*command[1:])
+        elif self.hook_conn is not None:
+            self.hook_conn.send(command)
+
+    def control_metrics(self, request):
+        loops = {}
+        for runner in list(self.runners.values()) + [self.desktop_runner]:
+            for name, flag in runner.loop_flags.items():
+                loops[f"{runner.exe_name or 'Desktop'}/{name}"] = {
+                    "active": flag.get("active", False),
+                    "clicks": flag.get("clicks", 0),
+                    "cps": round(flag.get("cps", 0.0), 2),
+                }
+        return {
+            "uptime": round(time.monotonic() - self.started, 3),
+            "events": self.event_count,
+            "tasks": sum(len(r.tasks) for r in list(self.runners.values()) + [self.desktop_runner]),
+            "subscribers": len(self.subscribers),
+            "loops": loops,
+        }
+
+    def control_vars(self, request):
+        """Every shared variable; {"name": ..., "value": n} sets one, {"name": ..., "add": n} adds to it"""
+        store = shared_vars.get_store()
+        if "name" in request:
+            name = str(request["name"])
+            if "value" in request:
+                store.set(name, request["value"])
+            elif "add" in request:
+                store.add(name, request["add"])
+        return {"vars": store.items()}
+
+    def control_stats(self, request):
+        """Per-macro counters and run times, keyed by profile (exe name or "Desktop")"""
+        return {"profiles": macro_stats.snapshot(self.stats)}
+
+# === Process Isolation ===
+def run_executor(config_path, events, control):
+    """Entry point of the executor process: runs macros for events from the input hook process"""
+    event_log.configure("executor", event_log.settings_from(config_path))
+    runtime = MacroRuntime(config_path, detect=False)
+    runtime.hook_conn = events
+    for conn in (events, control):
+        threading.Thread(target=runtime.pump, args=(conn,), daemon=True).start()
+    try:
+        runtime.run()
+    except KeyboardInterrupt:
+        pass
+
+class IsolatedRuntime:
+    """
+    Runs the input hook and the macro executor as two child processes joined by a
+    pipe, so neither the editor nor a busy click loop can delay trigger detection.
+    Same interface as MacroRuntime for the tray: start(), run_function(), stop().
+    """
+
+    def __init__(self, config_path="config.json"):
+        self.config_path = config_path
+        ctx = multiprocessing.get_context("spawn")
+        # Events flow hook -> executor; the executor only sends profile pins back
+        executor_end, hook_end = ctx.Pipe()
+        control_recv, self.control = ctx.Pipe(duplex=False)
+        self._child_ends = (executor_end, hook_end, control_recv)
+
+        self.executor_process = ctx.Process(target=run_executor, args=(config_path, executor_end, control_recv),
+                                            name="macro-executor", daemon=True)
+        self.hook_process = ctx.Process(target=run_input_hook, args=(config_path, hook_end),
+                                        name="macro-input-hook", daemon=True)
+
+    def start(self):
+        self.executor_process.start()
+        self.hook_process.start()
+        # Only the children hold these now, so a dead process shows up as EOF on the other side
+        for conn in self._child_ends:
+            conn.close()
+
+    def run_function(self, name):
+        self._send(("run_function", name))
+
+    def _send(self, event):
+        try:
+            self.control.send(event)
+        except OSError as e:
+            event_log.error(f"executor process unavailable: {e}")
+
+    def stop(self, timeout=1.0):
+        """Let the executor release held keys and exit, then end the hook process"""
+        if self.executor_process.is_alive():
+            self._send(("stop",))
+            self.executor_process.join(timeout)
+        for process in (self.hook_process, self.executor_process):
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout)
+
+def create_runtime(config_path="config.json"):
+    """Separate hook and executor processes unless "process_isolation" is false in the global settings"""
+    try:
+        settings = load_config(config_path).get("global", {})
+    except (OSError, ValueError):
+        settings = {}
+    if settings.get("process_isolation", True):
+        return IsolatedRuntime(config_path)
+    return MacroRuntime(config_path)
@@ -0,0 +1,385 @@
+import os
+import ctypes
+import ctypes.util
+import platform
+
+import event_log
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+OS_TYPE = platform.system()
+
+SCREEN_INTERVAL = 0.05  # seconds between screen samples while a pixel/region trigger is active ("screen_interval")
+
+# === Capture Backends ===
+# A capture grabs one (left, top, width, height) box per call into a buffer it keeps
+# while the box size stays the same, and returns it as an (height, width, channels)
+# uint8 array; `order` says whether the first three channels are "RGB" or "BGR".
+# The array is only valid until the next grab.
+
+class XShmCapture:
+    """X11: XShmGetImage into a shared-memory segment the X server writes directly"""
+    name = "xshm"
+    order = "BGR"
+
+    IPC_PRIVATE = 0
+    IPC_CREAT = 0o1000
+    IPC_RMID = 0
+    ZPIXMAP = 2
+    ALL_PLANES = 0xFFFFFFFF
+
+    class SegmentInfo(ctypes.Structure):
+        _fields_ = [("shmseg", ctypes.c_ulong), ("shmid", ctypes.c_int),
+                    ("shmaddr", ctypes.c_void_p), ("readOnly", ctypes.c_int)]
+
+    class Image(ctypes.Structure):
+        # Leading fields of XImage; only read here
+        _fields_ = [("width", ctypes.c_int), ("height", ctypes.c_int), ("xoffset", ctypes.c_int),
+                    ("format", ctypes.c_int), ("data", ctypes.c_void_p), ("byte_order", ctypes.c_int),
+                    ("bitmap_unit", ctypes.c_int), ("bitmap_bit_order", ctypes.c_int),
+                    ("bitmap_pad", ctypes.c_int), ("depth", ctypes.c_int), ("bytes_per_line", ctypes.c_int),
+                    ("bits_per_pixel", ctypes.c_int), ("red_mask", ctypes.c_ulong),
+                    ("green_mask", ctypes.c_ulong), ("blue_mask", ctypes.c_ulong)]
+
+    def __init__(self):
+        if not os.environ.get("DISPLAY"):
+            raise OSError("no X display")
+        x11_path = ctypes.util.find_library("X11")
+        xext_path = ctypes.util.find_library("Xext")
+        if not x11_path or not xext_path:
+            raise OSError("libX11/libXext not found")
+        self.x11 = x11 = ctypes.cdll.LoadLibrary(x11_path)
+        self.xext = xext = ctypes.cdll.LoadLibrary(xext_path)
+        self.libc = libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        x11.XInitThreads()
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_char_p, ctypes.POINTER(self.SegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmCreateImage.restype = ctypes.POINTER(self.Image)
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(self.SegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(self.SegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(self.Image),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+        # The default X error handler exits the process; a failed grab should only fail that grab
+        error_handler_type = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+        self._error_handler = error_handler_type(lambda display, event: 0)
+        x11.XSetErrorHandler.argtypes = [error_handler_type]
+        x11.XSetErrorHandler(self._error_handler)
+
+        self.display = x11.XOpenDisplay(None)
+        if not self.display:
+            raise OSError("cannot open X display")
+        if not xext.XShmQueryExtension(self.display):
+            raise OSError("X server has no MIT-SHM extension")
+        screen = x11.XDefaultScreen(self.display)
+        self.root = x11.XDefaultRootWindow(self.display)
+        self.visual = x11.XDefaultVisual(self.display, screen)
+        self.depth = x11.XDefaultDepth(self.display, screen)
+        self.size = (x11.XDisplayWidth(self.display, screen), x11.XDisplayHeight(self.display, screen))
+        self.image = None
+        self.shminfo = None
+        self.array = None
+        self._allocate(1, 1)  # fails early on unsupported visuals and settles the channel order
+
+    def _allocate(self, width, height):
+        self._release()
+        shminfo = self.SegmentInfo()
+        image = self.xext.XShmCreateImage(self.display, self.visual, self.depth, self.ZPIXMAP, None,
+                                          ctypes.byref(shminfo), width, height)
+        if not image:
+            raise OSError("XShmCreateImage failed")
+        img = image.contents
+        if img.bits_per_pixel != 32 or img.red_mask not in (0xFF0000, 0xFF):
+            self.x11.XFree(image)
+            raise OSError(f"unsupported X visual ({img.bits_per_pixel} bpp)")
+        self.order = "BGR" if img.red_mask == 0xFF0000 else "RGB"
+
+        size = img.bytes_per_line * height
+        shminfo.shmid = self.libc.shmget(self.IPC_PRIVATE, size, self.IPC_CREAT | 0o600)
+        if shminfo.shmid < 0:
+            self.x11.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        shminfo.shmaddr = self.libc.shmat(shminfo.shmid, None, 0)
+        # Marked for removal now; the segment lives until both we and the server detach
+        self.libc.shmctl(shminfo.shmid, self.IPC_RMID, None)
+        if shminfo.shmaddr in (None, ctypes.c_void_p(-1).value):
+            self.x11.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmat failed")
+        img.data = shminfo.shmaddr
+        shminfo.readOnly = 0
+        self.xext.XShmAttach(self.display, ctypes.byref(shminfo))
+        self.x11.XSync(self.display, 0)
+
+        buffer = (ctypes.c_ubyte * size).from_address(shminfo.shmaddr)
+        # A view over the segment (rows may be padded), so each grab lands in the same array
+        self.array = np.ndarray((height, width, 4), dtype=np.uint8, buffer=buffer, strides=(img.bytes_per_line, 4, 1))
+        self.image = image
+        self.shminfo = shminfo
+
+    def _release(self):
+        if self.image is None:
+            return
+        self.array = None
+        self.xext.XShmDetach(self.display, ctypes.byref(self.shminfo))
+        self.x11.XSync(self.display, 0)
+        self.libc.shmdt(self.shminfo.shmaddr)
+        self.image.contents.data = None
+        self.x11.XFree(self.image)
+        self.image = None
+        self.shminfo = None
+
+    def grab(self, box):
+        left, top, width, height = box
+        if self.image is None or (self.image.contents.width, self.image.contents.height) != (width, height):
+            self._allocate(width, height)
+        if not self.xext.XShmGetImage(self.display, self.root, self.image, left, top, self.ALL_PLANES):
+            raise OSError("XShmGetImage failed")
+        return self.array
+
+    def close(self):
+        self._release()
+
+class GdiCapture:
+    """Windows: BitBlt from the screen DC into a top-down DIB section kept between grabs"""
+    name = "gdi"
+    order = "BGR"
+
+    SRCCOPY = 0x00CC0020
+    CAPTUREBLT = 0x40000000
+    DIB_RGB_COLORS = 0
+    SM_CXVIRTUALSCREEN = 78
+    SM_CYVIRTUALSCREEN = 79
+
+    class BitmapInfoHeader(ctypes.Structure):
+        _fields_ = [("biSize", ctypes.c_uint32), ("biWidth", ctypes.c_int32), ("biHeight", ctypes.c_int32),
+                    ("biPlanes", ctypes.c_uint16), ("biBitCount", ctypes.c_uint16),
+                    ("biCompression", ctypes.c_uint32), ("biSizeImage", ctypes.c_uint32),
+                    ("biXPelsPerMeter", ctypes.c_int32), ("biYPelsPerMeter", ctypes.c_int32),
+                    ("biClrUsed", ctypes.c_uint32), ("biClrImportant", ctypes.c_uint32)]
+
+    def __init__(self):
+        if OS_TYPE != "Windows":
+            raise OSError("GDI capture is Windows-only")
+        from ctypes import wintypes
+        self.user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self.gdi32 = ctypes.WinDLL("gdi32", use_last_error=True)
+        self.user32.GetDC.argtypes = [wintypes.HWND]
+        self.user32.GetDC.restype = wintypes.HDC
+        self.user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+        self.gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+        self.gdi32.CreateCompatibleDC.restype = wintypes.HDC
+        self.gdi32.CreateDIBSection.argtypes = [wintypes.HDC, ctypes.c_void_p, ctypes.c_uint,
+                                                ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.DWORD]
+        self.gdi32.CreateDIBSection.restype = wintypes.HBITMAP
+        self.gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+        self.gdi32.SelectObject.restype = wintypes.HGDIOBJ
+        self.gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+        self.gdi32.DeleteDC.argtypes = [wintypes.HDC]
+        self.gdi32.BitBlt.argtypes = [wintypes.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                      wintypes.HDC, ctypes.c_int, ctypes.c_int, wintypes.DWORD]
+
+        self.screen_dc = self.user32.GetDC(None)
+        self.mem_dc = self.gdi32.CreateCompatibleDC(self.screen_dc)
+        if not self.screen_dc or not self.mem_dc:
+            raise OSError("cannot create device contexts")
+        self.size = (self.user32.GetSystemMetrics(self.SM_CXVIRTUALSCREEN),
+                     self.user32.GetSystemMetrics(self.SM_CYVIRTUALSCREEN))
+        self.bitmap = None
+        self.bitmap_size = None
+        self.array = None
+
+    def _allocate(self, width, height):
+        self._release()
+        header = self.BitmapInfoHeader()
+        header.biSize = ctypes.sizeof(header)
+        header.biWidth = width
+        header.biHeight = -height  # negative: rows top to bottom, like the array
+        header.biPlanes = 1
+        header.biBitCount = 32
+        bits = ctypes.c_void_p()
+        bitmap = self.gdi32.CreateDIBSection(self.mem_dc, ctypes.byref(header), self.DIB_RGB_COLORS,
+                                             ctypes.byref(bits), None, 0)
+        if not bitmap:
+            raise ctypes.WinError(ctypes.get_last_error())
+        self.gdi32.SelectObject(self.mem_dc, bitmap)
+        buffer = (ctypes.c_ubyte * (width * height * 4)).from_address(bits.value)
+        self.array = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 4)
+        self.bitmap = bitmap
+        self.bitmap_size = (width, height)
+
+    def _release(self):
+        if self.bitmap is not None:
+            self.array = None
+            self.gdi32.DeleteObject(self.bitmap)
+            self.bitmap = None
+
+    def grab(self, box):
+        left, top, width, height = box
+        if self.bitmap_size != (width, height):
+            self._allocate(width, height)
+        if not self.gdi32.BitBlt(self.mem_dc, 0, 0, width, height, self.screen_dc, left, top,
+                                 self.SRCCOPY | self.CAPTUREBLT):
+            raise ctypes.WinError(ctypes.get_last_error())
+        return self.array
+
+    def close(self):
+        self._release()
+        self.gdi32.DeleteDC(self.mem_dc)
+        self.user32.ReleaseDC(None, self.screen_dc)
+
+class PilCapture:
+    """Fallback (macOS, Wayland): PIL.ImageGrab, which allocates a new image per grab"""
+    name = "pil"
+    order = "RGB"
+
+    def __init__(self):
+        from PIL import ImageGrab
+        self.image_grab = ImageGrab
+        self.size = ImageGrab.grab().size
+
+    def grab(self, box):
+        left, top, width, height = box
+        image = self.image_grab.grab(bbox=(left, top, left + width, top + height))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        return np.asarray(image)
+
+    def close(self):
+        pass
+
+CAPTURES = {
+    "xshm": XShmCapture,
+    "gdi": GdiCapture,
+    "pil": PilCapture,
+}
+
+def open_capture(preferred="auto"):
+    """The fastest capture that works here, or None (no numpy, or no way to read the screen)"""
+    if np is None:
+        event_log.warning("numpy is not installed; pixel and region triggers are disabled")
+        return None
+    if preferred in (None, "auto"):
+        order = ["gdi", "pil"] if OS_TYPE == "Windows" else ["xshm", "pil"]
+    else:
+        order = [preferred, "pil"]
+    for name in order:
+        try:
+            capture = CAPTURES[name]()
+        except Exception as e:
+            event_log.warning(f"Screen capture '{name}' unavailable: {e}")
+            continue
+        event_log.info(f"Using '{capture.name}' screen capture")
+        return capture
+    event_log.warning("No screen capture available; pixel and region triggers are disabled")
+    return None
+
+# === Watchers ===
+class _Watch:
+    """One trigger's slice of the shared frame plus preallocated comparison buffers"""
+    __slots__ = ("name", "rows", "cols", "color", "tolerance", "needed", "diff", "peak", "previous")
+
+    def __init__(self, name, screen, box, order):
+        left, top = box[0], box[1]
+        x, y, w, h = screen.box
+        self.name = name
+        self.rows = slice(y - top, y - top + h)
+        self.cols = slice(x - left, x - left + w)
+        color = screen.color[::-1] if screen.color and order == "BGR" else screen.color
+        self.color = np.array(color, dtype=np.int16) if color else None
+        self.tolerance = screen.tolerance
+        self.needed = max(1, int(round(screen.fraction * w * h)))
+        self.diff = np.empty((h, w, 3), dtype=np.int16)
+        self.peak = np.empty((h, w), dtype=np.int16)
+        self.previous = None
+
+    def evaluate(self, frame):
+        region = frame[self.rows, self.cols, :3]
+        if self.color is not None:
+            np.subtract(region, self.color, out=self.diff, dtype=np.int16)
+        elif self.previous is None:
+            self.previous = region.copy()
+            return False
+        else:
+            np.subtract(region, self.previous, out=self.diff, dtype=np.int16)
+            np.copyto(self.previous, region)
+        np.abs(self.diff, out=self.diff)
+        np.max(self.diff, axis=2, out=self.peak)
+        if self.color is not None:
+            return np.count_nonzero(self.peak <= self.tolerance) >= self.needed
+        return np.count_nonzero(self.peak > self.tolerance) >= self.needed
+
+class ScreenWatcher:
+    """
+    Evaluates every pixel/region trigger of one trigger table from a single grab of
+    their bounding box per tick, so dozens of watchers cost one capture.
+    """
+
+    def __init__(self, compiled_macros, capture):
+        self.capture = capture
+        width, height = capture.size
+        boxes = []
+        for compiled in compiled_macros:
+            x, y, w, h = compiled.screen.box
+            if x + w > width or y + h > height:
+                event_log.warning(f"Screen trigger of '{compiled.name}' lies outside the {width}x{height} screen; ignored")
+                continue
+            boxes.append((compiled, compiled.screen.box))
+
+        self.box = None
+        self.watches = []
+        self.pixel_names = []
+        if not boxes:
+            return
+        left = min(b[0] for _, b in boxes)
+        top = min(b[1] for _, b in boxes)
+        right = max(b[0] + b[2] for _, b in boxes)
+        bottom = max(b[1] + b[3] for _, b in boxes)
+        self.box = (left, top, right - left, bottom - top)
+
+        # Pixel triggers are checked together: one gather and one comparison for all of them
+        pixels = [compiled for compiled, _ in boxes if compiled.screen.kind == "pixel"]
+        self.pixel_names = [compiled.name for compiled in pixels]
+        self.pixel_rows = np.array([c.screen.box[1] - top for c in pixels], dtype=np.intp)
+        self.pixel_cols = np.array([c.screen.box[0] - left for c in pixels], dtype=np.intp)
+        colors = [c.screen.color[::-1] if capture.order == "BGR" else c.screen.color for c in pixels]
+        self.pixel_colors = np.array(colors, dtype=np.int16).reshape(-1, 3)
+        self.pixel_tolerance = np.array([c.screen.tolerance for c in pixels], dtype=np.int16)
+        self.watches = [_Watch(compiled.name, compiled.screen, self.box, capture.order)
+                        for compiled, _ in boxes if compiled.screen.kind != "pixel"]
+
+    def sample(self):
+        """{macro name: matches} for this tick (runs on a worker thread)"""
+        if self.box is None:
+            return {}
+        frame = self.capture.grab(self.box)
+        states = {}
+        if self.pixel_names:
+            values = frame[self.pixel_rows, self.pixel_cols, :3].astype(np.int16)
+            matches = (np.abs(values - self.pixel_colors).max(axis=1) <= self.pixel_tolerance).tolist()
+            states = dict(zip(self.pixel_names, matches))
+        for watch in self.watches:
+            states[watch.name] = bool(watch.evaluate(frame))
+        return states
@@ -0,0 +1,179 @@
+from collections import deque
+from itertools import combinations
+
+from key_conflicts import normalize_key, parse_chord
+
+SEQUENCE_TIMEOUT = 1.0  # seconds allowed between steps ("timeout")
+TAP_WINDOW = 0.3  # seconds between the taps of a double tap
+HOLD_TIME = 0.5  # seconds a long press must be held ("hold_time")
+MAX_STATES = 10000  # guard against pathological binding sets
+
+def parse_sequence(text):
+    """Steps of a "ctrl+k, ctrl+c" sequence as chords (frozensets of normalized key names)"""
+    return tuple(parse_chord(step) for step in str(text).split(","))
+
+class Binding:
+    """One sequence trigger: steps to press in order, max gap between them, and an optional hold"""
+    __slots__ = ("name", "steps", "timeout", "hold")
+
+    def __init__(self, compiled):
+        macro = compiled.macro
+        steps = parse_sequence(compiled.sequence)
+        gesture = macro.get("gesture")
+        self.name = compiled.name
+        self.hold = None
+        if gesture == "double_tap":
+            steps = steps + steps
+            self.timeout = macro.get("timeout", TAP_WINDOW)
+        else:
+            self.timeout = macro.get("timeout", SEQUENCE_TIMEOUT)
+            if gesture == "long_press":
+                self.hold = macro.get("hold_time", HOLD_TIME)
+        self.steps = steps
+
+class SequenceMachine:
+    """
+    Every sequence, chord, double-tap and long-press binding of a profile as one DFA.
+    Its input is the set of keys held at each key press; a state is the set of
+    (binding, steps matched) still in progress, so advancing is a single dict lookup
+    no matter how many bindings there are. Pressing part of the next chord (the
+    ctrl of ctrl+c) keeps the progress; any other key starts over.
+    """
+
+    def __init__(self, bindings):
+        self.bindings = bindings
+        first = {}
+        for b, binding in enumerate(bindings):
+            first.setdefault(binding.steps[0], []).append(b)
+
+        # Subset construction from the empty state; each transition records the bindings it completes
+        self.next = []  # state -> {held chord: (state, completed binding indices)}
+        self.timeout = []  # state -> seconds before its progress is dropped
+        ids = {frozenset(): 0}
+        items_of = [frozenset()]
+        queue = deque([0])
+        while queue:
+            state = queue.popleft()
+            items = items_of[state]
+            expected = {bindings[b].steps[k] for b, k in items}
+            symbols = set(first)
+            for chord in expected:
+                symbols.update(frozenset(c) for size in range(1, len(chord))
+                               for c in combinations(chord, size))
+                symbols.add(chord)
+
+            table = {}
+            for symbol in symbols:
+                target, done = set(), []
+                for b, k in items:
+                    step = bindings[b].steps[k]
+                    if step == symbol:
+                        if k + 1 == len(bindings[b].steps):
+                            done.append(b)
+                        else:
+                            target.add((b, k + 1))
+                    elif symbol < step:
+                        target.add((b, k))  # still on its way to the chord
+                for b in first.get(symbol, ()):
+                    if b in done:
+                        continue  # the press that finishes a double tap doesn't also start the next one
+                    if len(bindings[b].steps) == 1:
+                        done.append(b)
+                    else:
+                        target.add((b, 1))
+                target = frozenset(target)
+                nxt = ids.get(target)
+                if nxt is None:
+                    if len(items_of) >= MAX_STATES:
+                        raise ValueError("too many sequence states")
+                    nxt = ids[target] = len(items_of)
+                    items_of.append(target)
+                    queue.append(nxt)
+                if nxt or done:
+                    table[symbol] = (nxt, tuple(done))
+            self.next.append(table)
+            self.timeout.append(max((bindings[b].timeout for b, _ in items), default=0.0))
+
+        self.state = 0
+        self.last = 0.0
+
+    def __len__(self):
+        return len(self.next)
+
+    def feed(self, held, now):
+        """Advance on a key press with `held` (frozenset, including the new key) down; returns completed bindings"""
+        state = self.state
+        if state and now - self.last > self.timeout[state]:
+            state = 0
+        # Every state has the first steps of all bindings, so a miss can't start anything either
+        state, done = self.next[state].get(held, (0, ()))
+        self.state = state
+        self.last = now
+        return [self.bindings[b] for b in done]
+
+    def reset(self):
+        self.state = 0
+
+# === Key Tracking ===
+class SequenceTracker:
+    """
+    Feeds key events to a SequenceMachine and turns completed bindings into trigger
+    edges: pressed when the sequence completes (or once a long press has been held
+    long enough), released when a key of its last chord comes up.
+    """
+
+    def __init__(self, report, call_later):
+        self.machine = None
+        self.report = report  # report(name, is_pressed)
+        self.call_later = call_later  # call_later(delay, callback, *args) -> handle with .cancel()
+        self.held = set()
+        self.active = {}  # binding name -> keys whose release ends it
+        self.pending = None  # (binding, handle) of a long press being timed
+
+    def key_event(self, name, down, now):
+        key = normalize_key(name) if name else None
+        if not key:
+            return
+        if not down:
+            self.held.discard(key)
+            self._cancel_pending()
+            for binding_name, keys in list(self.active.items()):
+                if key in keys:
+                    del self.active[binding_name]
+                    self.report(binding_name, False)
+            return
+        if key in self.held:
+            return  # auto-repeat
+        self.held.add(key)
+        self._cancel_pending()
+        if self.machine is None:
+            return
+        for binding in self.machine.feed(frozenset(self.held), now):
+            if binding.hold is None:
+                self._fire(binding)
+            else:
+                self.pending = (binding, self.call_later(binding.hold, self._long_press, binding))
+
+    def _fire(self, binding):
+        if binding.name in self.active:
+            return
+        self.active[binding.name] = binding.steps[-1]
+        self.report(binding.name, True)
+
+    def _long_press(self, binding):
+        if self.pending is not None and self.pending[0] is binding:
+            self.pending = None
+            self._fire(binding)
+
+    def _cancel_pending(self):
+        if self.pending is not None:
+            self.pending[1].cancel()
+            self.pending = None
+
+    def use(self, machine):
+        """Switch to another profile's machine (or None), dropping all progress; the caller releases active triggers"""
+        self._cancel_pending()
+        self.machine = machine
+        if machine is not None:
+            machine.reset()
+        self.active = {}
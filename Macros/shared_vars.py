@@ -0,0 +1,266 @@
+import os
+import sys
+import ctypes
+import ctypes.util
+import hashlib
+import platform
+import threading
+from multiprocessing import shared_memory
+
+OS_TYPE = platform.system()
+
+ENV_VAR = "MACROS_VARS"  # name of the runtime's block, inherited by user function processes
+MAGIC = 0x5352415643414D  # "MACVARS"
+SLOTS = 1024
+SLOT_SIZE = 64  # name hash (8) + value (8) + name (48): one cache line per variable
+NAME_BYTES = SLOT_SIZE - 16
+HEADER = 64
+
+class VariableError(ValueError):
+    """A bad variable name, or no store to attach to"""
+
+# === Atomic Operations ===
+class LibAtomic:
+    """Lock-free 64-bit loads, stores, adds and compare-and-swaps through libatomic"""
+    SEQ_CST = 5
+
+    def __init__(self):
+        path = ctypes.util.find_library("atomic")
+        if path is None:
+            raise OSError("libatomic not found")
+        lib = ctypes.CDLL(path)
+        i64, ptr, order = ctypes.c_int64, ctypes.c_void_p, ctypes.c_int
+        self._load = getattr(lib, "__atomic_load_8")
+        self._load.argtypes, self._load.restype = (ptr, order), i64
+        self._store = getattr(lib, "__atomic_store_8")
+        self._store.argtypes, self._store.restype = (ptr, i64, order), None
+        self._add = getattr(lib, "__atomic_fetch_add_8")
+        self._add.argtypes, self._add.restype = (ptr, i64, order), i64
+        self._cas = getattr(lib, "__atomic_compare_exchange_8")
+        self._cas.argtypes = (ptr, ptr, i64, ctypes.c_bool, order, order)
+        self._cas.restype = ctypes.c_bool
+        self._expected = threading.local()
+
+    def load(self, address):
+        return self._load(address, self.SEQ_CST)
+
+    def store(self, address, value):
+        self._store(address, value, self.SEQ_CST)
+
+    def add(self, address, delta):
+        """Add delta; returns the new value"""
+        return self._add(address, delta, self.SEQ_CST) + delta
+
+    def cas(self, address, expected, value):
+        slot = getattr(self._expected, "slot", None)
+        if slot is None:
+            slot = self._expected.slot = ctypes.c_int64()
+        slot.value = expected
+        return self._cas(address, ctypes.addressof(slot), value, False, self.SEQ_CST, self.SEQ_CST)
+
+class LockedAtomics:
+    """
+    Same operations under a cross-process lock, where libatomic is missing (Windows
+    exports no 64-bit Interlocked functions): a named mutex on Windows, flock elsewhere.
+    """
+
+    def __init__(self, block_name):
+        self.local = threading.Lock()
+        if OS_TYPE == "Windows":
+            kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            self._wait, self._release = kernel32.WaitForSingleObject, kernel32.ReleaseMutex
+            self.mutex = kernel32.CreateMutexW(None, False, f"Local\\{block_name}.lock")
+            if not self.mutex:
+                raise OSError(ctypes.get_last_error(), "CreateMutexW failed")
+        else:
+            import fcntl
+            import tempfile
+            self._flock = fcntl.flock
+            self._fcntl = fcntl
+            self.fd = os.open(os.path.join(tempfile.gettempdir(), f"{block_name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _acquire(self):
+        self.local.acquire()
+        if OS_TYPE == "Windows":
+            self._wait(self.mutex, 0xFFFFFFFF)
+        else:
+            self._flock(self.fd, self._fcntl.LOCK_EX)
+
+    def _unlock(self):
+        if OS_TYPE == "Windows":
+            self._release(self.mutex)
+        else:
+            self._flock(self.fd, self._fcntl.LOCK_UN)
+        self.local.release()
+
+    def load(self, address):
+        self._acquire()
+        try:
+            return ctypes.c_int64.from_address(address).value
+        finally:
+            self._unlock()
+
+    def store(self, address, value):
+        self._acquire()
+        try:
+            ctypes.c_int64.from_address(address).value = value
+        finally:
+            self._unlock()
+
+    def add(self, address, delta):
+        self._acquire()
+        try:
+            cell = ctypes.c_int64.from_address(address)
+            cell.value += delta
+            return cell.value
+        finally:
+            self._unlock()
+
+    def cas(self, address, expected, value):
+        self._acquire()
+        try:
+            cell = ctypes.c_int64.from_address(address)
+            if cell.value != expected:
+                return False
+            cell.value = value
+            return True
+        finally:
+            self._unlock()
+
+def _atomics(block_name):
+    try:
+        return LibAtomic()
+    except (OSError, AttributeError):
+        return LockedAtomics(block_name)
+
+# === Variable Store ===
+def _name_hash(name):
+    """Stable across processes (unlike hash()); never 0, which marks a free slot"""
+    value = int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+    return value or 1
+
+class VariableStore:
+    """
+    Named 64-bit integer variables in one shared memory block, seen by every process
+    that attaches. A variable's slot is found once per process (open addressing on a
+    hash of its name, claimed with compare-and-swap); after that a read, write or
+    increment is a single atomic operation on its address.
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        # Only the address is kept: a live ctypes view would pin the buffer and make close() fail.
+        # The mapping itself stays valid until self.shm is closed.
+        view = ctypes.c_char.from_buffer(shm.buf)
+        self.base = ctypes.addressof(view)
+        del view
+        self.atomics = _atomics(shm.name.lstrip("/"))
+        self.addresses = {}  # name -> address of its value
+
+    def _slot(self, name, create):
+        address = self.addresses.get(name)
+        if address is not None:
+            return address
+        encoded = name.encode("utf-8")
+        if not encoded or len(encoded) > NAME_BYTES:
+            raise VariableError(f"variable names must be 1-{NAME_BYTES} bytes")
+        key = _name_hash(name)
+        start = key % SLOTS
+        for i in range(SLOTS):
+            slot = self.base + HEADER + (start + i) % SLOTS * SLOT_SIZE
+            current = self.atomics.load(slot)
+            if current == 0:
+                if not create:
+                    return None
+                if self.atomics.cas(slot, 0, key):
+                    ctypes.memmove(slot + 16, encoded, len(encoded))
+                    current = key
+                else:
+                    current = self.atomics.load(slot)  # claimed by another process meanwhile
+            if current == key:
+                address = self.addresses[name] = slot + 8
+                return address
+        if not create:
+            return None
+        raise VariableError("variable store is full")
+
+    def get(self, name, default=0):
+        address = self._slot(name, False)
+        return default if address is None else self.atomics.load(address)
+
+    def set(self, name, value):
+        self.atomics.store(self._slot(name, True), int(value))
+
+    def add(self, name, delta=1):
+        """Atomically add delta (counters); returns the new value"""
+        return self.atomics.add(self._slot(name, True), int(delta))
+
+    def compare_and_set(self, name, expected, value):
+        """Set only if the variable still holds expected; True on success"""
+        return self.atomics.cas(self._slot(name, True), int(expected), int(value))
+
+    def items(self):
+        """{name: value} of every variable"""
+        out = {}
+        for i in range(SLOTS):
+            slot = self.base + HEADER + i * SLOT_SIZE
+            if self.atomics.load(slot):
+                name = ctypes.string_at(slot + 16, NAME_BYTES).rstrip(b"\0").decode("utf-8", "replace")
+                if name:
+                    out[name] = self.atomics.load(slot + 8)
+        return out
+
+    def close(self):
+        self.addresses = {}
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+def create():
+    """New block owned by this process; child processes find it through MACROS_VARS"""
+    shm = shared_memory.SharedMemory(create=True, size=HEADER + SLOTS * SLOT_SIZE)
+    shm.buf[:HEADER + SLOTS * SLOT_SIZE] = bytes(HEADER + SLOTS * SLOT_SIZE)
+    shm.buf[0:8] = MAGIC.to_bytes(8, "little")
+    shm.buf[8:16] = SLOTS.to_bytes(8, "little")
+    os.environ[ENV_VAR] = shm.name
+    return VariableStore(shm, owner=True)
+
+def attach(name=None):
+    """The block named by MACROS_VARS (set for user functions started by the runtime)"""
+    name = name or os.environ.get(ENV_VAR)
+    if not name:
+        raise VariableError(f"no variable store ({ENV_VAR} is not set)")
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=name)
+        if OS_TYPE != "Windows":
+            # Otherwise this process's resource tracker would unlink the runtime's block when it exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+    if int.from_bytes(shm.buf[0:8], "little") != MAGIC:
+        shm.close()
+        raise VariableError(f"'{name}' is not a variable store")
+    return VariableStore(shm)
+
+_store = None
+
+def get_store():
+    """This process's store: attached if MACROS_VARS names one, otherwise created"""
+    global _store
+    if _store is None:
+        try:
+            _store = attach() if os.environ.get(ENV_VAR) else create()
+        except (OSError, VariableError):
+            _store = create()
+    return _store
+
+def close_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -0,0 +1,208 @@
+import os
+import threading
+
+import event_log
+import screen_watch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+HINT_MARGIN = 32  # pixels searched around the last hit before falling back to the whole region
+# Large searches first match at 1/2 or 1/4 scale (keeping the template at least this many
+# pixels across), then refine at full scale around the coarse hit
+MIN_COARSE_SIZE = 12
+COARSE_AREA_RATIO = 16
+GRAY_WEIGHTS = {"RGB": (0.299, 0.587, 0.114), "BGR": (0.114, 0.587, 0.299)}
+
+def _fast_size(n):
+    """Smallest 2^a * 3^b * 5^c >= n (sizes numpy's FFT handles fastest)"""
+    best = 1 << max(0, (n - 1).bit_length())
+    p5 = 1
+    while p5 < best:
+        p3 = p5
+        while p3 < best:
+            size = p3
+            while size < n:
+                size *= 2
+            best = min(best, size)
+            p3 *= 3
+        p5 *= 5
+    return best
+
+def _downsample(gray, factor):
+    """Block mean over factor x factor tiles (edges that don't fill a tile are dropped)"""
+    h, w = gray.shape[0] // factor * factor, gray.shape[1] // factor * factor
+    # Adding factor^2 strided views beats a reshape + mean by several times
+    out = gray[0:h:factor, 0:w:factor].astype(np.float32)
+    for i in range(factor):
+        for j in range(factor):
+            if i or j:
+                out += gray[i:h:factor, j:w:factor]
+    out *= np.float32(1.0 / (factor * factor))
+    return out
+
+def _window_sums(values, h, w):
+    """Sum of every h x w window of a 2-D array, via an integral image"""
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    np.cumsum(values, axis=0, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table[h:, w:] - table[:-h, w:] - table[h:, :-w] + table[:-h, :-w]
+
+# === Templates ===
+class Template:
+    """A template preprocessed once: zero-mean grayscale, its norm, FFTs per search size and a coarse copy"""
+
+    def __init__(self, gray):
+        self.gray = gray
+        self.shape = gray.shape
+        self.centered = gray - gray.mean()
+        self.norm = float(np.sqrt((self.centered.astype(np.float64) ** 2).sum()))
+        self._spectra = {}  # FFT size -> spectrum of the flipped template
+        self.factor = 1
+        while self.factor < 4 and min(self.shape) // (self.factor * 2) >= MIN_COARSE_SIZE:
+            self.factor *= 2
+        self.coarse = Template(_downsample(gray, self.factor)) if self.factor > 1 else None
+
+    @classmethod
+    def load(cls, path):
+        from PIL import Image
+        with Image.open(path) as image:
+            return cls(np.asarray(image.convert("L"), dtype=np.float32))
+
+    def spectrum(self, shape):
+        spectrum = self._spectra.get(shape)
+        if spectrum is None:
+            if len(self._spectra) > 8:
+                self._spectra.clear()
+            spectrum = self._spectra[shape] = np.fft.rfft2(self.centered[::-1, ::-1], shape)
+        return spectrum
+
+class TemplateCache:
+    """Templates by path, reloaded only when the file changes"""
+
+    def __init__(self):
+        self.templates = {}  # path -> (mtime, Template)
+
+    def get(self, path):
+        if not os.path.isabs(path):
+            path = os.path.join(script_dir, path)
+        mtime = os.path.getmtime(path)
+        cached = self.templates.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = self.templates[path] = (mtime, Template.load(path))
+        return cached[1]
+
+# === Matching ===
+def match_template(image, template):
+    """
+    Normalized cross-correlation of template over every position of a grayscale image.
+    Returns (score, x, y) of the best match; the correlation runs through one FFT pair.
+    """
+    H, W = image.shape
+    h, w = template.shape
+    if h > H or w > W:
+        return 0.0, 0, 0
+    shape = (_fast_size(H), _fast_size(W))
+    spectrum = np.fft.rfft2(image, shape)
+    np.multiply(spectrum, template.spectrum(shape), out=spectrum)
+    correlation = np.fft.irfft2(spectrum, shape)[h - 1:H, w - 1:W]
+
+    count = h * w
+    sums = _window_sums(image, h, w)
+    variance = _window_sums(image.astype(np.float64) ** 2, h, w) - sums * sums / count
+    denominator = np.sqrt(np.maximum(variance, 0.0)) * template.norm
+    # Flat windows (and flat templates) can't correlate; leave them at zero
+    scores = np.divide(correlation, denominator, out=np.zeros_like(denominator), where=denominator > 1e-6)
+    index = int(np.argmax(scores))
+    y, x = divmod(index, scores.shape[1])
+    return float(scores[y, x]), x, y
+
+class TemplateFinder:
+    """
+    Finds templates on screen for find_and_click macros: one capture shared by every
+    search, searches limited to each macro's region, and the last hit tried first.
+    """
+
+    def __init__(self, capture_name="auto"):
+        self.capture_name = capture_name
+        self.capture = None
+        self.templates = TemplateCache()
+        self.hints = {}  # macro name -> (x, y) of its last hit
+        self.lock = threading.Lock()
+
+    def _grab_gray(self, box):
+        frame = self.capture.grab(box)
+        w0, w1, w2 = GRAY_WEIGHTS[self.capture.order]
+        gray = frame[:, :, 0] * np.float32(w0)  # float32, copied out of the capture buffer
+        gray += frame[:, :, 1] * np.float32(w1)
+        gray += frame[:, :, 2] * np.float32(w2)
+        return gray
+
+    def _clip(self, box):
+        width, height = self.capture.size
+        left, top = max(0, box[0]), max(0, box[1])
+        right, bottom = min(width, box[0] + box[2]), min(height, box[1] + box[3])
+        return (left, top, right - left, bottom - top) if right > left and bottom > top else None
+
+    def _search(self, template, box):
+        box = self._clip(box)
+        if box is None or box[2] < template.shape[1] or box[3] < template.shape[0]:
+            return None
+        gray = self._grab_gray(box)
+        h, w = template.shape
+        if template.coarse is None or gray.size < COARSE_AREA_RATIO * h * w:
+            score, x, y = match_template(gray, template)
+            return score, box[0] + x, box[1] + y
+
+        k = template.factor
+        _, cx, cy = match_template(_downsample(gray, k), template.coarse)
+        left, top = max(0, (cx - 2) * k), max(0, (cy - 2) * k)
+        window = gray[top:(cy + 2) * k + h, left:(cx + 2) * k + w]
+        score, x, y = match_template(window, template)
+        return score, box[0] + left + x, box[1] + top + y
+
+    def find(self, name, image_path, region=None, confidence=0.9):
+        """Screen position (x, y) of the template's centre, or None (runs on a worker thread)"""
+        if np is None:
+            raise RuntimeError("numpy is not installed")
+        with self.lock:
+            if self.capture is None:
+                self.capture = screen_watch.open_capture(self.capture_name)
+                if self.capture is None:
+                    raise RuntimeError("no screen capture available")
+            template = self.templates.get(image_path)
+            h, w = template.shape
+            region = tuple(region) if region else (0, 0) + tuple(self.capture.size)
+
+            hint = self.hints.get(name)
+            if hint is not None:
+                near = (hint[0] - HINT_MARGIN, hint[1] - HINT_MARGIN, w + 2 * HINT_MARGIN, h + 2 * HINT_MARGIN)
+                near = (max(near[0], region[0]), max(near[1], region[1]),
+                        min(near[0] + near[2], region[0] + region[2]) - max(near[0], region[0]),
+                        min(near[1] + near[3], region[1] + region[3]) - max(near[1], region[1]))
+                hit = self._search(template, near)
+                if hit is not None and hit[0] >= confidence:
+                    self.hints[name] = hit[1:]
+                    return hit[1] + w // 2, hit[2] + h // 2
+
+            hit = self._search(template, region)
+            if hit is None or hit[0] < confidence:
+                self.hints.pop(name, None)
+                event_log.debug(f"'{os.path.basename(image_path)}' not found (best score {hit[0] if hit else 0:.2f})",
+                                macro=name)
+                return None
+            self.hints[name] = hit[1:]
+            return hit[1] + w // 2, hit[2] + h // 2
+
+_finder = None
+
+def get_finder(capture_name="auto"):
+    """The process's shared TemplateFinder"""
+    global _finder
+    if _finder is None:
+        _finder = TemplateFinder(capture_name)
+    return _finder
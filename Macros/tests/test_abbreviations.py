@@ -0,0 +1,55 @@
+from abbreviations import HISTORY, AbbreviationMatcher
+
+def typed(matcher, text):
+    """Feed text ("\b" is a backspace); returns the macros fired, in order"""
+    fired = []
+    for char in text:
+        if char == "\b":
+            matcher.backspace()
+            continue
+        name = matcher.feed(char)
+        if name is not None:
+            fired.append(name)
+    return fired
+
+def test_fires_inside_other_text():
+    matcher = AbbreviationMatcher({";sig": "Signature"})
+    assert typed(matcher, "thanks ;sig") == ["Signature"]
+    assert typed(matcher, ";si;sig") == ["Signature"]  # restarts from the failure link
+
+def test_overlapping_abbreviations_report_the_longest_match():
+    matcher = AbbreviationMatcher({"he": "He", "she": "She", "hers": "Hers"})
+    assert typed(matcher, "she") == ["She"]
+    assert typed(matcher, "the") == ["He"]
+    # A match starts over, so "hers" can't complete on the "he" that just fired
+    assert typed(matcher, "hers") == ["He"]
+
+def test_shorter_prefix_fires_first():
+    matcher = AbbreviationMatcher({";sig": "Short", ";signature": "Long"})
+    assert typed(matcher, ";signature") == ["Short"]
+
+def test_match_starts_over():
+    matcher = AbbreviationMatcher({"aa": "Double"})
+    assert typed(matcher, "aaaa") == ["Double", "Double"]
+    assert typed(matcher, "aaa") == ["Double"]
+    assert matcher.state != 0  # the third "a" is the start of the next one
+
+def test_backspace_undoes_one_character():
+    matcher = AbbreviationMatcher({";addr": "Address"})
+    assert typed(matcher, ";adx\bdr") == ["Address"]
+    assert typed(matcher, ";ad\b\b\badr") == []
+    assert typed(matcher, "\b\b;addr") == ["Address"]  # backspace with nothing typed is harmless
+
+def test_backspace_history_is_bounded():
+    matcher = AbbreviationMatcher({"ab": "AB"})
+    typed(matcher, "a" + "x" * HISTORY)
+    assert typed(matcher, "\b" * HISTORY + "b") == ["AB"]
+    typed(matcher, "a" + "x" * (HISTORY + 1))
+    assert typed(matcher, "\b" * (HISTORY + 1) + "b") == []  # the "a" fell out of the history
+
+def test_reset_forgets_half_typed_text():
+    matcher = AbbreviationMatcher({";sig": "Signature"})
+    typed(matcher, ";si")
+    matcher.reset()
+    assert typed(matcher, "g") == []
+    assert typed(matcher, "\b") == [] and matcher.state == 0
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from config_journal import ConfigJournal
+
+MACROS = ["profiles", "Desktop", "macros"]
+
+@pytest.fixture
+def journal(tmp_path):
+    j = ConfigJournal(str(tmp_path / "config.json"), default={"profiles": {"Desktop": {"macros": []}}})
+    yield j
+    j.close()
+
+def macros(journal):
+    return journal.config["profiles"]["Desktop"]["macros"]
+
+def test_history_is_not_rewritten_by_later_edits(journal):
+    journal.insert(MACROS, None, {"name": "Jump", "key": "f1"})
+    journal.set(MACROS + [0], "key", "f2")
+    assert journal.undo() and macros(journal) == [{"name": "Jump", "key": "f1"}]
+    assert journal.undo() and macros(journal) == []
+    assert journal.redo()
+    assert macros(journal) == [{"name": "Jump", "key": "f1"}]
+    assert journal.redo()
+    assert macros(journal) == [{"name": "Jump", "key": "f2"}]
+
+def test_caller_objects_are_not_shared_with_history(journal):
+    macro = {"name": "Jump", "key": "f1"}
+    journal.insert(MACROS, None, macro)
+    macro["key"] = "f9"
+    macros(journal)[0]["key"] = "f8"  # in-place change that bypasses the journal
+    journal.undo()
+    journal.redo()
+    assert macros(journal) == [{"name": "Jump", "key": "f1"}]
+
+def test_failed_undo_leaves_config_and_stacks_unchanged(journal):
+    journal.set(["profiles"], "Game", {"macros": []})
+    journal.begin()
+    journal.set(["profiles"], "Other", {"macros": []})
+    journal.insert(MACROS, None, {"name": "A"})
+    journal.commit()
+    before = json.dumps(journal.config)
+    # Break the first op of the step so its inverse, applied last, fails after the other succeeded
+    journal.undo_stack[-1][0]["path"] = ["profiles", "Missing"]
+    with pytest.raises(KeyError):
+        journal.undo()
+    assert json.dumps(journal.config) == before
+    assert len(journal.undo_stack) == 2 and not journal.redo_stack
+
+def test_undo_keeps_the_same_config_object(journal):
+    config = journal.config
+    journal.set(["profiles"], "Game", {"macros": []})
+    journal.undo()
+    journal.redo()
+    assert journal.config is config and "Game" in config["profiles"]
+
+def test_delete_key_undo_restores_position(journal):
+    journal.set(["profiles"], "B", {"macros": []})
+    journal.set(["profiles"], "C", {"macros": []})
+    journal.delete_key(["profiles"], "B")
+    journal.undo()
+    assert list(journal.config["profiles"]) == ["Desktop", "B", "C"]
+
+def test_recovery_replays_journal(tmp_path):
+    path = str(tmp_path / "config.json")
+    j = ConfigJournal(path, default={"profiles": {"Desktop": {"macros": []}}})
+    j.snapshot()
+    j.insert(MACROS, None, {"name": "A", "key": "f1"})
+    j.set(MACROS + [0], "key", "f2")
+    j._journal_file.close()  # simulate a crash: no snapshot, journal left behind
+    j._journal_file = None
+
+    recovered = ConfigJournal(path)
+    try:
+        assert recovered.config["profiles"]["Desktop"]["macros"] == [{"name": "A", "key": "f2"}]
+    finally:
+        recovered.close()
@@ -0,0 +1,33 @@
+import json
+import time
+
+from event_log import EventLog
+
+def read(tmp_path):
+    with open(tmp_path / "test.jsonl", encoding="utf-8") as f:
+        return [(r["level"], r["msg"], r.get("repeated")) for r in map(json.loads, f)]
+
+def make_log(tmp_path, window):
+    return EventLog("test", {"dir": str(tmp_path), "console": False, "dedup_window": window})
+
+def test_alternating_info_lines_are_all_written(tmp_path):
+    log = make_log(tmp_path, 10.0)
+    for title in ("A", "B", "A"):
+        log.emit("info", f"Focus: {title}")
+    log.close()
+    assert [msg for _, msg, _ in read(tmp_path)] == ["Focus: A", "Focus: B", "Focus: A"]
+
+def test_suppressed_count_is_written_when_the_window_closes(tmp_path):
+    log = make_log(tmp_path, 0.2)
+    for _ in range(4):
+        log.emit("warning", "boom")
+    time.sleep(0.6)
+    assert read(tmp_path) == [("warning", "boom", None), ("warning", "boom", 3)]
+    log.close()
+
+def test_close_writes_pending_counts(tmp_path):
+    log = make_log(tmp_path, 10.0)
+    for _ in range(3):
+        log.emit("error", "bad")
+    log.close()
+    assert read(tmp_path) == [("error", "bad", None), ("error", "bad", 2)]
@@ -0,0 +1,49 @@
+import pytest
+
+from guards import GuardContext, GuardError, WindowState, compile_guard
+
+def context(title="", process="", active=()):
+    window = WindowState()
+    window.title, window.process = title, process
+    return GuardContext(window, lambda name: name in active)
+
+@pytest.mark.parametrize("text", [
+    "__import__('os').system('echo hi')",
+    "open('config.json')",
+    "title.lower()",  # attribute access
+    "().__class__.__bases__",
+    "title[0] == 'a'",  # subscript
+    "[c for c in title]",
+    "lambda: 1",
+    "(x := 1)",
+    "title if process else 'x'",
+    "1 + 2 == 3",  # arithmetic
+    "b'x' in title",  # bytes constant
+    "None",
+    "{'a': 1}",
+    "f'{title}' == 'x'",
+    "title is 'x'",  # identity comparison
+    "active(name='Jump')",  # keyword arguments
+    "pixel(var('x'), 1, '#ffffff')",  # pixel() only takes constants
+    "print('x')",
+    "os",  # unknown name
+])
+def test_rejects_disallowed_nodes(text):
+    with pytest.raises(GuardError):
+        compile_guard(text)
+
+@pytest.mark.parametrize("text", ["", "   ", None, 1, "title ==", "pixel(1, 2, 'red')", "active()", "lower(1, 2)"])
+def test_rejects_invalid_guards(text):
+    with pytest.raises(GuardError):
+        compile_guard(text)
+
+def test_guard_error_is_a_value_error():
+    with pytest.raises(ValueError):
+        compile_guard("__import__('os')")
+
+def test_allowed_subset_evaluates():
+    guard = compile_guard("'Chrome' in title and not active('Spam') or lower(process) == 'game.exe'")
+    assert guard(context(title="Google Chrome"))
+    assert not guard(context(title="Google Chrome", active={"Spam"}))
+    assert guard(context(process="GAME.EXE", active={"Spam"}))
+    assert compile_guard("0 <= -1 < 1")(context()) is False
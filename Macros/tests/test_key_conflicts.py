@@ -0,0 +1,34 @@
+from key_conflicts import describe, find_conflicts
+
+def macro(name, key, modifier=None, **fields):
+    return dict(name=name, type="keyboard_press", key=key, modifier=modifier, key_to_press="a", **fields)
+
+def config(global_macros=(), game_macros=(), group_macros=()):
+    return {"profiles": {
+        "Global": {"macros": list(global_macros)},
+        "Games": {"macros": list(group_macros), "game.exe": {"macros": list(game_macros)}},
+    }}
+
+def test_exe_macro_hiding_a_global_one_is_reported_on_the_exe():
+    conflicts = find_conflicts(config([macro("Mute", "f6")], [macro("Jump", "f6")]))
+    assert [(c.kind, c.profile, c.exe, c.name, c.other_layer) for c in conflicts] == \
+        [("hides", "Games", "game.exe", "Jump", "Global")]
+    assert describe(conflicts[0]) == "[Games/game.exe] 'Jump' (f6) replaces 'Mute' from Global here"
+
+def test_same_name_override_is_not_a_conflict():
+    assert find_conflicts(config([macro("Jump", "f6")], [macro("Jump", "f7")])) == []
+
+def test_chord_shadowing_across_layers():
+    conflicts = find_conflicts(config([macro("Save", "s", "ctrl")], group_macros=[macro("Strafe", "s")]))
+    assert [(c.kind, c.profile, c.exe, c.name, c.other_name) for c in conflicts] == \
+        [("shadows", "Games", None, "Strafe", "Save")]
+
+def test_global_conflicts_are_reported_once():
+    conflicts = find_conflicts(config([macro("A", "f1"), macro("B", "f1", "shift")]))
+    assert [(c.kind, c.profile, c.name) for c in conflicts] == [("shadowed", "Global", "B")]
+
+def test_builtin_hotkey_needs_exact_chord():
+    assert find_conflicts(config([macro("Map", "m")])) == []
+    assert find_conflicts(config([macro("Map", "m", "ctrl&alt&shift")])) == []
+    conflicts = find_conflicts(config([macro("Info", "m", "ctrl&alt")]))
+    assert [c.kind for c in conflicts] == ["builtin"]
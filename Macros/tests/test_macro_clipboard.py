@@ -0,0 +1,45 @@
+import json
+
+from config_journal import ConfigJournal
+from macro_clipboard import MacroClipboard
+
+MACRO = {"name": "Path", "type": "move", "key": "f1", "points": [[0, 0], [10, 20]], "jitter": {"dist": "uniform"}}
+
+def test_pastes_share_frozen_records():
+    clipboard = MacroClipboard()
+    clipboard.copy_macros([MACRO])
+    first, second = clipboard.paste_macros()[0], clipboard.paste_macros()[0]
+    assert first is not second
+    assert first["points"] is second["points"]  # nested values are shared, not copied per paste
+    first["name"] = "Renamed"
+    assert clipboard.paste_macros()[0]["name"] == "Path"
+
+def test_copy_is_a_snapshot():
+    macro = json.loads(json.dumps(MACRO))
+    clipboard = MacroClipboard()
+    clipboard.copy_macros([macro])
+    macro["points"].append([5, 5])
+    assert len(clipboard.paste_macros()[0]["points"]) == 2
+
+def test_journal_materializes_pasted_macros(tmp_path):
+    journal = ConfigJournal(str(tmp_path / "config.json"), default={"profiles": {"P": {"macros": []}}})
+    clipboard = MacroClipboard()
+    clipboard.copy_macros([MACRO])
+    journal.insert(["profiles", "P", "macros"], None, clipboard.paste_macros()[0])
+    journal.insert(["profiles", "P", "macros"], None, clipboard.paste_macros()[0])
+    a, b = journal.config["profiles"]["P"]["macros"]
+    assert a == MACRO and type(a["points"]) is list and type(a["jitter"]) is dict
+    a["points"][0][0] = 99
+    assert b["points"][0][0] == 0
+    journal.snapshot()
+    with open(tmp_path / "config.json") as f:
+        assert json.load(f)["profiles"]["P"]["macros"][1] == MACRO
+    journal.close()
+
+def test_serialized_round_trip():
+    clipboard = MacroClipboard()
+    clipboard.copy_profiles([("Game", {"game.exe": {"macros": [MACRO]}})])
+    other = MacroClipboard()
+    assert other.load_serialized(clipboard.serialize())
+    assert json.loads(json.dumps(dict(other.paste_profiles()[0][1]), default=dict)) == {"game.exe": {"macros": [MACRO]}}
+    assert not other.load_serialized("not ours")
@@ -0,0 +1,127 @@
+from macro_compiler import CompiledMacro
+from sequences import HOLD_TIME, SEQUENCE_TIMEOUT, TAP_WINDOW, Binding, SequenceMachine, SequenceTracker
+
+def machine(*macros):
+    bindings = [Binding(CompiledMacro(dict(name=name, type="keyboard_press", key_to_press="a", sequence=sequence,
+                                           **fields)))
+                for name, sequence, fields in macros]
+    return SequenceMachine(bindings)
+
+class Timers:
+    """call_later stand-in that runs callbacks when the test advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.pending = []
+
+    def call_later(self, delay, callback, *args):
+        timer = Timer(self.now + delay, callback, args)
+        self.pending.append(timer)
+        return timer
+
+    def advance(self, seconds):
+        self.now += seconds
+        for timer in [t for t in self.pending if t.due <= self.now and not t.cancelled]:
+            timer.cancelled = True
+            timer.callback(*timer.args)
+
+class Timer:
+    def __init__(self, due, callback, args):
+        self.due, self.callback, self.args = due, callback, args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+def tracker(*macros):
+    timers = Timers()
+    reports = []
+    t = SequenceTracker(lambda name, pressed: reports.append((name, pressed)), timers.call_later)
+    t.use(machine(*macros))
+    return t, timers, reports
+
+def tap(t, timers, *keys, gap=0.05):
+    for key in keys:
+        t.key_event(key, True, timers.now)
+    for key in reversed(keys):
+        t.key_event(key, False, timers.now)
+    timers.advance(gap)
+
+def names(bindings):
+    return [b.name for b in bindings]
+
+def test_two_step_sequence_within_timeout():
+    m = machine(("Comment", "ctrl+k, ctrl+c", {}))
+    assert names(m.feed(frozenset({"ctrl"}), 0.0)) == []
+    assert names(m.feed(frozenset({"ctrl", "k"}), 0.1)) == []
+    assert names(m.feed(frozenset({"ctrl"}), 0.2)) == []  # ctrl of the next chord keeps the progress
+    assert names(m.feed(frozenset({"ctrl", "c"}), 0.3)) == ["Comment"]
+
+def test_gap_longer_than_timeout_starts_over():
+    m = machine(("Comment", "ctrl+k, ctrl+c", {}))
+    m.feed(frozenset({"ctrl", "k"}), 0.0)
+    assert names(m.feed(frozenset({"ctrl", "c"}), SEQUENCE_TIMEOUT + 0.01)) == []
+    m.feed(frozenset({"ctrl", "k"}), 10.0)
+    assert names(m.feed(frozenset({"ctrl", "c"}), 10.0 + SEQUENCE_TIMEOUT)) == ["Comment"]  # the limit itself is allowed
+
+def test_custom_timeout():
+    m = machine(("Slow", "g, g", {"timeout": 3.0}))
+    m.feed(frozenset({"g"}), 0.0)
+    assert names(m.feed(frozenset({"g"}), 2.5)) == ["Slow"]
+
+def test_other_key_starts_over():
+    m = machine(("Comment", "ctrl+k, ctrl+c", {}))
+    m.feed(frozenset({"ctrl", "k"}), 0.0)
+    m.feed(frozenset({"x"}), 0.1)
+    assert names(m.feed(frozenset({"ctrl", "c"}), 0.2)) == []
+
+def test_chord_fires_once_all_keys_are_down():
+    t, timers, reports = tracker(("Escape", "j+k", {}))
+    t.key_event("k", True, 0.0)
+    assert reports == []
+    t.key_event("j", True, 0.01)
+    assert reports == [("Escape", True)]
+    t.key_event("j", True, 0.02)  # auto-repeat
+    t.key_event("k", False, 0.1)
+    assert reports == [("Escape", True), ("Escape", False)]
+
+def test_double_tap_window():
+    t, timers, reports = tracker(("Dash", "shift", {"gesture": "double_tap"}))
+    tap(t, timers, "shift", gap=TAP_WINDOW + 0.05)
+    tap(t, timers, "shift")
+    assert reports == []  # taps too far apart
+    tap(t, timers, "shift")
+    assert reports == [("Dash", True), ("Dash", False)]
+
+def test_double_tap_third_tap_starts_a_new_pair():
+    t, timers, reports = tracker(("Dash", "shift", {"gesture": "double_tap"}))
+    for _ in range(3):
+        tap(t, timers, "shift")
+    assert reports.count(("Dash", True)) == 1
+    tap(t, timers, "shift")
+    assert reports.count(("Dash", True)) == 2
+
+def test_long_press_fires_after_hold_time():
+    t, timers, reports = tracker(("Menu", "e", {"gesture": "long_press"}))
+    t.key_event("e", True, timers.now)
+    timers.advance(HOLD_TIME - 0.01)
+    assert reports == []
+    timers.advance(0.02)
+    assert reports == [("Menu", True)]
+    t.key_event("e", False, timers.now)
+    assert reports == [("Menu", True), ("Menu", False)]
+
+def test_long_press_released_early_never_fires():
+    t, timers, reports = tracker(("Menu", "e", {"gesture": "long_press", "hold_time": 1.0}))
+    t.key_event("e", True, timers.now)
+    timers.advance(0.9)
+    t.key_event("e", False, timers.now)
+    timers.advance(1.0)
+    assert reports == []
+
+def test_long_press_cancelled_by_another_key():
+    t, timers, reports = tracker(("Menu", "e", {"gesture": "long_press"}))
+    t.key_event("e", True, timers.now)
+    t.key_event("w", True, timers.now + 0.1)
+    timers.advance(HOLD_TIME * 2)
+    assert reports == []
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import shared_vars
+
+MACROS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INCREMENTS = 20000
+
+# Each worker attaches to the block by name and hammers one counter
+WORKER = """
+import sys
+import shared_vars
+if sys.argv[2] == "locked":
+    shared_vars._atomics = shared_vars.LockedAtomics
+store = shared_vars.attach(sys.argv[1])
+for _ in range({n}):
+    store.add("hits")
+store.close()
+""".format(n=INCREMENTS)
+
+@pytest.fixture(params=["libatomic", "locked"])
+def store(request, monkeypatch):
+    monkeypatch.setenv(shared_vars.ENV_VAR, "")  # create() exports the block name; restored afterwards
+    if request.param == "locked":
+        monkeypatch.setattr(shared_vars, "_atomics", shared_vars.LockedAtomics)
+    elif not isinstance(shared_vars._atomics("probe"), shared_vars.LibAtomic):
+        pytest.skip("libatomic not available")
+    store = shared_vars.create()
+    store.mode = request.param
+    yield store
+    store.close()
+
+def test_counter_increments_from_two_processes(store):
+    env = dict(os.environ, PYTHONPATH=MACROS_DIR)
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER, store.shm.name, store.mode], env=env)
+               for _ in range(2)]
+    for _ in range(INCREMENTS):
+        store.add("hits")
+    assert [w.wait(timeout=60) for w in workers] == [0, 0]
+    assert store.get("hits") == 3 * INCREMENTS
+
+def test_variables_set_in_another_process_are_visible(store):
+    env = dict(os.environ, PYTHONPATH=MACROS_DIR)
+    script = "import sys, shared_vars; s = shared_vars.attach(sys.argv[1]); s.set('mode', 7); s.close()"
+    subprocess.run([sys.executable, "-c", script, store.shm.name], env=env, check=True, timeout=60)
+    assert store.get("mode") == 7
+    assert store.items() == {"mode": 7}
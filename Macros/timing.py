@@ -0,0 +1,146 @@
+import sys
+import math
+import random
+import argparse
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DISTRIBUTIONS = ("uniform", "gaussian", "lognormal")
+BLOCK_SIZE = 4096
+MIN_FACTOR = 0.05  # never shrink an interval below 5% of its base value
+
+# === Validation ===
+def validate_jitter(profile):
+    """Return a list of problems with a macro's "jitter" object"""
+    if not isinstance(profile, dict):
+        return ["jitter must be an object"]
+    errors = []
+    if profile.get("dist", "uniform") not in DISTRIBUTIONS:
+        errors.append(f"jitter dist must be one of {', '.join(DISTRIBUTIONS)}")
+    for field in ("spread", "sigma", "drift", "drift_period"):
+        value = profile.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+            errors.append(f"jitter {field} must be a non-negative number")
+    seed = profile.get("seed")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+        errors.append("jitter seed must be an integer")
+    return errors
+
+# === Block Generators ===
+def _python_block(rng, profile, size):
+    dist = profile.get("dist", "uniform")
+    if dist == "gaussian":
+        sigma = profile.get("sigma", 0.1)
+        return array("d", (rng.gauss(1.0, sigma) for _ in range(size)))
+    if dist == "lognormal":
+        sigma = profile.get("sigma", 0.1)
+        mu = -sigma * sigma / 2  # keeps the mean factor at 1
+        return array("d", (rng.lognormvariate(mu, sigma) for _ in range(size)))
+    spread = profile.get("spread", 0.2)
+    return array("d", (1.0 + rng.uniform(-spread, spread) for _ in range(size)))
+
+def _numpy_block(rng, profile, size):
+    dist = profile.get("dist", "uniform")
+    if dist == "gaussian":
+        block = rng.normal(1.0, profile.get("sigma", 0.1), size)
+    elif dist == "lognormal":
+        sigma = profile.get("sigma", 0.1)
+        block = rng.lognormal(-sigma * sigma / 2, sigma, size)
+    else:
+        spread = profile.get("spread", 0.2)
+        block = 1.0 + rng.uniform(-spread, spread, size)
+    return block.astype("float64")
+
+# === Sampler ===
+class JitterSampler:
+    """
+    Yields jittered intervals around `base` from precomputed blocks, so each
+    event costs one array lookup. With a seed the sequence is reproducible
+    (always generated with Python's Mersenne Twister, independent of numpy).
+    """
+
+    def __init__(self, base, profile=None, block_size=BLOCK_SIZE):
+        self.base = float(base)
+        self.profile = dict(profile or {})
+        self.block_size = block_size
+        self.seed = self.profile.get("seed")
+
+        if self.seed is not None or np is None:
+            self._rng = random.Random(self.seed)
+            self._generate = _python_block
+        else:
+            self._rng = np.random.default_rng()
+            self._generate = _numpy_block
+
+        # Slow sinusoidal drift of the overall rate, period counted in events
+        self.drift = self.profile.get("drift", 0.0)
+        self.drift_period = max(1, int(self.profile.get("drift_period", 1000)))
+        self._phase = self._rng.random() * 2 * math.pi if self.drift else 0.0
+
+        self._produced = 0
+        self._block = array("d")
+        self._index = 0
+
+    def _refill(self):
+        block = self._generate(self._rng, self.profile, self.block_size)
+        step = 2 * math.pi / self.drift_period
+        start = self._produced
+
+        if isinstance(block, array):
+            base, drift, phase = self.base, self.drift, self._phase
+            for i in range(len(block)):
+                factor = block[i]
+                if drift:
+                    factor *= 1.0 + drift * math.sin(phase + (start + i) * step)
+                block[i] = base * (factor if factor > MIN_FACTOR else MIN_FACTOR)
+        else:
+            if self.drift:
+                block *= 1.0 + self.drift * np.sin(self._phase + (start + np.arange(len(block))) * step)
+            np.maximum(block, MIN_FACTOR, out=block)
+            block *= self.base
+            values = array("d")
+            values.frombytes(block.tobytes())
+            block = values
+
+        self._produced += len(block)
+        self._block = block
+        self._index = 0
+
+    def next(self):
+        """Return the next interval in seconds"""
+        if self._index >= len(self._block):
+            self._refill()
+        value = self._block[self._index]
+        self._index += 1
+        return value
+
+    def take(self, count):
+        return [self.next() for _ in range(count)]
+
+# === Replay / Test Mode ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the interval sequence a jitter profile produces.")
+    parser.add_argument("--base", type=float, default=0.05, help="base interval in seconds")
+    parser.add_argument("--dist", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--spread", type=float, default=0.2)
+    parser.add_argument("--sigma", type=float, default=0.1)
+    parser.add_argument("--drift", type=float, default=0.0)
+    parser.add_argument("--drift-period", type=int, default=1000)
+    parser.add_argument("--seed", type=int, required=True)
+    parser.add_argument("-n", "--count", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    sampler = JitterSampler(args.base, {
+        "dist": args.dist, "spread": args.spread, "sigma": args.sigma,
+        "drift": args.drift, "drift_period": args.drift_period, "seed": args.seed,
+    })
+    for value in sampler.take(args.count):
+        print(f"{value:.6f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
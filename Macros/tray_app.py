@@ -1,17 +1,13 @@
 import os
 import sys
-import json
-import time
 import math
 import threading
 import subprocess
 import platform
-import keyboard
 from pystray import Icon, MenuItem, Menu
 from PIL import Image, ImageDraw, ImageColor
 
-from macros import DynamicMacroRunner
-from window_utils import get_foreground_process
+from runtime import create_runtime
 import macro_editor
 
 # Detect OS
@@ -35,9 +31,8 @@ class TrayApp:
         self.exit_event = threading.Event()
         self.last_window_info = ""
         self.tray_icon = None
-        self.macro_thread = None
+        self.runtime = create_runtime("config.json")
         self.cached_icon = None
-        self.create_macros()
         self.macro_editor_thread = None
         
         # Windows-specific console window handling
@@ -51,31 +46,6 @@ class TrayApp:
             self.console_hwnd = None
             self.console_visible = False
 
-    def create_macros(self):
-        self.macros = {}
-        config_path = "config.json"
-        try:
-            with open(config_path, "r") as f:
-                config_data = json.load(f)
-
-            for profile_name, profile_data in config_data["profiles"].items():
-                if profile_name == "Desktop":
-                    continue  # Desktop is fallback, no exe keys here
-
-                for exe_name in profile_data:
-                    runner = DynamicMacroRunner(profile_name, exe_name=exe_name, config_path=config_path)
-                    self.macros[exe_name] = runner
-
-            if "Desktop" in config_data["profiles"]:
-                self.desktop_macro = DynamicMacroRunner("Desktop", config_path=config_path)
-            else:
-                self.desktop_macro = DynamicMacroRunner("Desktop", config_path=config_path)
-
-        except Exception as e:
-            print(f"[Error] create_macros dynamic load: {e}")
-            self.macros = {}
-            self.desktop_macro = DynamicMacroRunner("Desktop", config_path=config_path)
-
     def draw_icon(self):
         if self.cached_icon:
             return self.cached_icon
@@ -103,59 +73,6 @@ class TrayApp:
             self.cached_icon = Image.new('RGBA', (64, 64), (255, 0, 0, 255))
             return self.cached_icon
 
-    def loop(self):
-        while not self.exit_event.is_set():
-            try:
-                window_title, proc_name = get_foreground_process()
-                if window_title == "Unknown" or proc_name == "Unknown":
-                    time.sleep(0.01)
-                    continue
-
-                info = f"Focused Window: {window_title} | Process: {proc_name}"
-                if info != self.last_window_info:
-                    self.last_window_info = info
-                    print(info)
-
-                macro_class = self.macros.get(proc_name, self.desktop_macro)
-                macro_class.run_macro_if_needed()
-
-                # Mouse info hotkey - platform specific
-                if keyboard.is_pressed("ctrl+alt+m"):
-                    try:
-                        if OS_TYPE == "Windows":
-                            # Windows: Use pyautogui mouseInfo
-                            subprocess.Popen(
-                                ["pythonw", "-c", "import pyautogui; pyautogui.mouseInfo()"],
-                                creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
-                            )
-                        else:
-                            # Linux: Use xdotool
-                            result = subprocess.run(
-                                ['xdotool', 'getmouselocation', '--shell'],
-                                capture_output=True,
-                                text=True,
-                                timeout=1
-                            )
-                            if result.returncode == 0:
-                                print(f"[Mouse Info]\n{result.stdout}")
-                                # Try to show notification
-                                try:
-                                    subprocess.Popen(
-                                        ['notify-send', 'Mouse Info', result.stdout],
-                                        stdout=subprocess.DEVNULL,
-                                        stderr=subprocess.DEVNULL
-                                    )
-                                except FileNotFoundError:
-                                    pass  # notify-send not available
-                    except Exception as e:
-                        print(f"[Error] launching mouseInfo: {e}")
-                    time.sleep(0.5)
-
-                time.sleep(0.001)
-            except Exception as e:
-                print(f"[Error] loop cycle: {e}")
-                time.sleep(0.01)
-
     def open_macro_editor(self):
         # If thread exists and is alive, don't open another
         if self.macro_editor_thread and self.macro_editor_thread.is_alive():
@@ -201,6 +118,7 @@ class TrayApp:
     def restart_script(self, icon, item):
         try:
             print("Restarting the script...")
+            self.runtime.stop()
             python = sys.executable
             os.execl(python, python, *sys.argv)
         except Exception as e:
@@ -208,6 +126,8 @@ class TrayApp:
 
     def on_quit(self, icon, item):
         self.exit_event.set()
+        # Stops loops and releases held keys on the runtime thread before we exit
+        self.runtime.stop()
         try:
             icon.stop()
         except Exception as e:
@@ -221,8 +141,7 @@ class TrayApp:
 
     def start_loop(self):
         try:
-            self.macro_thread = threading.Thread(target=self.loop, daemon=True)
-            self.macro_thread.start()
+            self.runtime.start()
         except Exception as e:
             print(f"[Error] start_loop: {e}")
 
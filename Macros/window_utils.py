@@ -1,7 +1,12 @@
+import time
 import platform
+import threading
 import subprocess
+from collections import OrderedDict
 import psutil
 
+import event_log
+
 # Detect operating system
 OS_TYPE = platform.system()
 
@@ -11,33 +16,187 @@ if OS_TYPE == "Windows":
         import win32process
         WINDOWS_LIBS_AVAILABLE = True
     except ImportError:
-        print("[Warning] win32gui not available. Please install: pip install pywin32")
+        event_log.warning("win32gui not available. Please install: pip install pywin32")
         WINDOWS_LIBS_AVAILABLE = False
 
 
-def get_foreground_process_windows():
-    """Get foreground process on Windows using win32gui"""
+# === Process Name Cache ===
+class ProcessNameCache:
+    """
+    pid -> (exe name, create_time) memo with LRU eviction, shared by every backend.
+    A hit costs a dict lookup; entries older than `revalidate` seconds are re-checked
+    against the process create time so a reused pid never reports the old exe.
+    """
+
+    def __init__(self, maxsize=256, revalidate=2.0):
+        self.maxsize = maxsize
+        self.revalidate = revalidate
+        self.entries = OrderedDict()  # pid -> [name, create_time, last_checked]
+        self.lock = threading.Lock()
+
+    def get_name(self, pid):
+        """Return the process name for pid, or None if it no longer exists"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(pid)
+            if entry is not None and now - entry[2] < self.revalidate:
+                self.entries.move_to_end(pid)
+                return entry[0]
+
+        try:
+            proc = psutil.Process(pid)
+            create_time = proc.create_time()
+            if entry is not None and entry[1] == create_time:
+                name = entry[0]
+            else:
+                name = proc.name()
+        except psutil.Error:
+            self.invalidate(pid)
+            return None
+
+        with self.lock:
+            self.entries[pid] = [name, create_time, now]
+            self.entries.move_to_end(pid)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return name
+
+    def invalidate(self, pid):
+        with self.lock:
+            self.entries.pop(pid, None)
+
+process_names = ProcessNameCache()
+
+def get_process_name(pid):
+    return process_names.get_name(pid)
+
+
+# === Process Tree ===
+MAX_DEPTH = 32  # ancestors followed before giving up (guards against cycles)
+MAX_ANCESTRY = 256  # remembered ancestor lists
+
+class ProcessTree:
+    """
+    pid -> (ppid, create_time) map for parent-process lookups. Entries are read from
+    psutil only on a miss. At most every `refresh` seconds one pass drops the processes
+    that have exited and the pids that now belong to a newer process (create time
+    changed), along with their names; `generation` then moves on so callers holding
+    an ancestry know to ask again.
+    """
+
+    def __init__(self, refresh=5.0):
+        self.refresh = refresh
+        self.parents = {}  # pid -> (ppid, create_time)
+        self.ancestry = {}  # pid -> ancestor names, until the tree next changes
+        self.generation = 0
+        self.last_refresh = 0.0
+        self.lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self.last_refresh < self.refresh:
+            return
+        self.last_refresh = now
+        try:
+            alive = set(psutil.pids())
+        except psutil.Error:
+            return
+        stale = [pid for pid, (_, created) in self.parents.items()
+                 if pid not in alive or not self._created_at(pid, created)]
+        for pid in stale:
+            del self.parents[pid]
+            process_names.invalidate(pid)
+        if stale:
+            self.ancestry.clear()
+            self.generation += 1
+
+    def _created_at(self, pid, created):
+        try:
+            return psutil.Process(pid).create_time() == created
+        except psutil.Error:
+            return False
+
+    def _parent(self, pid):
+        entry = self.parents.get(pid)
+        if entry is None:
+            try:
+                proc = psutil.Process(pid)
+                entry = self.parents[pid] = (proc.ppid(), proc.create_time())
+            except psutil.Error:
+                return None
+        return entry
+
+    def identity(self, pid):
+        """
+        (pid, create_time, generation) from the cache, or None if pid is gone. It changes
+        when the pid is reused or the tree changes, so a caller re-resolves ancestors only then.
+        """
+        with self.lock:
+            self._refresh()
+            entry = self._parent(pid)
+            return None if entry is None else (pid, entry[1], self.generation)
+
+    def ancestors(self, pid):
+        """Names of pid's parent, grandparent, ... (nearest first), stopping at the root"""
+        with self.lock:
+            self._refresh()
+            names = self.ancestry.get(pid)
+            if names is not None:
+                return names
+            names = []
+            entry = self._parent(pid)
+            seen = {pid}
+            while entry is not None and len(names) < MAX_DEPTH:
+                ppid, child_created = entry
+                if ppid <= 0 or ppid in seen:
+                    break
+                seen.add(ppid)
+                entry = self._parent(ppid)
+                # A parent younger than its child means the parent's pid was reused
+                if entry is None or entry[1] > child_created:
+                    break
+                name = get_process_name(ppid)
+                if name is None:
+                    break
+                names.append(name)
+            if len(self.ancestry) >= MAX_ANCESTRY:
+                self.ancestry.clear()
+            names = self.ancestry[pid] = tuple(names)
+            return names
+
+process_tree = ProcessTree()
+
+def get_ancestor_names(pid):
+    return process_tree.ancestors(pid)
+
+def get_process_identity(pid):
+    return process_tree.identity(pid)
+
+
+def get_foreground_window_windows():
+    """Get foreground window title, process name and pid on Windows using win32gui"""
     if not WINDOWS_LIBS_AVAILABLE:
-        return "Unknown", "Unknown"
+        return "Unknown", "Unknown", None
     
     try:
         hwnd = win32gui.GetForegroundWindow()
         window_title = win32gui.GetWindowText(hwnd)
         _, pid = win32process.GetWindowThreadProcessId(hwnd)
 
-        if not psutil.pid_exists(pid):
-            return window_title or "Unknown", "Unknown"
-
-        proc = psutil.Process(pid)
-        return window_title or "Unknown", proc.name()
+        name = get_process_name(pid)
+        return window_title or "Unknown", name or "Unknown", pid if name else None
 
     except Exception as e:
-        print(f"[Error] get_foreground_process_windows failed: {e}")
-        return "Unknown", "Unknown"
+        event_log.error(f"get_foreground_process_windows failed: {e}")
+        return "Unknown", "Unknown", None
+
 
+# X window id -> owning pid; a window never changes owner, so only the pid check can go stale
+_window_pids = {}
+MAX_WINDOW_PIDS = 256
 
-def get_foreground_process_linux_x11():
-    """Get foreground process on Linux using xdotool (X11)"""
+def get_foreground_window_linux_x11():
+    """Get foreground window title, process name and pid on Linux using xdotool (X11)"""
     try:
         # Get the active window ID using xdotool
         result = subprocess.run(
@@ -48,7 +207,7 @@ def get_foreground_process_linux_x11():
         )
         
         if result.returncode != 0:
-            return "Unknown", "Unknown"
+            return "Unknown", "Unknown", None
         
         window_id = result.stdout.strip()
         
@@ -62,37 +221,42 @@ def get_foreground_process_linux_x11():
         
         window_title = title_result.stdout.strip() if title_result.returncode == 0 else "Unknown"
         
-        # Get window PID using xdotool
-        pid_result = subprocess.run(
-            ['xdotool', 'getwindowpid', window_id],
-            capture_output=True,
-            text=True,
-            timeout=1
-        )
-        
-        if pid_result.returncode != 0:
-            return window_title, "Unknown"
+        pid = _window_pids.get(window_id)
+        if pid is None:
+            # Get window PID using xdotool
+            pid_result = subprocess.run(
+                ['xdotool', 'getwindowpid', window_id],
+                capture_output=True,
+                text=True,
+                timeout=1
+            )
+            
+            if pid_result.returncode != 0:
+                return window_title, "Unknown", None
+            
+            pid = int(pid_result.stdout.strip())
+            if len(_window_pids) >= MAX_WINDOW_PIDS:
+                _window_pids.clear()
+            _window_pids[window_id] = pid
         
-        pid = int(pid_result.stdout.strip())
-        
-        if not psutil.pid_exists(pid):
-            return window_title, "Unknown"
-        
-        proc = psutil.Process(pid)
-        return window_title, proc.name()
+        name = get_process_name(pid)
+        if name is None:
+            _window_pids.pop(window_id, None)
+            return window_title, "Unknown", None
+        return window_title, name, pid
         
     except subprocess.TimeoutExpired:
-        print("[Error] Timeout getting foreground window")
-        return "Unknown", "Unknown"
+        event_log.error("Timeout getting foreground window")
+        return "Unknown", "Unknown", None
     except FileNotFoundError:
-        print("[Error] xdotool not found. Please install it: sudo apt install xdotool")
-        return "Unknown", "Unknown"
+        event_log.error("xdotool not found. Please install it: sudo apt install xdotool")
+        return "Unknown", "Unknown", None
     except Exception as e:
-        print(f"[Error] get_foreground_process_linux failed: {e}")
-        return "Unknown", "Unknown"
+        event_log.error(f"get_foreground_process_linux failed: {e}")
+        return "Unknown", "Unknown", None
 
 
-def get_foreground_process_linux_wayland():
+def get_foreground_window_linux_wayland():
     """
     Fallback for Wayland - limited window information due to security restrictions.
     This is less reliable than X11 but works on Wayland compositors.
@@ -111,7 +275,7 @@ def get_foreground_process_linux_wayland():
         if result.returncode == 0:
             # Parse the output to get the focused window class
             # This is a simplified implementation
-            return "Wayland Window", "wayland-app"
+            return "Wayland Window", "wayland-app", None
         
     except Exception:
         pass
@@ -123,13 +287,13 @@ def get_foreground_process_linux_wayland():
             try:
                 # This is a very basic heuristic
                 if proc.info['name'] and not proc.info['name'].startswith(('systemd', 'kworker')):
-                    return "Wayland Session", proc.info['name']
+                    return "Wayland Session", proc.info['name'], None
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 continue
     except Exception:
         pass
     
-    return "Unknown", "Unknown"
+    return "Unknown", "Unknown", None
 
 
 def detect_linux_display_server():
@@ -148,27 +312,32 @@ def detect_linux_display_server():
 
 # Select the appropriate function based on OS
 if OS_TYPE == "Windows":
-    print("[Info] Running on Windows")
-    get_foreground_process = get_foreground_process_windows
+    event_log.info("Running on Windows")
+    get_foreground_window = get_foreground_window_windows
     
 elif OS_TYPE == "Linux":
     display_server = detect_linux_display_server()
-    print(f"[Info] Running on Linux with {display_server.upper()} display server")
+    event_log.info(f"Running on Linux with {display_server.upper()} display server")
     
     if display_server == 'wayland':
-        print("[Warning] Wayland detected - window detection will be limited")
-        get_foreground_process = get_foreground_process_linux_wayland
+        event_log.warning("Wayland detected - window detection will be limited")
+        get_foreground_window = get_foreground_window_linux_wayland
     else:
         # Default to X11 (also handles 'unknown')
-        get_foreground_process = get_foreground_process_linux_x11
+        get_foreground_window = get_foreground_window_linux_x11
         
 elif OS_TYPE == "Darwin":
-    print("[Warning] macOS detected - using basic implementation")
+    event_log.warning("macOS detected - using basic implementation")
     # Basic macOS support (can be expanded)
-    def get_foreground_process():
-        return "macOS Window", "Unknown"
+    def get_foreground_window():
+        return "macOS Window", "Unknown", None
     
 else:
-    print(f"[Warning] Unsupported OS: {OS_TYPE}")
-    def get_foreground_process():
-        return "Unknown", "Unknown"
+    event_log.warning(f"Unsupported OS: {OS_TYPE}")
+    def get_foreground_window():
+        return "Unknown", "Unknown", None
+
+
+def get_foreground_process():
+    """(window title, process name) of the focused window"""
+    return get_foreground_window()[:2]